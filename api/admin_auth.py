@@ -0,0 +1,24 @@
+"""
+Authentication for the /api/admin endpoints.
+
+Admin requests must send "Authorization: Bearer <ADMIN_API_KEY>". If ADMIN_API_KEY
+isn't set, the admin endpoints are disabled.
+"""
+import os
+import secrets
+
+from fastapi import Header, HTTPException
+
+
+def require_admin(authorization: str = Header(None)):
+    """
+    FastAPI dependency that rejects requests without the admin key.
+    """
+    admin_key = os.getenv("ADMIN_API_KEY")
+    if not admin_key:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    scheme, _, token = (authorization or "").partition(" ")
+    # compare_digest avoids leaking the key through response timing
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.strip(), admin_key):
+        raise HTTPException(status_code=401, detail="Invalid admin credentials")
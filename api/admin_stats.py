@@ -0,0 +1,122 @@
+"""
+Usage statistics for the admin API, served from the logs_hourly / logs_daily rollups
+maintained by log_maintenance.py. Complete buckets are primary-key range reads on the
+rollup tables; only the rows newer than the rollups' watermark (normally the current,
+unfinished hour or day) are summarised from the raw logs table on request.
+"""
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from log_maintenance import GRANULARITIES, TIMESTAMP_FORMAT, ROLLUP_FIELDS, summarize_buckets
+
+# Default time range when the caller doesn't give a start
+DEFAULT_RANGES = {
+    "hour": timedelta(hours=24),
+    "day": timedelta(days=30),
+}
+
+
+class TTLCache:
+    """A small dict cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries first, then everything if that wasn't enough
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[0] >= now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+
+def parse_time(value):
+    """
+    Parses an ISO date or datetime ("2025-08-23", "2025-08-23T14:00:00" or
+    "2025-08-23T10:00:00-04:00") into the UTC timestamp format used in the logs tables.
+    Times without an offset are taken as UTC. Raises ValueError if it can't.
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime(TIMESTAMP_FORMAT)
+
+
+def default_range(granularity, now=None):
+    """
+    The range ending with the current bucket. Aligning to bucket boundaries keeps cache
+    keys stable between polls.
+    """
+    now = now or datetime.utcnow()
+    _, length, _ = GRANULARITIES[granularity]
+    if granularity == "hour":
+        end = now.replace(minute=0, second=0, microsecond=0) + length
+    else:
+        end = now.replace(hour=0, minute=0, second=0, microsecond=0) + length
+    return (end - DEFAULT_RANGES[granularity]).strftime(TIMESTAMP_FORMAT), end.strftime(TIMESTAMP_FORMAT)
+
+
+def fetch_stats(conn: sqlite3.Connection, start: str, end: str, granularity: str):
+    """
+    Returns per-bucket rollups between `start` (inclusive) and `end` (exclusive) plus totals.
+    Buckets past the rollups' watermark are summarised from the raw logs and marked "live".
+    """
+    table, _, _ = GRANULARITIES[granularity]
+    try:
+        cursor = conn.execute(
+            f"SELECT bucket, {', '.join(ROLLUP_FIELDS)} FROM {table} "
+            "WHERE bucket >= ? AND bucket < ? ORDER BY bucket",
+            (start, end)
+        )
+        buckets = [dict(zip(["bucket", *ROLLUP_FIELDS], row)) for row in cursor.fetchall()]
+        watermark = conn.execute(
+            "SELECT value FROM maintenance_state WHERE name = ?", (f"{table}_rolled_until",)
+        ).fetchone()
+        # Rows the rollups haven't reached yet; a partial first bucket only counts from `start`
+        live_since = max(start, watermark[0]) if watermark else start
+        if live_since < end:
+            buckets += [
+                {"bucket": bucket, **summary, "live": True}
+                for bucket, summary in summarize_buckets(conn, granularity, live_since, end)
+            ]
+    except sqlite3.Error as e:
+        # Tables don't exist until log maintenance has been set up
+        print(f"[ERROR] Failed to read usage rollups: {e}")
+        buckets, watermark = [], None
+
+    requests_total = sum(b["requests"] for b in buckets)
+    successes = sum(b["successes"] for b in buckets)
+    latency_maxes = [b["latency_max"] for b in buckets if b["latency_max"] is not None]
+    return {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        # Rollups cover complete buckets up to this point; later buckets are "live"
+        "rolled_up_until": watermark[0] if watermark else None,
+        "totals": {
+            "requests": requests_total,
+            "successes": successes,
+            "success_rate": round(successes / requests_total, 4) if requests_total else None,
+            "coalesced": sum(b["coalesced"] for b in buckets),
+            "prompt_tokens": sum(b["prompt_tokens"] for b in buckets),
+            "completion_tokens": sum(b["completion_tokens"] for b in buckets),
+            "total_tokens": sum(b["total_tokens"] for b in buckets),
+            "latency_max": max(latency_maxes) if latency_maxes else None,
+        },
+        "buckets": buckets,
+    }
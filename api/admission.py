@@ -0,0 +1,124 @@
+"""
+Global admission control for the expensive LLM endpoints.
+
+At most `max_concurrent` requests run at once. A few more may wait in a short queue;
+anything beyond that (or anything that waits too long) is shed with a fast 503 instead
+of piling up behind minute-long LLM calls. Cheap endpoints never go through the
+controller, so share links keep loading while the LLM path is saturated.
+
+AdmissionMiddleware holds a request's slot until its response has been sent in full,
+including a streamed body (/api/ask/batch keeps making LLM calls while it streams).
+A path that makes several LLM calls at once can be given a weight: it holds that many
+slots, so the limit keeps counting upstream calls rather than requests.
+"""
+import asyncio
+
+from starlette.responses import JSONResponse
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=16, max_queue=32, queue_timeout=5.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        # Taken by requests that need several slots, so two of them can't each hold
+        # part of what they need and wait for each other
+        self._multi_slot_lock = asyncio.Lock()
+        self.active = 0
+        self.slots_in_use = 0
+        self.waiting = 0
+        self.admitted_count = 0
+        self.shed_count = 0
+
+    async def _take(self, weight):
+        if weight == 1:
+            await self._semaphore.acquire()
+            return
+        async with self._multi_slot_lock:
+            taken = 0
+            try:
+                while taken < weight:
+                    await self._semaphore.acquire()
+                    taken += 1
+            except BaseException:
+                # Timed out or cancelled: give back the slots taken so far
+                for _ in range(taken):
+                    self._semaphore.release()
+                raise
+
+    async def acquire(self, weight=1):
+        """
+        Takes `weight` slots (at most max_concurrent). Returns True once the request may
+        run, or False if it should be shed.
+        """
+        weight = min(weight, self.max_concurrent)
+        if self.slots_in_use + weight > self.max_concurrent or self._multi_slot_lock.locked():
+            if self.waiting >= self.max_queue:
+                self.shed_count += 1
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._take(weight), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.shed_count += 1
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self._take(weight)
+
+        self.active += 1
+        self.slots_in_use += weight
+        self.admitted_count += 1
+        return True
+
+    def release(self, weight=1):
+        weight = min(weight, self.max_concurrent)
+        self.active -= 1
+        self.slots_in_use -= weight
+        for _ in range(weight):
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "slots_in_use": self.slots_in_use,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted_count,
+            "shed": self.shed_count,
+        }
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware that admits POST requests to `paths` through the controller and
+    sheds the rest with a 503. The slot is released when the app returns, i.e. once the
+    whole body has been sent, or when the client disconnects and the app is cancelled.
+    `weights` maps exact paths to the number of slots their requests take (default 1).
+    """
+
+    def __init__(self, app, controller, paths, shed_content, retry_after, weights=None):
+        self.app = app
+        self.controller = controller
+        self.paths = paths
+        self.shed_content = shed_content
+        self.retry_after = retry_after
+        self.weights = weights or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        weight = self.weights.get(scope["path"], 1)
+        if not await self.controller.acquire(weight):
+            response = JSONResponse(status_code=503, content=self.shed_content, headers={"Retry-After": self.retry_after})
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(weight)
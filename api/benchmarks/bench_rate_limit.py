@@ -0,0 +1,67 @@
+"""
+Measures the per-check overhead of the rate-limit storage backends and checks that
+the SQLite backend counts correctly across processes.
+
+Usage (from the api directory):
+    python benchmarks/bench_rate_limit.py [--checks 5000] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+import rate_limit_storage  # noqa: F401 - registers the sqlite:// scheme
+
+LIMIT = parse("1000000/minute")
+
+
+def time_checks(uri, checks):
+    limiter = FixedWindowRateLimiter(storage_from_string(uri))
+    # Spread hits over a realistic number of client IPs
+    start = time.perf_counter()
+    for i in range(checks):
+        limiter.hit(LIMIT, f"10.0.{i % 50}.1")
+    return (time.perf_counter() - start) / checks * 1e6
+
+
+def hit_many(args):
+    uri, checks = args
+    limiter = FixedWindowRateLimiter(storage_from_string(uri))
+    for _ in range(checks):
+        limiter.hit(LIMIT, "shared-ip")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checks", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_uri = "sqlite:///" + os.path.join(tmp, "bench_rate_limits.db")
+
+        print(f"memory://  {time_checks('memory://', args.checks):8.1f} us per check")
+        print(f"sqlite://  {time_checks(sqlite_uri, args.checks):8.1f} us per check")
+
+        # Every worker hits the same key; the total must come out exact
+        with Pool(args.workers) as pool:
+            pool.map(hit_many, [(sqlite_uri, args.checks)] * args.workers)
+        storage = storage_from_string(sqlite_uri)
+        counted = FixedWindowRateLimiter(storage).get_window_stats(LIMIT, "shared-ip")
+        expected = args.workers * args.checks
+        used = LIMIT.amount - counted.remaining
+        print(f"{args.workers} processes x {args.checks} hits: counted {used} of {expected}")
+        if used != expected:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
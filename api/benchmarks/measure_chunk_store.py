@@ -0,0 +1,87 @@
+"""
+Compares the memory held by the chunk text and metadata as Python lists of strings and
+dicts (how the index cache used to be loaded from chunks.json) with a ChunkStore.
+
+Chunks are read from the extracted JSON files in output/, with the metadata setup_chroma.py
+stores for each chunk.
+
+Usage (from the api directory):
+    python benchmarks/measure_chunk_store.py [--output output]
+"""
+import argparse
+import gc
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunk_store import ChunkStore
+
+METADATA_FIELDS = ("speaker", "source", "page", "year", "chunk_index", "parliament", "session", "volume", "speech_index")
+
+
+def load_records(folder):
+    ids, documents, metadatas = [], [], []
+    for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            for i, entry in enumerate(json.load(f)):
+                ids.append(f"{os.path.basename(path)}_{i}")
+                documents.append(entry["content"])
+                metadatas.append({k: entry[k] for k in METADATA_FIELDS if entry.get(k) is not None})
+    return ids, documents, metadatas
+
+
+def traced(build):
+    """Bytes still allocated by build() once it returns, and its result."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def time_lookups(fetch, rows, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for row in rows:
+            fetch(row)
+    return (time.perf_counter() - start) / (repeat * len(rows)) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunk store memory report")
+    parser.add_argument("--output", default="output", help="Folder with the extracted chunk JSON files")
+    args = parser.parse_args()
+
+    ids, documents, metadatas = load_records(args.output)
+    serialized = json.dumps({"ids": ids, "documents": documents, "metadatas": metadatas})
+
+    dict_bytes, chunks = traced(lambda: json.loads(serialized))
+    store_bytes, store = traced(lambda: ChunkStore.from_records(ids, documents, metadatas))
+
+    with tempfile.TemporaryDirectory() as directory:
+        store.save(directory)
+        # Memory-mapped arrays live in the page cache, shared by every worker
+        mapped_bytes, mapped = traced(lambda: ChunkStore.load(directory))
+
+        rows = list(range(0, len(ids), max(1, len(ids) // 500)))
+        dict_us = time_lookups(lambda i: (chunks["documents"][i], chunks["metadatas"][i]), rows)
+        store_us = time_lookups(lambda i: (store.document(i), store.metadata(i)), rows)
+        view_us = time_lookups(store.text_view, rows)
+
+        text_bytes = sum(len(doc.encode("utf-8")) for doc in documents)
+        print(f"{len(ids)} chunks, {text_bytes / 1e6:.1f} MB of UTF-8 text")
+        print(f"{'representation':<34}{'heap MB':>10}")
+        print(f"{'lists of str + dict':<34}{dict_bytes / 1e6:>10.1f}")
+        print(f"{'ChunkStore (in memory)':<34}{store_bytes / 1e6:>10.1f}")
+        print(f"{'ChunkStore (memory-mapped)':<34}{mapped_bytes / 1e6:>10.1f}")
+        print(f"lookup per row: dicts {dict_us:.2f} us, store document+metadata {store_us:.2f} us, "
+              f"store text_view {view_us:.2f} us")
+        del mapped
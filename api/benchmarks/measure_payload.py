@@ -0,0 +1,73 @@
+"""
+Measures /api/ask response sizes for each include_quotes mode, with and without gzip.
+
+Responses are built offline from the extracted chunks in output/ (the same text the
+vector store is built from): each sample cites --sources random chunks, and the answer
+is a chunk-sized block of text, so no model or LLM call is needed.
+
+Usage (from the api directory):
+    python benchmarks/measure_payload.py [--samples 200] [--sources 5]
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from source_quotes import QUOTE_MODES, apply_quote_mode
+
+ANSWER_CHARS = 2000  # Roughly a 350-token answer (LLM_MAX_TOKENS caps it)
+
+
+def load_chunks(folder):
+    chunks = []
+    for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            chunks.extend(json.load(f))
+    return chunks
+
+
+def build_response(chunks, rng, n_sources):
+    cited = rng.sample(chunks, n_sources)
+    sources = [
+        {
+            "chunk_id": f"{c['source']}_{c['chunk_index']}",
+            "quote": c["content"],
+            "source": c["source"],
+            "page": c.get("page"),
+            "year": c.get("year"),
+            "parliament": c.get("parliament"),
+            "session": c.get("session"),
+        }
+        for c in cited
+    ]
+    answer = rng.choice(chunks)["content"][:ANSWER_CHARS]
+    return {"question": "What did you think of Confederation?", "answer": answer, "sources": sources}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--output", default="output", help="Folder with the extracted chunk JSON files")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--sources", type=int, default=5)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.output)
+    rng = random.Random(0)
+    responses = [build_response(chunks, rng, args.sources) for _ in range(args.samples)]
+
+    print(f"{args.samples} responses with {args.sources} sources each (median bytes per answer)")
+    print(f"{'include_quotes':<16}{'json':>10}{'gzip':>10}")
+    for mode in QUOTE_MODES:
+        raw, compressed = [], []
+        for response in responses:
+            body = json.dumps(dict(response, sources=apply_quote_mode(response["sources"], mode))).encode("utf-8")
+            raw.append(len(body))
+            # GZipMiddleware's default compression level
+            compressed.append(len(gzip.compress(body, compresslevel=9)))
+        print(f"{mode:<16}{statistics.median(raw):>10.0f}{statistics.median(compressed):>10.0f}")
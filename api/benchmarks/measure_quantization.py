@@ -0,0 +1,93 @@
+"""
+Memory, latency and recall of the quantized first pass (vector_quantization.py) against
+the exact float32 scan, on an exported NumPy index.
+
+Queries are the distinct questions in monitoring.db's logs, encoded with the embedding
+model. --corpus-queries N uses N chunk embeddings from the index instead, which needs no
+model; each query's own chunk is left out of its results.
+
+For each mode it reports the size of the array the first pass scans, the median and p95
+time of one query for RETRIEVAL_FETCH_K results (what main.py asks for), and recall@5 and
+recall@30: the share of the exact top results the quantized search also returns.
+
+Usage (from the api directory):
+    python benchmarks/measure_quantization.py [--index index_cache] [--corpus-queries 500] [--rescore-factor 4]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_chunker import EMBEDDING_MODEL
+from vector_index import INDEX_CACHE_DIR, NumpyIndex
+from vector_quantization import QUANTIZATIONS
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "30"))
+
+
+def logged_questions(limit):
+    with sqlite3.connect(os.path.join(API_DIR, "monitoring.db")) as conn:
+        rows = conn.execute("SELECT DISTINCT question FROM logs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [question for (question,) in rows]
+
+
+def search(index, queries, n, exclude):
+    """Top-n chunk IDs per query, without the query's own chunk, and the time of each query."""
+    found, times = [], []
+    for query, own_id in zip(queries, exclude):
+        start = time.perf_counter()
+        ids = index.query([query], n_results=n + 1, include=())["ids"][0]
+        times.append(time.perf_counter() - start)
+        found.append([chunk_id for chunk_id in ids if chunk_id != own_id][:n])
+    return found, np.array(times) * 1000
+
+
+def recall(found, exact, k):
+    return float(np.mean([len(set(f[:k]) & set(e[:k])) / len(e[:k]) for f, e in zip(found, exact)]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantized index benchmark")
+    parser.add_argument("--index", default=INDEX_CACHE_DIR, help="Exported index directory (index_cache or a snapshot)")
+    parser.add_argument("--corpus-queries", type=int, default=0, help="Use this many chunk embeddings as queries")
+    parser.add_argument("--questions", type=int, default=500, help="Maximum logged questions to use")
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    indexes = {
+        mode: NumpyIndex.load(args.index, quantization=mode, rescore_factor=args.rescore_factor)
+        for mode in QUANTIZATIONS
+    }
+    exact_index = indexes["none"]
+
+    if args.corpus_queries:
+        rows = np.random.default_rng(0).choice(exact_index.count(), min(args.corpus_queries, exact_index.count()), replace=False)
+        queries = np.asarray(exact_index.embeddings[np.sort(rows)])
+        exclude = [exact_index.store.chunk_id(row) for row in np.sort(rows)]
+    else:
+        from sentence_transformers import SentenceTransformer
+        questions = logged_questions(args.questions)
+        if not questions:
+            print("[ERROR] No logged questions; use --corpus-queries")
+            sys.exit(1)
+        queries = SentenceTransformer(EMBEDDING_MODEL).encode(questions, batch_size=64)
+        exclude = [None] * len(queries)
+
+    exact, _ = search(exact_index, queries, FETCH_K, exclude)
+    print(f"{exact_index.count()} chunks, {len(queries)} queries, {FETCH_K} results per query, "
+          f"rescore factor {args.rescore_factor}")
+    print(f"{'mode':<8}{'scanned MB':>12}{'p50 ms':>10}{'p95 ms':>10}{'recall@5':>10}{'recall@30':>11}")
+    for mode, index in indexes.items():
+        found, times = search(index, queries, FETCH_K, exclude)
+        if mode == "none":
+            scanned = index.embeddings.nbytes
+        else:
+            scanned = index.codes.nbytes + (index.scale.nbytes if index.scale is not None else 0)
+        print(f"{mode:<8}{scanned / 1e6:>12.2f}{np.median(times):>10.2f}{np.percentile(times, 95):>10.2f}"
+              f"{recall(found, exact, 5):>10.3f}{recall(found, exact, FETCH_K):>11.3f}")
@@ -0,0 +1,83 @@
+"""
+Cold-start breakdown of the API, with a regression threshold.
+
+Each run starts a fresh Python process that imports main.py (what has to happen before
+uvicorn can open its port) and then loads the background components the way the server
+does, in parallel (see startup_loader.py). Reports the median of each step over the runs:
+
+    import main                     time until the app object exists
+    import sentence_transformers    part of "model"
+    model / index / database        each component's load time (they overlap)
+    total                           all background loading
+    ready                           import main + background loading
+
+Exits with status 1 if the median import or ready time is over its threshold, so it can
+run in CI after dependency or startup changes.
+
+Usage (from the api directory):
+    python benchmarks/measure_startup.py [--runs 3] [--max-import-seconds 1.5] [--max-ready-seconds 30]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+main.startup_loader.load_all()
+stats = main.startup_loader.stats()
+stats["timings"]["import main"] = round(imported, 3)
+stats["timings"]["ready"] = round(time.perf_counter() - start, 3)
+print("STARTUP " + json.dumps(stats))
+"""
+
+
+def measure_once():
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=API_DIR, text=True, capture_output=True)
+    for line in result.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            return json.loads(line[len("STARTUP "):])
+    raise RuntimeError(f"Startup run failed:\n{result.stdout}\n{result.stderr}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-import-seconds", type=float, default=1.5,
+                        help="Fail if importing main.py (before the port opens) takes longer")
+    parser.add_argument("--max-ready-seconds", type=float, default=30.0,
+                        help="Fail if the API takes longer than this to become ready")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    for run in runs:
+        if not run["ready"]:
+            print(f"[WARNING] Not ready after loading: {run['errors']}")
+
+    steps = ["import main", "import sentence_transformers", "model", "index", "database", "total", "ready"]
+    medians = {}
+    print(f"{'step':<32}{'median s':>10}{'min s':>10}{'max s':>10}")
+    for step in steps:
+        values = [run["timings"][step] for run in runs if step in run["timings"]]
+        if not values:
+            continue
+        medians[step] = statistics.median(values)
+        print(f"{step:<32}{medians[step]:>10.2f}{min(values):>10.2f}{max(values):>10.2f}")
+
+    failed = False
+    if medians["import main"] > args.max_import_seconds:
+        print(f"[ERROR] import main took {medians['import main']:.2f}s (threshold {args.max_import_seconds}s)")
+        failed = True
+    if medians["ready"] > args.max_ready_seconds:
+        print(f"[ERROR] Ready after {medians['ready']:.2f}s (threshold {args.max_ready_seconds}s)")
+        failed = True
+    if not failed:
+        print("[SUCCESS] Startup is within budget")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,57 @@
+"""
+Reports memory use of a running gunicorn master and its workers (Linux only).
+
+RSS counts shared pages in every process that maps them, so it overstates the real
+cost of extra workers. PSS splits shared pages between the processes using them and
+is the number to compare between deployment modes.
+
+Usage:
+    python benchmarks/measure_worker_memory.py <master pid>
+"""
+import os
+import sys
+
+
+def read_rollup(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values
+
+
+def children(pid):
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The parent pid is the 4th field, after the parenthesised command name
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            found.append(int(entry))
+    return sorted(found)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    master = int(sys.argv[1])
+    total_pss = 0
+    print(f"{'process':<16}{'RSS MB':>10}{'PSS MB':>10}{'shared MB':>12}")
+    for label, pid in [("master", master)] + [(f"worker {p}", p) for p in children(master)]:
+        rollup = read_rollup(pid)
+        shared = rollup.get("Shared_Clean", 0) + rollup.get("Shared_Dirty", 0)
+        total_pss += rollup.get("Pss", 0)
+        print(f"{label:<16}{rollup.get('Rss', 0) / 1024:>10.1f}{rollup.get('Pss', 0) / 1024:>10.1f}{shared / 1024:>12.1f}")
+    print(f"{'total PSS':<16}{'':>10}{total_pss / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Compact, array-backed storage for chunk text and metadata.
+
+A list of ~15k metadata dicts repeats every key and every source name in every dict,
+and each document is its own Python string. Here instead:
+- all documents are UTF-8 encoded back to back in one uint8 buffer, with an offsets array
+- integer metadata (year, page, chunk_index, ...) lives in typed NumPy columns
+- string metadata (source, speaker, ...) is interned: an int32 code column plus one
+  vocabulary list per field
+- chunk IDs are a fixed-width bytes array, searched through a sorted permutation
+
+Every array can be saved as .npy and memory-mapped, like the embeddings in vector_index.py.
+Lookups by row return views into the buffers; dicts and strings are only built for the
+rows a caller actually asks for.
+"""
+import json
+import os
+
+import numpy as np
+
+INT_MISSING = np.iinfo(np.int32).min
+STRING_MISSING = -1
+
+MANIFEST_FILE = "chunk_store.json"
+IDS_FILE = "chunk_ids.npy"
+TEXT_FILE = "chunk_text.npy"
+OFFSETS_FILE = "chunk_offsets.npy"
+
+
+def _column_kind(values):
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "int"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "float"
+    if all(isinstance(v, str) for v in present):
+        return "str"
+    raise ValueError(f"Unsupported metadata values: {sorted({type(v).__name__ for v in present})}")
+
+
+class ChunkStore:
+    def __init__(self, ids, text, offsets, columns, kinds, vocab):
+        self.ids = ids          # (n,) bytes, row order
+        self.text = text        # (total bytes,) uint8
+        self.offsets = offsets  # (n + 1,) int64; row i is text[offsets[i]:offsets[i + 1]]
+        self.columns = columns  # field -> (n,) array
+        self.kinds = kinds      # field -> "int", "float" or "str"
+        self.vocab = vocab      # field -> list of strings, for "str" fields
+        self._vocab_codes = {field: {name: code for code, name in enumerate(names)} for field, names in vocab.items()}
+        self._id_order = np.argsort(ids, kind="stable")
+        self._sorted_ids = ids[self._id_order]
+
+    @classmethod
+    def from_records(cls, ids, documents, metadatas):
+        encoded = [doc.encode("utf-8") for doc in documents]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(doc) for doc in encoded], out=offsets[1:])
+        text = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        fields = sorted({field for meta in metadatas for field in meta})
+        columns, kinds, vocab = {}, {}, {}
+        for field in fields:
+            values = [meta.get(field) for meta in metadatas]
+            kind = _column_kind(values)
+            kinds[field] = kind
+            if kind == "int":
+                present = [v for v in values if v is not None]
+                fits = all(INT_MISSING < v <= np.iinfo(np.int32).max for v in present)
+                column = np.array([INT_MISSING if v is None else v for v in values],
+                                  dtype=np.int32 if fits else np.int64)
+            elif kind == "float":
+                column = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                names = sorted({v for v in values if v is not None})
+                codes = {name: code for code, name in enumerate(names)}
+                vocab[field] = names
+                column = np.array([STRING_MISSING if v is None else codes[v] for v in values], dtype=np.int32)
+            columns[field] = column
+
+        ids = np.array([chunk_id.encode("utf-8") for chunk_id in ids], dtype=bytes)
+        return cls(ids, text, offsets, columns, kinds, vocab)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def row(self, chunk_id):
+        """Row number of a chunk ID, or None if it isn't in the store."""
+        key = chunk_id.encode("utf-8")
+        i = int(np.searchsorted(self._sorted_ids, key))
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == key:
+            return int(self._id_order[i])
+        return None
+
+    def rows(self, chunk_ids):
+        """Row numbers of the given IDs that are in the store, in the given order."""
+        rows = (self.row(chunk_id) for chunk_id in chunk_ids)
+        return [row for row in rows if row is not None]
+
+    def chunk_id(self, row):
+        return self.ids[row].decode("utf-8")
+
+    def text_view(self, row):
+        """The row's UTF-8 text as a memoryview into the shared buffer (no copy)."""
+        return memoryview(self.text[self.offsets[row]:self.offsets[row + 1]])
+
+    def document(self, row):
+        return str(self.text_view(row), "utf-8")
+
+    def value(self, field, row):
+        """One metadata value as a Python object, or None if the row doesn't have it."""
+        value = self.columns[field][row]
+        kind = self.kinds[field]
+        if kind == "str":
+            return None if value == STRING_MISSING else self.vocab[field][value]
+        if kind == "int":
+            return None if value == INT_MISSING else int(value)
+        return None if np.isnan(value) else float(value)
+
+    def code(self, field, name):
+        """Interned code of a string value, or None if no row has it."""
+        return self._vocab_codes.get(field, {}).get(name)
+
+    def metadata(self, row):
+        meta = {}
+        for field in self.columns:
+            value = self.value(field, row)
+            if value is not None:
+                meta[field] = value
+        return meta
+
+    def nbytes(self):
+        """Bytes held by the arrays (the vocabularies are a few hundred strings and not counted)."""
+        arrays = [self.ids, self.text, self.offsets, self._id_order, self._sorted_ids, *self.columns.values()]
+        return sum(array.nbytes for array in arrays)
+
+    def save(self, directory):
+        """
+        Writes the arrays as .npy files and the column layout as JSON. Every file is written
+        under a temporary name and renamed; the manifest goes last, so a loader never reads
+        a manifest that points at files from a different export.
+        """
+        os.makedirs(directory, exist_ok=True)
+        files = {IDS_FILE: self.ids, TEXT_FILE: self.text, OFFSETS_FILE: self.offsets}
+        for field, column in self.columns.items():
+            files[f"chunk_meta_{field}.npy"] = column
+
+        for name, array in files.items():
+            tmp = os.path.join(directory, name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp, os.path.join(directory, name))
+
+        tmp = os.path.join(directory, MANIFEST_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"kinds": self.kinds, "vocab": self.vocab}, f)
+        os.replace(tmp, os.path.join(directory, MANIFEST_FILE))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        mode = "r" if mmap else None
+        with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        columns = {
+            field: np.load(os.path.join(directory, f"chunk_meta_{field}.npy"), mmap_mode=mode)
+            for field in manifest["kinds"]
+        }
+        return cls(
+            np.load(os.path.join(directory, IDS_FILE), mmap_mode=mode),
+            np.load(os.path.join(directory, TEXT_FILE), mmap_mode=mode),
+            np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode=mode),
+            columns,
+            manifest["kinds"],
+            manifest["vocab"],
+        )
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, MANIFEST_FILE))
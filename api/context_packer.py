@@ -0,0 +1,100 @@
+"""
+Token-budgeted packing of retrieved excerpts into the LLM prompt.
+
+Chunks are taken in relevance order while they fit. A chunk that doesn't fit is
+trimmed at a sentence boundary instead of being cut mid-sentence or dropped entirely,
+and smaller, less relevant chunks after it still get the budget that is left.
+"""
+import re
+
+# Same simple sentence splitter as the chunkers use
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+# Don't bother adding a trimmed excerpt smaller than this many tokens
+MIN_TRIMMED_TOKENS = 40
+
+
+def make_token_counter(tokenizer):
+    """
+    Returns a count_tokens(text) function backed by a local Hugging Face tokenizer
+    (e.g. embedder.tokenizer). It's an estimate of the LLM's own count, not an exact match.
+    """
+    def count_tokens(text):
+        if not text:
+            return 0
+        # verbose=False silences the "sequence longer than max length" warning
+        return len(tokenizer.encode(text, add_special_tokens=False, verbose=False))
+    return count_tokens
+
+
+def truncate_words(text, max_tokens, count_tokens):
+    """
+    Returns the longest prefix of whole words from `text` that fits in `max_tokens`, along
+    with its token count (a binary search, so only a few count_tokens calls).
+    """
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle])) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    prefix = " ".join(words[:low])
+    return prefix, count_tokens(prefix)
+
+
+def trim_to_sentences(text, max_tokens, count_tokens):
+    """
+    Returns the longest prefix of whole sentences from `text` that fits in `max_tokens`,
+    along with its token count. If not even the first sentence fits, it is cut at the
+    last word that does.
+    """
+    kept = []
+    used = 0
+    for sentence in SENTENCE_SPLIT.split(text.strip()):
+        if not sentence:
+            continue
+        sentence_tokens = count_tokens(sentence)
+        if used + sentence_tokens > max_tokens:
+            if not kept:
+                return truncate_words(sentence, max_tokens, count_tokens)
+            break
+        kept.append(sentence)
+        used += sentence_tokens
+    return " ".join(kept), used
+
+
+def pack_context(chunks, token_budget, count_tokens, format_excerpt):
+    """
+    Fills `token_budget` with excerpts, most relevant first.
+
+    chunks: list of (doc, meta) tuples, already sorted by relevance.
+    format_excerpt: function (doc, meta) -> the excerpt text as it will appear in the prompt.
+
+    Returns (excerpts, tokens_used), where excerpts is a list of formatted strings.
+    """
+    excerpts = []
+    used = 0
+
+    for doc, meta in chunks:
+        remaining = token_budget - used
+        if remaining <= 0:
+            break
+
+        excerpt = format_excerpt(doc, meta)
+        excerpt_tokens = count_tokens(excerpt)
+        if excerpt_tokens <= remaining:
+            excerpts.append(excerpt)
+            used += excerpt_tokens
+            continue
+
+        # Doesn't fit whole: keep as many full sentences as the remaining budget allows
+        header_tokens = count_tokens(format_excerpt("", meta))
+        trimmed, trimmed_tokens = trim_to_sentences(doc, remaining - header_tokens, count_tokens)
+        if trimmed and trimmed_tokens >= MIN_TRIMMED_TOKENS:
+            excerpts.append(format_excerpt(trimmed, meta))
+            used += header_tokens + trimmed_tokens
+        # A shorter, less relevant chunk may still fit in what is left
+
+    return excerpts, used
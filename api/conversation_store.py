@@ -0,0 +1,149 @@
+"""
+Server-side storage for follow-up conversations.
+
+A session keeps its most recent turns verbatim (question, answer and the IDs of the
+chunks retrieved for it) and folds older turns into a short running summary, so the
+conversation history added to the prompt stays bounded however long the session runs.
+Sessions expire after SESSION_TTL_SECONDS without activity.
+
+Stored in monitoring.db so every API worker sees the same sessions.
+"""
+import json
+import os
+import re
+import secrets
+import sqlite3
+import time
+
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+# Turns kept verbatim; older ones are compacted into the summary
+RECENT_TURNS = 2
+# Compacted turns kept in the summary (oldest are dropped first)
+SUMMARY_MAX_LINES = 8
+SUMMARY_ANSWER_CHARS = 200
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+def setup_conversation_database(conn: sqlite3.Connection):
+    """
+    Creates the conversation tables if they don't exist.
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS conversations (
+            session_id TEXT PRIMARY KEY,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_active REAL NOT NULL,
+            summary TEXT NOT NULL DEFAULT ''
+        )
+        """)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS conversation_turns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL REFERENCES conversations(session_id),
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            chunk_ids TEXT NOT NULL
+        )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversation_turns_session ON conversation_turns(session_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversations_last_active ON conversations(last_active)")
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"[ERROR] Conversation database setup failed: {e}")
+
+
+def purge_expired_sessions(conn: sqlite3.Connection, ttl: int = SESSION_TTL_SECONDS) -> int:
+    """Deletes sessions (and their turns) inactive for longer than `ttl` seconds."""
+    cutoff = time.time() - ttl
+    with conn:
+        conn.execute(
+            "DELETE FROM conversation_turns WHERE session_id IN "
+            "(SELECT session_id FROM conversations WHERE last_active < ?)",
+            (cutoff,)
+        )
+        cursor = conn.execute("DELETE FROM conversations WHERE last_active < ?", (cutoff,))
+    return cursor.rowcount
+
+
+def create_session(conn: sqlite3.Connection) -> str:
+    """Starts a new session and returns its ID. Expired sessions are purged first."""
+    purge_expired_sessions(conn)
+    session_id = secrets.token_urlsafe(16)
+    with conn:
+        conn.execute(
+            "INSERT INTO conversations (session_id, last_active) VALUES (?, ?)",
+            (session_id, time.time())
+        )
+    return session_id
+
+
+def load_session(conn: sqlite3.Connection, session_id: str, ttl: int = SESSION_TTL_SECONDS):
+    """
+    Returns {"summary": str, "turns": [{"question", "answer", "chunk_ids"}, ...]} with the
+    recent turns oldest first, or None if the session doesn't exist or has expired.
+    """
+    row = conn.execute(
+        "SELECT summary, last_active FROM conversations WHERE session_id = ?", (session_id,)
+    ).fetchone()
+    if row is None or row[1] < time.time() - ttl:
+        return None
+
+    turns = conn.execute(
+        "SELECT question, answer, chunk_ids FROM conversation_turns WHERE session_id = ? ORDER BY id",
+        (session_id,)
+    ).fetchall()
+    return {
+        "summary": row[0],
+        "turns": [
+            {"question": question, "answer": answer, "chunk_ids": json.loads(chunk_ids)}
+            for question, answer, chunk_ids in turns
+        ],
+    }
+
+
+def summarize_turn(question, answer):
+    """One summary line for a compacted turn: the question and the opening of the answer."""
+    # One line per turn, whatever whitespace the texts contain
+    question = " ".join(question.split())
+    opening = " ".join(SENTENCE_SPLIT.split(answer.strip(), 1)[0].split())
+    if len(opening) > SUMMARY_ANSWER_CHARS:
+        opening = opening[:SUMMARY_ANSWER_CHARS].rsplit(" ", 1)[0] + "…"
+    return f"- Asked: {question} / I said: {opening}"
+
+
+def add_turn(conn: sqlite3.Connection, session_id: str, question: str, answer: str, chunk_ids: list):
+    """
+    Records a turn and compacts everything but the last RECENT_TURNS into the summary.
+    A session purged since it was loaded (another request's create_session) is recreated,
+    so the session_id the client was just given keeps working.
+    """
+    with conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO conversations (session_id, last_active) VALUES (?, ?)",
+            (session_id, time.time())
+        )
+        conn.execute(
+            "INSERT INTO conversation_turns (session_id, question, answer, chunk_ids) VALUES (?, ?, ?, ?)",
+            (session_id, question, answer, json.dumps(chunk_ids))
+        )
+        old_turns = conn.execute(
+            "SELECT id, question, answer FROM conversation_turns WHERE session_id = ? "
+            "ORDER BY id DESC LIMIT -1 OFFSET ?",
+            (session_id, RECENT_TURNS)
+        ).fetchall()
+
+        summary = conn.execute(
+            "SELECT summary FROM conversations WHERE session_id = ?", (session_id,)
+        ).fetchone()[0]
+        if old_turns:
+            lines = summary.splitlines() + [summarize_turn(q, a) for _, q, a in reversed(old_turns)]
+            summary = "\n".join(lines[-SUMMARY_MAX_LINES:])
+            conn.executemany("DELETE FROM conversation_turns WHERE id = ?", [(turn_id,) for turn_id, _, _ in old_turns])
+
+        conn.execute(
+            "UPDATE conversations SET summary = ?, last_active = ? WHERE session_id = ?",
+            (summary, time.time(), session_id)
+        )
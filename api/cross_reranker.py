@@ -0,0 +1,140 @@
+"""
+Optional second retrieval stage: a small local cross-encoder rescores the over-fetched
+candidates, reading the question and each chunk together rather than comparing two
+independently computed embeddings.
+
+Scoring runs under a per-question time budget. Candidates are scored in small batches,
+each cut to the number of pairs that should still finish inside the budget going by the
+time per pair measured so far; until anything has been timed, one pair is scored to
+measure it. If the budget runs out first, the caller keeps the first-stage (embedding)
+order. Scores are cached per (question hash, chunk ID), so a repeated question, or one
+whose scoring ran out of budget last time, needs fewer model calls.
+
+The scores are the model's sigmoid outputs, not cosine similarities; mmr_select maps them
+onto the range of the candidates' cosine similarities before trading them off against
+redundancy.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from question_utils import normalize_question
+
+
+def question_hash(question):
+    return hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name, budget_ms=150, batch_size=8, cache_size=20000):
+        self.model_name = model_name
+        self.budget = budget_ms / 1000
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.model = None
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # Running estimate of the scoring time per (question, chunk) pair, used to size batches
+        self._pair_seconds = None
+
+        self.calls = 0
+        self.reranked = 0
+        self.over_budget = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total_ms = 0.0
+
+    def load(self):
+        # Imported here so deployments without the reranker never load it
+        from sentence_transformers import CrossEncoder
+        model = CrossEncoder(self.model_name)
+        model.predict([("warm up", "warm up")])
+        self.model = model
+        print(f"✅ Reranker {self.model_name} loaded")
+
+    def _cached(self, key):
+        with self._lock:
+            score = self._cache.get(key)
+            if score is None:
+                self.cache_misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return score
+
+    def _store(self, keys, scores):
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._cache[key] = score
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def score(self, question, chunk_ids, documents):
+        """
+        Relevance of each document to the question, between 0 and 1 (the model's sigmoid
+        output; see the module docstring for how MMR uses it).
+        Returns None if the model isn't loaded, fails, or the budget runs out.
+        """
+        if self.model is None:
+            return None
+        start = time.perf_counter()
+        deadline = start + self.budget
+        self.calls += 1
+
+        prefix = question_hash(question)
+        keys = [(prefix, chunk_id) for chunk_id in chunk_ids]
+        scores = [self._cached(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        try:
+            offset = 0
+            while offset < len(missing):
+                remaining = deadline - time.perf_counter()
+                if self._pair_seconds is None:
+                    size = 1 if remaining > 0 else 0
+                else:
+                    size = min(self.batch_size, int(remaining / self._pair_seconds))
+                if size < 1:
+                    self.over_budget += 1
+                    return None
+                batch = missing[offset:offset + size]
+                offset += len(batch)
+                batch_start = time.perf_counter()
+                batch_scores = self.model.predict(
+                    [(question, documents[i]) for i in batch], batch_size=len(batch), show_progress_bar=False
+                ).tolist()
+                per_pair = (time.perf_counter() - batch_start) / len(batch)
+                # Smoothed so one slow batch doesn't switch reranking off for everyone
+                self._pair_seconds = per_pair if self._pair_seconds is None else 0.8 * self._pair_seconds + 0.2 * per_pair
+                self._store([keys[i] for i in batch], batch_scores)
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = score
+        except Exception as e:
+            self.errors += 1
+            print(f"[ERROR] Reranking failed: {e}")
+            return None
+        finally:
+            self.total_ms += (time.perf_counter() - start) * 1000
+
+        self.reranked += 1
+        return scores
+
+    def stats(self):
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "model": self.model_name,
+            "loaded": self.model is not None,
+            "budget_ms": round(self.budget * 1000),
+            "calls": self.calls,
+            "reranked": self.reranked,
+            "over_budget": self.over_budget,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / self.calls, 1) if self.calls else None,
+            "pair_ms_estimate": round(self._pair_seconds * 1000, 2) if self._pair_seconds is not None else None,
+            "cache_size": len(self._cache),
+            "cache_hit_rate": round(self.cache_hits / lookups, 3) if lookups else None,
+        }
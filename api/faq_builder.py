@@ -0,0 +1,208 @@
+"""
+Batch job that pre-generates answers for the most frequently asked questions.
+
+1. Reads successful questions from the logs table (the last --days days).
+2. Groups phrasings of the same question by embedding similarity.
+3. Answers the most popular groups through the normal pipeline (retrieval + LLM).
+4. Replaces the faq_entries / faq_keys tables with the results. A question whose answer
+   can't be regenerated keeps its current answer, and if no answer could be generated at
+   all (e.g. the LLM is down) the current FAQ is left as it is.
+
+The API picks up the new answers on its next FAQ refresh (FAQ_REFRESH_SECONDS).
+
+Usage (from the api directory):
+    python faq_builder.py [--top 50] [--min-count 3] [--days 30]
+    python faq_builder.py --loop 86400     # rebuild once a day
+"""
+import argparse
+import json
+import re
+import sqlite3
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from faq_cache import setup_faq_database
+from question_utils import normalize_question
+from usage_logger import DB_PATH
+
+# Two phrasings with embeddings at least this similar count as the same question.
+# High on purpose: a phrasing served the wrong cached answer is worse than a cache miss.
+SIMILARITY_THRESHOLD = 0.95
+# Merged clusters printed by build_faq for review
+REPORT_EXAMPLES = 10
+
+NUMBER_PATTERN = re.compile(r"\d+")
+
+
+def question_numbers(key):
+    """Years and other numbers in a question; phrasings only merge if these are the same."""
+    return frozenset(NUMBER_PATTERN.findall(key))
+
+
+def mine_questions(conn, days):
+    """
+    Returns a Counter of normalized question -> times asked, and the most common
+    original wording of each normalized question.
+    """
+    since = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    rows = conn.execute(
+        "SELECT question FROM logs WHERE is_successful = 1 AND timestamp >= ?", (since,)
+    ).fetchall()
+
+    counts = Counter()
+    wordings = {}
+    for (question,) in rows:
+        if not question:
+            continue
+        key = normalize_question(question)
+        counts[key] += 1
+        wordings.setdefault(key, Counter())[question.strip()] += 1
+    return counts, {key: c.most_common(1)[0][0] for key, c in wordings.items()}
+
+
+def cluster_questions(keys, embeddings, counts, threshold=SIMILARITY_THRESHOLD):
+    """
+    Greedy clustering: the most asked questions become cluster leaders, and every other
+    question joins the most similar leader that mentions the same numbers (so "the election
+    of 1872" and "the election of 1878" stay apart however close their embeddings are).
+    Returns a list of clusters (lists of keys, leader first), most asked first.
+    """
+    order = sorted(range(len(keys)), key=lambda i: -counts[keys[i]])
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+    leaders = []   # indices into keys
+    clusters = []
+    for i in order:
+        if leaders:
+            similarities = embeddings[leaders] @ embeddings[i]
+            numbers = question_numbers(keys[i])
+            for j, leader in enumerate(leaders):
+                if question_numbers(keys[leader]) != numbers:
+                    similarities[j] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] >= threshold:
+                clusters[best].append(keys[i])
+                continue
+        leaders.append(i)
+        clusters.append([keys[i]])
+
+    clusters.sort(key=lambda members: -sum(counts[k] for k in members))
+    return clusters
+
+
+def report_merges(clusters, wordings, counts):
+    """
+    Prints how many clusters merge differently worded questions (exact repeats of a
+    normalized question are always one key), with the biggest ones for review.
+    Returns (merged clusters, phrasings merged into another question's answer).
+    """
+    merged = [members for members in clusters if len(members) > 1]
+    phrasings = sum(len(members) - 1 for members in merged)
+    asks = sum(counts[k] for members in merged for k in members[1:])
+    print(f"[INFO] {len(merged)} of {len(clusters)} clusters merge different wordings: "
+          f"{phrasings} phrasings ({asks} asks) share another question's answer")
+    for members in merged[:REPORT_EXAMPLES]:
+        print(f"  '{wordings[members[0]]}' <- " + "; ".join(f"'{wordings[k]}'" for k in members[1:]))
+    return len(merged), phrasings
+
+
+def current_answers(conn):
+    """
+    The FAQ being served, by question key: (answer, sources JSON, model, generated_at).
+    """
+    rows = conn.execute("""
+    SELECT k.question_key, e.answer, e.sources, e.llm_model_used, e.generated_at
+    FROM faq_keys k JOIN faq_entries e ON e.id = k.faq_id
+    """).fetchall()
+    return {key: tuple(row) for key, *row in rows}
+
+
+def build_faq(db_path=DB_PATH, top=50, min_count=3, days=30):
+    # Imported here so --help doesn't load the model
+    import main
+    # Loads the model and index (the API does this in the background at startup)
+    if not main.startup_loader.load_all():
+        raise RuntimeError(f"Could not load the model: {main.startup_loader.errors}")
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL;")
+        setup_faq_database(conn)
+
+        counts, wordings = mine_questions(conn, days)
+        if not counts:
+            print("[INFO] No logged questions to build an FAQ from.")
+            return 0
+        keys = list(counts)
+        embeddings = np.asarray(main.embedder.encode(keys, batch_size=64))
+        clusters = cluster_questions(keys, embeddings, counts)
+        report_merges(clusters, wordings, counts)
+
+        current = current_answers(conn)
+        entries = []
+        answered = failed = 0
+        for members in clusters:
+            times_asked = sum(counts[k] for k in members)
+            if times_asked < min_count or len(entries) >= top:
+                break
+            question = wordings[members[0]]
+            try:
+                result = main.generate_answer(
+                    question, main.RETRIEVAL_TOP_K, main.RETRIEVAL_DIVERSITY, main.CONTEXT_EXPANSION
+                )
+            except main.AnswerError as e:
+                failed += 1
+                # Keep serving the current answer to any phrasing in the cluster
+                previous = next((current[key] for key in members if key in current), None)
+                if previous is None:
+                    print(f"[WARNING] Skipping '{question}': {e}")
+                    continue
+                print(f"[WARNING] Keeping the current answer to '{question}': {e}")
+                entries.append((question, *previous, members, times_asked))
+                continue
+            answered += 1
+            entries.append((question, result["answer"], json.dumps(main.format_sources(result["hits"])),
+                            result["model"], None, members, times_asked))
+            print(f"[SUCCESS] Answered '{question}' ({times_asked} asks, {len(members)} phrasings)")
+
+        if failed and not answered:
+            print(f"[ERROR] No answers could be generated ({failed} failed); keeping the current FAQ")
+            return 0
+
+        # Swap the whole FAQ in one transaction so the API never loads a half-built set
+        with conn:
+            conn.execute("DELETE FROM faq_keys")
+            conn.execute("DELETE FROM faq_entries")
+            for question, answer, sources, model, generated_at, members, times_asked in entries:
+                cursor = conn.execute(
+                    "INSERT INTO faq_entries (generated_at, question, answer, sources, llm_model_used, times_asked) "
+                    "VALUES (COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?, ?)",
+                    (generated_at, question, answer, sources, model, times_asked)
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO faq_keys (question_key, faq_id) VALUES (?, ?)",
+                    [(key, cursor.lastrowid) for key in members]
+                )
+        print(f"[SUCCESS] FAQ rebuilt with {len(entries)} entries ({len(entries) - answered} kept from the last build)")
+        return len(entries)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate answers for frequent questions")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--top", type=int, default=50, help="Maximum number of FAQ entries")
+    parser.add_argument("--min-count", type=int, default=3, help="Minimum times a question was asked")
+    parser.add_argument("--days", type=int, default=30, help="How far back to look in the logs")
+    parser.add_argument("--loop", type=int, default=0, help="Rebuild every N seconds")
+    args = parser.parse_args()
+
+    while True:
+        build_faq(args.db, args.top, args.min_count, args.days)
+        if not args.loop:
+            break
+        time.sleep(args.loop)
@@ -0,0 +1,92 @@
+"""
+Read-only fast path for frequently asked questions.
+
+faq_builder.py pre-generates answers for the most common questions and stores them in
+the faq_entries / faq_keys tables. The API loads them into memory at startup (and on a
+schedule afterwards) and checks every incoming question against them before doing any
+retrieval or LLM work. A hit is a dictionary lookup on the normalized question.
+"""
+import json
+import sqlite3
+import threading
+
+from question_utils import normalize_question
+
+
+def setup_faq_database(conn: sqlite3.Connection):
+    """
+    Creates the tables holding pre-generated answers, if they don't exist.
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS faq_entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            generated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            sources TEXT,
+            llm_model_used TEXT,
+            times_asked INTEGER
+        )
+        """)
+        # Every phrasing of a question that maps to an entry
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS faq_keys (
+            question_key TEXT PRIMARY KEY,
+            faq_id INTEGER NOT NULL REFERENCES faq_entries(id)
+        )
+        """)
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"[ERROR] FAQ database setup failed: {e}")
+
+
+class FaqCache:
+    def __init__(self):
+        self._answers = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def load(self, conn: sqlite3.Connection):
+        """
+        Reads all entries into a new dict and swaps it in, so lookups never see a partial load.
+        """
+        try:
+            rows = conn.execute("""
+            SELECT k.question_key, e.question, e.answer, e.sources, e.llm_model_used
+            FROM faq_keys k JOIN faq_entries e ON e.id = k.faq_id
+            """).fetchall()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Failed to load FAQ answers: {e}")
+            return
+        answers = {}
+        for key, question, answer, sources_json, model in rows:
+            answers[key] = {
+                "question": question,
+                "answer": answer,
+                "sources": json.loads(sources_json) if sources_json else [],
+                "model": model,
+            }
+        self._answers = answers
+        print(f"[INFO] Loaded {len(answers)} FAQ question phrasings")
+
+    def lookup(self, question):
+        """
+        Returns the pre-generated entry for `question`, or None.
+        """
+        entry = self._answers.get(normalize_question(question))
+        with self._lock:
+            self.lookups += 1
+            if entry is not None:
+                self.hits += 1
+        return entry
+
+    def stats(self):
+        return {
+            "phrasings": len(self._answers),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else None,
+        }
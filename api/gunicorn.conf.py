@@ -0,0 +1,37 @@
+"""
+Gunicorn configuration for running several workers that share one copy of the
+embedding model and vector index.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+preload_app imports main.py once in the master process, and when_ready loads the
+SentenceTransformer weights and the memory-mapped NumPy index (INDEX_BACKEND=numpy)
+there before the workers are forked, so they are shared copy-on-write. Each worker
+opens its own database connections after the fork.
+"""
+import os
+
+# The NumPy index is the one that can be shared; Chroma's own index can't
+os.environ.setdefault("INDEX_BACKEND", "numpy")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '7860')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# LLM calls can take up to a minute
+timeout = 120
+graceful_timeout = 30
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before any worker is forked.
+    # Loads synchronously, so the workers inherit everything and are ready at once.
+    import main
+    main.startup_loader.load_all()
+    if main.startup_loader.failed():
+        # gunicorn exits with status 1 on a RuntimeError here, instead of forking workers
+        # that could never serve a question
+        raise RuntimeError(f"Could not load {main.startup_loader.failed()}: {main.startup_loader.errors}")
+    if main.startup_loader.status["index"] != "ready":
+        server.log.warning("Vector index could not be loaded before forking workers")
+    server.log.info(f"Loaded in the master process: {main.startup_loader.timings}")
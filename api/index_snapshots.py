@@ -0,0 +1,178 @@
+"""
+Versioned, immutable index snapshots.
+
+Each ingestion run builds a complete index into its own directory under snapshots/:
+
+    snapshots/
+        20261019T120000Z/       one snapshot, never modified once published
+            chroma_store/       the Chroma collection
+            embeddings.npy ...  the NumPy export (see vector_index.py / chunk_store.py)
+            snapshot.json       version, creation time, chunk count
+        CURRENT                 name of the active snapshot
+        PREVIOUS                name of the snapshot active before it
+
+A snapshot is built under a temporary name and renamed into place when complete, and
+CURRENT is replaced atomically, so a reader always sees either the old snapshot or the
+new one. The API swaps to a newly published snapshot without restarting (see
+reload_index in main.py); requests already running finish on the snapshot they started with.
+
+Usage (from the api directory):
+    python index_snapshots.py list
+    python index_snapshots.py publish <version>   # roll back or forward
+    python index_snapshots.py gc [--keep 2]
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_ROOT = os.path.join(API_DIR, "snapshots")
+CURRENT_FILE = "CURRENT"
+# The snapshot CURRENT named before the last publish; API processes may still be serving it
+PREVIOUS_FILE = "PREVIOUS"
+MANIFEST_FILE = "snapshot.json"
+BUILDING_SUFFIX = ".building"
+# Published snapshots kept by gc_snapshots, including the active one (the rest allow rollback)
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "2"))
+# Unfinished build directories older than this are left over from failed runs
+STALE_BUILD_SECONDS = 24 * 3600
+
+
+def new_version(root=SNAPSHOT_ROOT):
+    """
+    A new version name, reserved by creating its build directory; names sort in creation
+    order. Builds started in the same second get a -01, -02, ... suffix.
+    """
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    os.makedirs(root, exist_ok=True)
+    suffix = 0
+    while True:
+        version = f"{stamp}-{suffix:02d}" if suffix else stamp
+        if not os.path.exists(snapshot_dir(version, root)):
+            try:
+                os.mkdir(building_dir(version, root))
+                return version
+            except FileExistsError:
+                pass
+        suffix += 1
+
+
+def snapshot_dir(version, root=SNAPSHOT_ROOT):
+    return os.path.join(root, version)
+
+
+def building_dir(version, root=SNAPSHOT_ROOT):
+    return os.path.join(root, version + BUILDING_SUFFIX)
+
+
+def list_versions(root=SNAPSHOT_ROOT):
+    """Published (complete) snapshots, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if os.path.exists(os.path.join(root, name, MANIFEST_FILE))
+    )
+
+
+def read_manifest(version, root=SNAPSHOT_ROOT):
+    with open(os.path.join(snapshot_dir(version, root), MANIFEST_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_version(root, name):
+    try:
+        with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def current_version(root=SNAPSHOT_ROOT):
+    """The active snapshot's version, or None if no snapshot has been published."""
+    return _read_version(root, CURRENT_FILE)
+
+
+def _write_version(root, name, version):
+    tmp = os.path.join(root, f"{name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(root, name))
+
+
+def finish_build(version, chunk_count, root=SNAPSHOT_ROOT):
+    """
+    Writes the manifest and renames the build directory to its final name, which makes
+    the snapshot visible to list_versions. Does not make it active; see publish.
+    """
+    path = building_dir(version, root)
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({"version": version, "created": datetime.utcnow().isoformat() + "Z", "chunks": chunk_count}, f)
+    os.rename(path, snapshot_dir(version, root))
+
+
+def publish(version, root=SNAPSHOT_ROOT):
+    """Makes `version` the active snapshot. API processes pick it up on their next check."""
+    if version not in list_versions(root):
+        raise ValueError(f"No published snapshot named {version}")
+    active = current_version(root)
+    if active is not None and active != version:
+        _write_version(root, PREVIOUS_FILE, active)
+    _write_version(root, CURRENT_FILE, version)
+    print(f"[SUCCESS] Index snapshot {version} is now active")
+
+
+def gc_snapshots(keep=SNAPSHOT_KEEP, root=SNAPSHOT_ROOT):
+    """
+    Deletes all but the `keep` newest snapshots, plus build directories left over from
+    failed runs. The active snapshot and the one active before it are never deleted: API
+    processes keep serving the previous one until their next check (INDEX_WATCH_SECONDS),
+    and requests that started on it finish on it. Deleting a snapshot a process still
+    reads is only safe with the numpy backend, whose memory-mapped files stay readable;
+    Chroma opens its files as it queries.
+    Returns the deleted versions.
+    """
+    versions = list_versions(root)
+    keep_set = set(versions[-keep:]) if keep > 0 else set()
+    keep_set.update({current_version(root), _read_version(root, PREVIOUS_FILE)})
+
+    deleted = []
+    for version in versions:
+        if version not in keep_set:
+            shutil.rmtree(snapshot_dir(version, root), ignore_errors=True)
+            deleted.append(version)
+    if os.path.isdir(root):
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            # Recent build directories may belong to an ingestion that is still running
+            if name.endswith(BUILDING_SUFFIX) and time.time() - os.path.getmtime(path) > STALE_BUILD_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+    if deleted:
+        print(f"[INFO] Deleted old index snapshots: {', '.join(deleted)}")
+    return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage index snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list")
+    publish_parser = subparsers.add_parser("publish")
+    publish_parser.add_argument("version")
+    gc_parser = subparsers.add_parser("gc")
+    gc_parser.add_argument("--keep", type=int, default=SNAPSHOT_KEEP)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        active = current_version()
+        for version in list_versions():
+            manifest = read_manifest(version)
+            marker = "*" if version == active else " "
+            print(f"{marker} {version}  {manifest.get('chunks')} chunks  created {manifest.get('created')}")
+    elif args.command == "publish":
+        publish(args.version)
+    else:
+        gc_snapshots(args.keep)
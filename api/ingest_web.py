@@ -1,11 +1,19 @@
-import requests
-from bs4 import BeautifulSoup
-import uuid
-import chromadb
-from sentence_transformers import SentenceTransformer
-from tqdm import tqdm
+"""
+Adds the biography web pages below to the index.
+Safe to re-run: each source's previous chunks are replaced by the new ones.
+
+The chunks go into a new copy of the active index snapshot, which is then published (see
+ingest_snapshot in ingestion/pipeline.py); run_ingestion.py includes these sources too.
+
+Usage (from the api directory):
+    python ingest_web.py               # build and publish a new snapshot
+    python ingest_web.py --no-publish  # build only
+"""
+import argparse
 from urllib.parse import urlparse
 
+from ingestion import ingest_snapshot, UrlSource
+
 # === CONFIGURATION ===
 WEB_URLS = [
     "https://www.thecanadianencyclopedia.ca/en/article/sir-john-alexander-macdonald",
@@ -22,130 +30,24 @@ SOURCE_NAMES = {
     "en.wikipedia.org": "macdonald_wikipedia"
 }
 
-CHUNK_SIZE = 500  # words
-COLLECTION_NAME = "macdonald_speeches"
-PERSIST_DIR = "./chroma_store"
-
-# === SETUP ===
-print("[INFO] Loading embedding model and ChromaDB...")
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-
-client = chromadb.PersistentClient(path=PERSIST_DIR)
-
-collection = client.get_or_create_collection(name=COLLECTION_NAME)
-
-# === HELPERS ===
+YEAR = 2024  # You can customize this per source if needed
 
-def chunk_text(text, chunk_size=500):
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), chunk_size):
-        chunk = " ".join(words[i:i+chunk_size])
-        chunks.append(chunk)
-    return chunks
 
 def get_source_name(url):
     """Extract source name from URL"""
-    domain = urlparse(url).netloc
-    return SOURCE_NAMES.get(domain, domain.replace("www.", ""))
-
-def extract_visible_text(url):
-    """Extract text from web page with site-specific handling"""
-    print(f"[INFO] Fetching {url}...")
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-
-        print(f"[INFO] Response length: {len(response.text)} characters")
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Site-specific handling
-        if 'wikipedia.org' in url:
-            # Wikipedia-specific extraction (as before)
-            for tag in soup(['script', 'style', 'sup', 'table']):
-                tag.decompose()
-            content_div = soup.find('div', {'id': 'mw-content-text'})
-            if content_div:
-                text = content_div.get_text(separator=' ', strip=True)
-            else:
-                text = soup.get_text(separator=' ', strip=True)
-
-        elif 'thecanadianencyclopedia.ca' in url:
-            # Canadian Encyclopedia - focus on article content
-            for tag in soup(['script', 'style', 'nav', 'footer']):
-                tag.decompose()
-            article = soup.find('article') or soup.find('div', class_='article-content')
-            if article:
-                text = article.get_text(separator=' ', strip=True)
-            else:
-                text = soup.get_text(separator=' ', strip=True)
-
-        elif 'johnamacdonald.org' in url:
-            # John A MacDonald site - minimal filtering
-            for tag in soup(['script', 'style']):
-                tag.decompose()
-            text = soup.get_text(separator=' ', strip=True)
-
-        else:
-            # Default handling for other sites
-            for tag in soup(['script', 'style', 'header', 'footer', 'nav', 'aside']):
-                tag.decompose()
-            text = soup.get_text(separator=' ', strip=True)
-
-        print(f"[INFO] Extracted text length: {len(text)} characters")
-        return text
-
-    except Exception as e:
-        print(f"[ERROR] Error processing {url}: {e}")
-        return ""
-
-def process_web_url(url):
-    """Process a single web URL"""
-    source_name = get_source_name(url)
-    print(f"[INFO] Processing {source_name} from {url}...")
-
-    raw_text = extract_visible_text(url)
-    if not raw_text:
-        return 0
-
-    chunks = chunk_text(raw_text, CHUNK_SIZE)
-    total_chunks = 0
-
-    for chunk_index, chunk in enumerate(tqdm(chunks, desc=f"[INFO] Processing {source_name} chunks")):
-        if chunk.strip():  # Only process non-empty chunks
-            embedding = embedder.encode(chunk).tolist()
-            chunk_id = str(uuid.uuid4())
-
-            metadata = {
-                "source": source_name,
-                "chunk_index": chunk_index,
-                "year": 2024,  # You can customize this per source if needed
-                "speaker": "Narrator",
-                "url": url
-            }
-
-            collection.add(
-                ids=[chunk_id],
-                embeddings=[embedding],
-                documents=[chunk],
-                metadatas=[metadata]
-            )
-            total_chunks += 1
+    domain = urlparse(url).netloc.replace("www.", "")
+    return SOURCE_NAMES.get(domain, domain)
 
-    return total_chunks
 
-# === MAIN LOGIC ===
+def web_sources():
+    return [UrlSource(url, source_name=get_source_name(url), year=YEAR) for url in WEB_URLS]
 
-print("[INFO] Starting web content ingestion from URLs...")
-grand_total = 0
 
-for url in WEB_URLS:
-    chunks_added = process_web_url(url)
-    grand_total += chunks_added
-    print(f"[SUCCESS] Added {chunks_added} chunks from {get_source_name(url)}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add the web pages to the index")
+    parser.add_argument("--no-publish", action="store_true", help="Build the snapshot without making it active")
+    args = parser.parse_args()
 
-print(f"\n[SUCCESS] Ingestion complete! Total chunks added: {grand_total}")
+    print("[INFO] Starting web content ingestion from URLs...")
+    version, total = ingest_snapshot(web_sources(), publish_snapshot=not args.no_publish)
+    print(f"\n[SUCCESS] Ingestion complete! Total chunks upserted: {total}")
@@ -0,0 +1,27 @@
+"""
+Ingestion framework for adding web pages and PDFs to the index.
+
+Sources are described by adapters (UrlSource, LocalFileSource, LocalPdfSource), fetched
+concurrently, chunked, embedded in batches and stored under content-derived IDs. Each
+source's previous chunks are replaced, so running the same ingestion twice, or again
+after a page was edited, doesn't leave duplicate or stale chunks behind. ingest_snapshot() adds them
+to a new copy of the active index snapshot and publishes it.
+
+    from ingestion import ingest_snapshot, UrlSource
+    ingest_snapshot([UrlSource("https://example.org/page.html", source_name="example")])
+"""
+from ingestion.adapters import Document, SourceAdapter, UrlSource, LocalFileSource, LocalPdfSource
+from ingestion.pipeline import ingest, ingest_snapshot, fetch_all, chunk_documents, chunk_id
+
+__all__ = [
+    "Document",
+    "SourceAdapter",
+    "UrlSource",
+    "LocalFileSource",
+    "LocalPdfSource",
+    "ingest",
+    "ingest_snapshot",
+    "fetch_all",
+    "chunk_documents",
+    "chunk_id",
+]
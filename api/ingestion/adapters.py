@@ -0,0 +1,145 @@
+"""
+Source adapters: each one knows how to load one kind of source into a Document.
+
+Adding a new kind of source means writing a SourceAdapter subclass with an async
+load(client) method; the pipeline takes care of chunking, embedding and storage.
+"""
+import abc
+import asyncio
+import os
+from urllib.parse import urlparse
+
+import fitz  # PyMuPDF
+from bs4 import BeautifulSoup
+
+# Browser-like User-Agent; some of the sites refuse the default one
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+class Document:
+    """
+    Text loaded from one source, split into pages.
+    pages: list of (page_number, text); page_number is None for sources without pages.
+    metadata: stored on every chunk (source, year, speaker, url, ...).
+    """
+    def __init__(self, pages, metadata):
+        self.pages = pages
+        self.metadata = metadata
+
+    @property
+    def source(self):
+        return self.metadata["source"]
+
+    @property
+    def where(self):
+        """
+        Chroma filter for the chunks stored from this document: by url when it has one,
+        since several web pages can share a source name, otherwise by source.
+        """
+        if self.metadata.get("url"):
+            return {"url": self.metadata["url"]}
+        return {"source": self.source}
+
+
+class SourceAdapter(abc.ABC):
+    def __init__(self, source_name, year, speaker="Narrator"):
+        self.source_name = source_name
+        self.year = year
+        self.speaker = speaker
+
+    def _metadata(self, **extra):
+        metadata = {"source": self.source_name, "year": self.year, "speaker": self.speaker}
+        metadata.update(extra)
+        return metadata
+
+    @abc.abstractmethod
+    async def load(self, client):
+        """
+        Returns a Document. `client` is the shared httpx.AsyncClient.
+        """
+
+
+def pdf_pages(data=None, path=None):
+    """Extracts (page_number, text) pairs from PDF bytes or a PDF file."""
+    doc = fitz.open(stream=data, filetype="pdf") if data is not None else fitz.open(path)
+    try:
+        return [(i + 1, page.get_text()) for i, page in enumerate(doc)]  # page numbers start at 1
+    finally:
+        doc.close()
+
+
+def html_to_text(html, url=""):
+    """Extracts readable text from a web page, with site-specific handling."""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    if 'wikipedia.org' in url:
+        for tag in soup(['script', 'style', 'sup', 'table']):
+            tag.decompose()
+        content = soup.find('div', {'id': 'mw-content-text'})
+    elif 'thecanadianencyclopedia.ca' in url:
+        # Canadian Encyclopedia - focus on article content
+        for tag in soup(['script', 'style', 'nav', 'footer']):
+            tag.decompose()
+        content = soup.find('article') or soup.find('div', class_='article-content')
+    elif 'johnamacdonald.org' in url:
+        # John A MacDonald site - minimal filtering
+        for tag in soup(['script', 'style']):
+            tag.decompose()
+        content = None
+    else:
+        # Default handling for other sites
+        for tag in soup(['script', 'style', 'header', 'footer', 'nav', 'aside']):
+            tag.decompose()
+        content = None
+
+    return (content or soup).get_text(separator=' ', strip=True)
+
+
+class UrlSource(SourceAdapter):
+    """A web page or a PDF served over HTTP(S); the type is decided from the response."""
+
+    def __init__(self, url, source_name=None, year=None, speaker="Narrator"):
+        super().__init__(source_name or urlparse(url).netloc.replace("www.", ""), year, speaker)
+        self.url = url
+
+    async def load(self, client):
+        response = await client.get(self.url, headers={"User-Agent": USER_AGENT}, follow_redirects=True)
+        response.raise_for_status()
+
+        content_type = response.headers.get("content-type", "")
+        if "pdf" in content_type or self.url.lower().endswith(".pdf"):
+            # Parsing is CPU-bound; keep it off the event loop so other downloads continue
+            pages = await asyncio.to_thread(pdf_pages, response.content)
+        else:
+            text = await asyncio.to_thread(html_to_text, response.text, self.url)
+            pages = [(None, text)]
+        return Document(pages, self._metadata(url=self.url))
+
+
+class LocalFileSource(SourceAdapter):
+    """A local text or HTML file."""
+
+    def __init__(self, path, source_name=None, year=None, speaker="Narrator"):
+        super().__init__(source_name or os.path.basename(path), year, speaker)
+        self.path = path
+
+    async def load(self, client):
+        def read():
+            with open(self.path, "r", encoding="utf-8") as f:
+                content = f.read()
+            if self.path.lower().endswith((".html", ".htm")):
+                return html_to_text(content)
+            return content
+        return Document([(None, await asyncio.to_thread(read))], self._metadata())
+
+
+class LocalPdfSource(SourceAdapter):
+    """A local PDF file."""
+
+    def __init__(self, path, source_name=None, year=None, speaker="Narrator"):
+        super().__init__(source_name or os.path.basename(path), year, speaker)
+        self.path = path
+
+    async def load(self, client):
+        pages = await asyncio.to_thread(pdf_pages, None, self.path)
+        return Document(pages, self._metadata())
@@ -0,0 +1,160 @@
+"""
+The ingestion pipeline: fetch sources concurrently, chunk, embed in batches, upsert.
+
+ingest() upserts into one collection. ingest_snapshot() is what the ingestion scripts
+use: once an index snapshot has been published (see index_snapshots.py), the API serves
+that snapshot and no longer reads chroma_store/, so new sources are added to a copy of the
+active snapshot, which is then published in turn.
+"""
+import asyncio
+import hashlib
+import os
+import shutil
+
+import httpx
+
+from index_snapshots import SNAPSHOT_ROOT, building_dir, current_version, finish_build, gc_snapshots, new_version, publish, snapshot_dir
+from text_chunker import EMBEDDING_MODEL, OVERLAP_TOKENS, SPECIAL_TOKENS, TokenChunker, get_chunker
+
+COLLECTION_NAME = "macdonald_speeches"
+# The store the API reads when no snapshot has been published
+PERSIST_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chroma_store")
+SNAPSHOT_CHROMA_DIR = "chroma_store"
+
+
+def chunk_id(source, text, url=None):
+    """
+    Content-derived chunk ID: the same text from the same source always gets the same ID,
+    so identical chunks within one ingestion are stored once.
+    Web pages that share a source name are told apart by url, as Document.where does, so
+    the same text on two pages is stored (and replaced on re-ingestion) for each page.
+    """
+    key = f"{source}\n{url}\n{text}" if url else f"{source}\n{text}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+async def fetch_all(sources, concurrency=8, timeout=30):
+    """
+    Loads all sources concurrently (at most `concurrency` at a time).
+    Sources that fail are reported and skipped. Returns the loaded Documents in input order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(source, client):
+        async with semaphore:
+            try:
+                document = await source.load(client)
+                print(f"[INFO] Loaded {source.source_name} ({len(document.pages)} pages)")
+                return document
+            except Exception as e:
+                print(f"[ERROR] Failed to load {source.source_name}: {e}")
+                return None
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        documents = await asyncio.gather(*(load(source, client) for source in sources))
+    return [document for document in documents if document is not None]
+
+
+def chunk_documents(documents, chunker=None):
+    """
+    Splits documents into chunks that fit the embedding model's sequence limit.
+    Returns parallel lists (ids, texts, metadatas).
+    Chunks with the same ID (identical text from the same source and url) are kept once.
+    """
+    chunker = chunker or get_chunker()
+    ids, texts, metadatas = [], [], []
+    seen = set()
+    for document in documents:
+        for page_number, page_text in document.pages:
+            for chunk_index, chunk in enumerate(chunker.chunk(page_text)):
+                if not chunk.strip():
+                    continue
+                cid = chunk_id(document.source, chunk, document.metadata.get("url"))
+                if cid in seen:
+                    continue
+                seen.add(cid)
+
+                metadata = dict(document.metadata, chunk_index=chunk_index)
+                if page_number is not None:
+                    metadata["page"] = page_number
+                # Chroma rejects None metadata values
+                metadata = {key: value for key, value in metadata.items() if value is not None}
+
+                ids.append(cid)
+                texts.append(chunk)
+                metadatas.append(metadata)
+    return ids, texts, metadatas
+
+
+def ingest(sources, collection=None, embedder=None, batch_size=64, concurrency=8, overlap_tokens=OVERLAP_TOKENS):
+    """
+    Fetches, chunks, embeds and upserts `sources` (a list of SourceAdapters).
+    Each source that loads replaces the chunks previously stored from it, so text removed
+    from an edited page doesn't linger; a source that fails to load keeps its old chunks.
+    The collection and embedder default to the API's Chroma store and embedding model.
+    Returns the number of chunks upserted.
+    """
+    if embedder is None:
+        from sentence_transformers import SentenceTransformer
+        embedder = SentenceTransformer(EMBEDDING_MODEL)
+    # Chunks are sized by the embedder's own tokenizer and sequence limit
+    chunker = TokenChunker(embedder.tokenizer, embedder.max_seq_length - SPECIAL_TOKENS, overlap_tokens)
+    if collection is None:
+        import chromadb
+        client = chromadb.PersistentClient(path=PERSIST_DIR)
+        collection = client.get_or_create_collection(name=COLLECTION_NAME)
+
+    documents = asyncio.run(fetch_all(sources, concurrency=concurrency))
+    ids, texts, metadatas = chunk_documents(documents, chunker)
+    print(f"[INFO] {len(ids)} chunks from {len(documents)} sources")
+
+    for document in documents:
+        collection.delete(where=document.where)
+
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        # One encode call and one upsert per batch instead of one per chunk
+        embeddings = embedder.encode(texts[start:end], batch_size=batch_size).tolist()
+        collection.upsert(
+            ids=ids[start:end],
+            embeddings=embeddings,
+            documents=texts[start:end],
+            metadatas=metadatas[start:end]
+        )
+        print(f"[SUCCESS] Upserted chunks {start + 1}-{min(end, len(ids))} of {len(ids)}")
+
+    return len(ids)
+
+
+def ingest_snapshot(sources, publish_snapshot=True, root=SNAPSHOT_ROOT, **options):
+    """
+    Adds `sources` to a new index snapshot: a copy of the active snapshot's collection,
+    with the sources upserted and the NumPy index re-exported. The running API keeps
+    serving the active snapshot until the new one is published.
+    Without any snapshot, upserts into PERSIST_DIR like ingest().
+    Returns (version, chunks upserted); version is None without snapshots.
+    """
+    active = current_version(root)
+    if active is None:
+        print("[INFO] No index snapshot published; adding to the legacy chroma_store")
+        return None, ingest(sources, **options)
+
+    import chromadb
+    from vector_index import export_collection
+
+    version = new_version(root)
+    build_path = building_dir(version, root)
+    shutil.copytree(os.path.join(snapshot_dir(active, root), SNAPSHOT_CHROMA_DIR), os.path.join(build_path, SNAPSHOT_CHROMA_DIR))
+    collection = chromadb.PersistentClient(path=os.path.join(build_path, SNAPSHOT_CHROMA_DIR)).get_or_create_collection(COLLECTION_NAME)
+
+    upserted = ingest(sources, collection=collection, **options)
+    export_collection(collection, build_path)
+    finish_build(version, collection.count(), root)
+    print(f"[SUCCESS] Index snapshot {version} built from {active} with {collection.count()} chunks.")
+
+    if publish_snapshot:
+        publish(version, root)
+        gc_snapshots(root=root)
+    else:
+        print(f"[INFO] Publish it with: python index_snapshots.py publish {version}")
+    return version, upserted
@@ -0,0 +1,247 @@
+"""
+Resilient client for the OpenRouter chat completions API.
+
+- Hedging: if the first request hasn't answered after `hedge_delay` seconds, an identical
+  second request is sent and whichever answers first wins.
+- Retries: transient failures (timeouts, connection errors, 429 and 5xx) are retried
+  with exponential backoff. Other errors move straight on to the next model.
+- Fallback: models are tried in order until one answers.
+- Circuit breaker: a model that keeps failing is skipped for a cool-down period, so
+  users fail fast instead of each waiting for the full timeout.
+
+The base URL is configurable, so the client can be pointed at a local mock server
+(tests/test_llm_client.py does this).
+"""
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+
+import requests
+
+from request_profiler import bind_profiler
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when no model produced an answer."""
+
+
+class TransientLLMError(LLMError):
+    """A failure worth retrying (timeouts, connection errors, 429, 5xx)."""
+
+
+class PermanentLLMError(LLMError):
+    """A failure that retrying the same model won't fix (bad request, auth, unknown model)."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open, requests are refused
+    until `reset_timeout` seconds have passed; then a single trial request is let through
+    (half-open) and its outcome closes or re-opens the breaker.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_progress:
+                return False
+            self._trial_in_progress = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def release_trial(self):
+        """Ends a half-open trial whose outcome says nothing about the upstream's health."""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_progress or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_progress = False
+
+
+class LLMResult:
+    def __init__(self, response_data, model, attempt, hedged):
+        self.response_data = response_data
+        self.model = model          # Model that produced the answer
+        self.attempt = attempt      # 1-based attempt number across all models
+        self.hedged = hedged        # True if the hedged duplicate answered first
+
+
+class LLMClient:
+    def __init__(
+        self,
+        models,
+        api_key,
+        base_url="https://openrouter.ai/api/v1",
+        timeout=30.0,
+        total_timeout=60.0,
+        hedge_delay=8.0,
+        max_retries=2,
+        backoff_base=0.5,
+        breaker_threshold=5,
+        breaker_reset=30.0,
+        max_workers=32,
+    ):
+        if not models:
+            raise ValueError("At least one model is required")
+        self.models = list(models)
+        self.api_key = api_key
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.timeout = timeout
+        self.total_timeout = total_timeout
+        self.hedge_delay = hedge_delay
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.breakers = {model: CircuitBreaker(breaker_threshold, breaker_reset) for model in self.models}
+        # Reused connections; requests.Session is safe enough for concurrent POSTs
+        self._session = requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+
+    def _post(self, payload, timeout):
+        try:
+            response = self._session.post(
+                url=self.url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                data=json.dumps(payload),
+                timeout=timeout
+            )
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            raise TransientLLMError(f"{type(e).__name__}: {e}")
+        except requests.exceptions.RequestException as e:
+            raise PermanentLLMError(f"Request failed: {e}")
+
+        if response.status_code in TRANSIENT_STATUS_CODES:
+            raise TransientLLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+        if response.status_code >= 400:
+            raise PermanentLLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+        try:
+            response_data = response.json()
+        except ValueError:
+            raise TransientLLMError(f"Invalid JSON in response: {response.text[:200]}")
+
+        # OpenRouter sometimes reports upstream failures in a 200 response
+        if not isinstance(response_data, dict) or not response_data.get("choices"):
+            raise TransientLLMError(f"Unexpected response format: {response_data}")
+        return response_data
+
+    def _hedged_post(self, payload, timeout, deadline):
+        """
+        Sends the request, and a duplicate if the first is still running after hedge_delay.
+        Never waits past `deadline` (time.monotonic()); requests still running then are
+        abandoned and their results dropped.
+        Returns (response_data, hedged).
+        """
+        primary = self._executor.submit(bind_profiler(self._post), payload, timeout)
+        if self.hedge_delay <= 0 or self.hedge_delay >= timeout:
+            try:
+                return primary.result(timeout=max(0.0, deadline - time.monotonic())), False
+            except FutureTimeoutError:
+                raise TransientLLMError("total timeout exceeded")
+
+        done, _ = wait([primary], timeout=min(self.hedge_delay, max(0.0, deadline - time.monotonic())))
+        if done:
+            return primary.result(), False
+        if time.monotonic() >= deadline:
+            raise TransientLLMError("total timeout exceeded")
+
+        hedge = self._executor.submit(bind_profiler(self._post), payload, timeout)
+        pending = {primary, hedge}
+        last_error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TransientLLMError("total timeout exceeded")
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    # The slower request keeps running in the background; its result is dropped
+                    return future.result(), future is hedge
+                except LLMError as e:
+                    last_error = e
+        raise last_error
+
+    def complete(self, messages, temperature, max_tokens):
+        """
+        Returns an LLMResult for the first model that answers. Raises LLMError if all fail.
+        """
+        deadline = time.monotonic() + self.total_timeout
+        attempt = 0
+        errors = []
+
+        for model in self.models:
+            breaker = self.breakers[model]
+            payload = {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+            }
+
+            for retry in range(self.max_retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    errors.append("total timeout exceeded")
+                    raise LLMError("; ".join(errors))
+                if not breaker.allow():
+                    errors.append(f"{model}: circuit open")
+                    break
+
+                attempt += 1
+                try:
+                    response_data, hedged = self._hedged_post(payload, min(self.timeout, remaining), deadline)
+                    breaker.record_success()
+                    return LLMResult(response_data, model, attempt, hedged)
+                except PermanentLLMError as e:
+                    # Not the upstream's health at fault, so the breaker isn't touched
+                    breaker.release_trial()
+                    errors.append(f"{model} attempt {attempt}: {e}")
+                    break
+                except TransientLLMError as e:
+                    breaker.record_failure()
+                    errors.append(f"{model} attempt {attempt}: {e}")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMError("; ".join(errors))
+                    if retry < self.max_retries:
+                        # Exponential backoff with jitter, cut short by the total deadline
+                        time.sleep(min(self.backoff_base * (2 ** retry) * random.uniform(0.5, 1.5), remaining))
+
+            print(f"[WARNING] Model {model} failed or is unavailable, falling back to the next model")
+
+        raise LLMError("; ".join(errors))
+
+    def status(self):
+        return {model: breaker.state for model, breaker in self.breakers.items()}
@@ -0,0 +1,295 @@
+"""
+Maintenance for the 'logs' table in monitoring.db: rollups, archival and indexes.
+
+- Rollups: raw rows are summarised into logs_hourly and logs_daily (request counts,
+  success rate, token sums, latency percentiles). Only complete hours/days are rolled
+  up, and a watermark in maintenance_state records how far each rollup has got, so
+  every run only reads rows it hasn't seen yet.
+- Archival: raw rows older than the retention window (and already rolled up) are
+  appended to gzipped JSON-lines files under archive/ and deleted in small batches,
+  so request logging is never blocked for long.
+
+Usage (from the api directory):
+    python log_maintenance.py                      # one incremental run
+    python log_maintenance.py --loop 3600          # run every hour
+    python log_maintenance.py --retention-days 30
+The API also runs it in the background every hour by default; see
+LOG_MAINTENANCE_INTERVAL_SECONDS in main.py.
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from usage_logger import DB_PATH, setup_database
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(__file__), 'archive')
+DEFAULT_RETENTION_DAYS = 90
+ARCHIVE_BATCH_SIZE = 500
+LEASE_SECONDS = 600  # A crashed run stops blocking others after this long
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # Format of SQLite's CURRENT_TIMESTAMP (UTC)
+
+# Both rollup tables share this schema; 'bucket' is the start of the hour or day
+ROLLUP_COLUMNS = """
+    bucket TEXT PRIMARY KEY,
+    requests INTEGER NOT NULL,
+    successes INTEGER NOT NULL,
+    coalesced INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    total_tokens INTEGER NOT NULL,
+    latency_p50 INTEGER,
+    latency_p95 INTEGER,
+    latency_p99 INTEGER,
+    latency_max INTEGER
+"""
+
+# Columns after 'bucket', in table order
+ROLLUP_FIELDS = [
+    "requests", "successes", "coalesced", "prompt_tokens", "completion_tokens",
+    "total_tokens", "latency_p50", "latency_p95", "latency_p99", "latency_max",
+]
+
+GRANULARITIES = {
+    # name: (table, bucket length, number of timestamp characters identifying a bucket)
+    "hour": ("logs_hourly", timedelta(hours=1), 13),
+    "day": ("logs_daily", timedelta(days=1), 10),
+}
+
+
+def setup_maintenance_tables(conn: sqlite3.Connection):
+    """
+    Creates the rollup and state tables and the indexes the rollups rely on.
+    """
+    cursor = conn.cursor()
+    # Rollups and archival select by time range; without this index each run scans the whole table
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)")
+    for table, _, _ in GRANULARITIES.values():
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({ROLLUP_COLUMNS})")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS maintenance_state (
+        name TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """)
+    conn.commit()
+
+
+def _get_state(conn, name):
+    row = conn.execute("SELECT value FROM maintenance_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_state(conn, name, value):
+    conn.execute(
+        "INSERT INTO maintenance_state (name, value) VALUES (?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+        (name, value)
+    )
+
+
+def _acquire_lease(conn, seconds):
+    """
+    Takes the maintenance lease unless another process holds an unexpired one, so that
+    several API workers running maintenance in the background don't archive rows twice.
+    """
+    now = datetime.utcnow()
+    expires = (now + timedelta(seconds=seconds)).strftime(TIMESTAMP_FORMAT)
+    cursor = conn.execute(
+        "INSERT INTO maintenance_state (name, value) VALUES ('lease_expires', ?) "
+        "ON CONFLICT(name) DO UPDATE SET value = excluded.value WHERE maintenance_state.value < ?",
+        (expires, now.strftime(TIMESTAMP_FORMAT))
+    )
+    conn.commit()
+    return cursor.rowcount == 1
+
+
+def _release_lease(conn):
+    conn.execute("UPDATE maintenance_state SET value = '' WHERE name = 'lease_expires'")
+    conn.commit()
+
+
+def _bucket_start(timestamp, granularity):
+    """Start of the hour or day a timestamp falls in, as a full timestamp string."""
+    if granularity == "hour":
+        return timestamp[:13] + ":00:00"
+    return timestamp[:10] + " 00:00:00"
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def _summarize(rows):
+    latencies = sorted(r[1] for r in rows if r[1] is not None)
+    return {
+        "requests": len(rows),
+        "successes": sum(1 for r in rows if r[0]),
+        "coalesced": sum(1 for r in rows if r[5]),
+        "prompt_tokens": sum(r[2] or 0 for r in rows),
+        "completion_tokens": sum(r[3] or 0 for r in rows),
+        "total_tokens": sum(r[4] or 0 for r in rows),
+        "latency_p50": _percentile(latencies, 0.50),
+        "latency_p95": _percentile(latencies, 0.95),
+        "latency_p99": _percentile(latencies, 0.99),
+        "latency_max": latencies[-1] if latencies else None,
+    }
+
+
+def summarize_buckets(conn: sqlite3.Connection, granularity: str, since: str, until: str):
+    """
+    Summaries of the raw rows between `since` and `until`, one per bucket that has rows.
+    Returns a list of (bucket start, summary dict with the ROLLUP_FIELDS).
+    """
+    _, length, prefix = GRANULARITIES[granularity]
+    # Only the buckets that actually have rows, found through the timestamp index
+    buckets = [row[0] for row in conn.execute(
+        f"SELECT substr(timestamp, 1, {prefix}) FROM logs WHERE timestamp >= ? AND timestamp < ? GROUP BY 1",
+        (since, until)
+    )]
+
+    summaries = []
+    for bucket in buckets:
+        start = _bucket_start(bucket, granularity)
+        end = (datetime.strptime(start, TIMESTAMP_FORMAT) + length).strftime(TIMESTAMP_FORMAT)
+        rows = conn.execute(
+            "SELECT is_successful, latency_ms, prompt_tokens, completion_tokens, total_tokens, coalesced "
+            "FROM logs WHERE timestamp >= ? AND timestamp < ?",
+            (max(start, since), min(end, until))
+        ).fetchall()
+        summaries.append((start, _summarize(rows)))
+    return summaries
+
+
+def rollup(conn: sqlite3.Connection, granularity: str, now: datetime = None) -> int:
+    """
+    Rolls up every complete bucket since the last run. Returns the number of buckets written.
+    """
+    table, _, _ = GRANULARITIES[granularity]
+    now = now or datetime.utcnow()
+    if granularity == "hour":
+        until = now.replace(minute=0, second=0, microsecond=0)
+    else:
+        until = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    until_str = until.strftime(TIMESTAMP_FORMAT)
+
+    state_name = f"{table}_rolled_until"
+    since = _get_state(conn, state_name)
+    if since is None:
+        # First run: start from the oldest row (a single index lookup)
+        since = conn.execute("SELECT MIN(timestamp) FROM logs").fetchone()[0]
+        if since is None:
+            return 0
+        since = _bucket_start(since, granularity)
+    if since >= until_str:
+        return 0
+
+    buckets = summarize_buckets(conn, granularity, since, until_str)
+    for start, summary in buckets:
+        conn.execute(
+            f"INSERT OR REPLACE INTO {table} (bucket, {', '.join(summary)}) "
+            f"VALUES (?, {', '.join('?' * len(summary))})",
+            (start, *summary.values())
+        )
+
+    _set_state(conn, state_name, until_str)
+    conn.commit()
+    return len(buckets)
+
+
+def archive_old_logs(conn: sqlite3.Connection, retention_days: int = DEFAULT_RETENTION_DAYS,
+                     archive_dir: str = ARCHIVE_DIR, now: datetime = None) -> int:
+    """
+    Moves raw rows older than `retention_days` into gzipped JSON-lines files, one per day,
+    and deletes them from the table. Rows that haven't been rolled up yet are kept.
+    Returns the number of rows archived.
+    """
+    now = now or datetime.utcnow()
+    cutoff = (now - timedelta(days=retention_days)).strftime(TIMESTAMP_FORMAT)
+    # Never archive rows the daily rollup still needs
+    rolled_until = _get_state(conn, "logs_daily_rolled_until")
+    if rolled_until is None:
+        return 0
+    cutoff = min(cutoff, rolled_until)
+
+    os.makedirs(archive_dir, exist_ok=True)
+    archived = 0
+    while True:
+        cursor = conn.execute(
+            "SELECT * FROM logs WHERE timestamp < ? ORDER BY timestamp LIMIT ?",
+            (cutoff, ARCHIVE_BATCH_SIZE)
+        )
+        columns = [c[0] for c in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        if not rows:
+            break
+
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row["timestamp"][:10], []).append(row)
+        for day, day_rows in by_day.items():
+            # Appending a new gzip member keeps earlier batches readable as one file
+            path = os.path.join(archive_dir, f"logs_{day}.jsonl.gz")
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                for row in day_rows:
+                    f.write(json.dumps(row) + "\n")
+
+        # Written to disk first, then deleted in a short transaction
+        conn.executemany("DELETE FROM logs WHERE id = ?", [(row["id"],) for row in rows])
+        conn.commit()
+        archived += len(rows)
+
+    if archived:
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE);")
+    return archived
+
+
+def run_maintenance(db_path: str = DB_PATH, retention_days: int = DEFAULT_RETENTION_DAYS):
+    """
+    One incremental pass: hourly and daily rollups, then archival. Uses its own connection.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA busy_timeout=30000;")
+        # Makes sure columns added since the table was created (e.g. 'coalesced') exist
+        setup_database(conn)
+        setup_maintenance_tables(conn)
+        if not _acquire_lease(conn, LEASE_SECONDS):
+            print("[INFO] Log maintenance is already running elsewhere, skipping")
+            return None
+        try:
+            hours = rollup(conn, "hour")
+            days = rollup(conn, "day")
+            archived = archive_old_logs(conn, retention_days)
+        finally:
+            _release_lease(conn)
+        print(f"[INFO] Log maintenance: {hours} hourly and {days} daily buckets rolled up, {archived} rows archived")
+        return {"hourly_buckets": hours, "daily_buckets": days, "archived_rows": archived}
+    except sqlite3.Error as e:
+        print(f"[ERROR] Log maintenance failed: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll up and archive the logs table")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--retention-days", type=int, default=DEFAULT_RETENTION_DAYS)
+    parser.add_argument("--loop", type=int, default=0, help="Repeat every N seconds")
+    args = parser.parse_args()
+
+    while True:
+        run_maintenance(args.db, args.retention_days)
+        if not args.loop:
+            break
+        time.sleep(args.loop)
@@ -1,27 +1,71 @@
-import chromadb
+import asyncio
 import os
 import re
-import requests
-import json
 import time # Import the time module to calculate latency
 import sqlite3
+import json
+import threading
+from functools import lru_cache
 from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from typing import Optional
 from pydantic import BaseModel, Field, validator
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 
 # Imports for rate limiting
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from limits import parse as parse_rate_limit
+# Registers the sqlite:// rate-limit storage, shared by all workers on the host
+import rate_limit_storage  # noqa: F401
 
 # Import the usage logger
 from usage_logger import setup_database, log_request
 # Import the new share handler
 from share_handler import setup_share_database, create_share_link, get_shared_link
+from share_pages import SHARE_PAGE_CACHE_CONTROL, share_page_path, write_share_page
+# The embedding model and its sequence limit, shared with the chunker and ingestion
+from text_chunker import EMBEDDING_MODEL, MAX_SEQ_LENGTH
+# Token-budgeted prompt packing
+from context_packer import make_token_counter, pack_context, trim_to_sentences
+# Diversity re-ranking of retrieved chunks
+from mmr_rerank import mmr_select
+# Neighbouring-chunk lookup for context expansion
+from neighbor_index import get_neighbor_index
+# Sharing one answer between identical concurrent questions
+from request_coalescer import SingleFlight
+from question_utils import normalize_question
+# OpenRouter client with hedging, retries, model fallback and a circuit breaker
+from llm_client import LLMClient, LLMError
+# Concurrency cap and load shedding for the LLM endpoints
+from admission import AdmissionController, AdmissionMiddleware
+# Memory-mapped NumPy export of the collection, shareable between worker processes
+from vector_index import NumpyIndex, export_collection, index_cache_exists
+# Versioned index snapshots that can be swapped without a restart
+from index_snapshots import current_version, snapshot_dir, list_versions, publish, gc_snapshots
+# Rollups and archival for the logs table
+from log_maintenance import setup_maintenance_tables, run_maintenance, GRANULARITIES
+# Admin API
+from admin_auth import require_admin
+from admin_stats import TTLCache, fetch_stats, parse_time, default_range
+# Pre-generated answers for the most common questions
+from faq_cache import FaqCache, setup_faq_database
+# Import the micro-batching question encoder
+from query_encoder import QueryEncoder
+# Parallel background loading of the model, index and databases
+from startup_loader import StartupLoader
+# Optional cross-encoder second retrieval stage
+from cross_reranker import CrossEncoderReranker
+# Opt-in sampling profiler for live requests
+from request_profiler import ProfilerMiddleware, RequestProfiler, profile_thread
+# Import follow-up conversation sessions
+from conversation_store import setup_conversation_database, create_session, load_session, add_turn
+# Import quote trimming for slim /api/ask responses
+from source_quotes import QUOTE_MODES, apply_quote_mode
 
 # Add these imports after your existing FastAPI imports (around line 8)
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
@@ -68,27 +112,133 @@ async def limit_request_size(request: Request, call_next):
     response = await call_next(request)
     return response
 
+# --- On-demand Profiling ---
+PROFILED_PATHS = ("/api/ask",)
+PROFILE_MAX_REQUESTS = 100
+PROFILE_MAX_SECONDS = 300
+
+request_profiler = RequestProfiler()
+# Profiles the next requests an admin asked for (see /api/admin/profile)
+app.add_middleware(ProfilerMiddleware, profiler=request_profiler, paths=PROFILED_PATHS)
+
+# --- Admission Control ---
+# Only the LLM endpoints are admission-controlled; everything else (share links, health)
+# bypasses the controller so it stays responsive when the LLM path is saturated.
+ADMISSION_CONTROLLED_PATHS = ("/api/ask",)
+# LLM calls a single batch runs at the same time; a batch holds this many admission slots
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+ADMISSION_RETRY_AFTER_SECONDS = os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "5")
+
+admission_controller = AdmissionController(
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "16")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "32")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "5")),
+)
+
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission_controller,
+    paths=ADMISSION_CONTROLLED_PATHS,
+    shed_content={"error": "Sir John is answering a great many questions just now. Please try again in a moment."},
+    retry_after=ADMISSION_RETRY_AFTER_SECONDS,
+    weights={"/api/ask/batch": BATCH_LLM_CONCURRENCY},
+)
+
+# --- Readiness ---
+# The model, index and databases load in the background after the server starts (see
+# startup_event). Until the components a route needs have loaded, it gets a 503 instead of
+# waiting; share links only need the database, so they work while the model is loading.
+startup_loader = StartupLoader(
+    max_attempts=int(os.getenv("STARTUP_MAX_ATTEMPTS", "3")),
+    retry_seconds=float(os.getenv("STARTUP_RETRY_SECONDS", "2")),
+)
+READINESS_REQUIREMENTS = (
+    (("/api/ask", "/api/source"), ("database", "model", "index")),
+    (("/api/share", "/share/"), ("database",)),
+)
+
+@app.middleware("http")
+async def require_ready(request: Request, call_next):
+    path = request.url.path
+    for prefixes, components in READINESS_REQUIREMENTS:
+        if path.startswith(prefixes) and not startup_loader.ready(*components):
+            return JSONResponse(
+                status_code=503,
+                content={"error": "Sir John is just getting up. Please try again in a moment."},
+                headers={"Retry-After": "5"}
+            )
+    return await call_next(request)
+
 # --- Database Connection Management ---
 DB_PATH = os.path.join(os.path.dirname(__file__), 'monitoring.db')
 
-def get_database():
-    """
-    FastAPI dependency: open a fresh SQLite connection per request and close it afterwards.
-    This avoids cross-thread reuse and reduces locking issues.
-    """
+def connect_database():
     conn = sqlite3.connect(
         DB_PATH,
         check_same_thread=False,   # allow usage in async/threaded contexts
         timeout=30
     )
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA busy_timeout=30000;")
+    return conn
+
+def get_database():
+    """
+    FastAPI dependency: open a fresh SQLite connection per request and close it afterwards.
+    This avoids cross-thread reuse and reduces locking issues.
+    """
+    conn = connect_database()
     try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA synchronous=NORMAL;")
-        conn.execute("PRAGMA busy_timeout=30000;")
         yield conn
     finally:
         conn.close()
 
+@startup_loader.component("database")
+def load_database():
+    # Initialize database with a short-lived connection
+    with sqlite3.connect(DB_PATH, check_same_thread=False, timeout=30) as conn:
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA busy_timeout=30000;")
+        setup_database(conn)
+        setup_share_database(conn)
+        setup_maintenance_tables(conn)
+        setup_faq_database(conn)
+        setup_conversation_database(conn)
+        faq_cache.load(conn)
+    print("✅ Database initialization completed")
+
+# --- Background Log Maintenance ---
+# Rolls up and archives the logs table every N seconds; 0 disables it
+# (run log_maintenance.py from cron instead). /api/admin/stats reads the rollups.
+LOG_MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("LOG_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "90"))
+
+async def log_maintenance_loop():
+    while True:
+        try:
+            # In a worker thread, with its own connection, so requests keep being served
+            await asyncio.to_thread(run_maintenance, DB_PATH, LOG_RETENTION_DAYS)
+        except Exception as e:
+            # e.g. archive/ not writable; the next run tries again
+            print(f"[ERROR] Log maintenance failed: {e}")
+        await asyncio.sleep(LOG_MAINTENANCE_INTERVAL_SECONDS)
+
+# --- FAQ Fast Path ---
+# Answers pre-generated by faq_builder.py, reloaded every FAQ_REFRESH_SECONDS
+faq_cache = FaqCache()
+FAQ_REFRESH_SECONDS = int(os.getenv("FAQ_REFRESH_SECONDS", "3600"))
+
+def _reload_faq():
+    with sqlite3.connect(DB_PATH, timeout=30) as conn:
+        faq_cache.load(conn)
+
+async def faq_refresh_loop():
+    while True:
+        await asyncio.sleep(FAQ_REFRESH_SECONDS)
+        await asyncio.to_thread(_reload_faq)
+
 # --- Application Startup Event ---
 @app.on_event("startup")
 async def startup_event():
@@ -98,42 +248,28 @@ async def startup_event():
     print("🚀 Starting MacDonald History Bot API...")
 
     try:
-        # Initialize database with a short-lived connection
-        with sqlite3.connect(DB_PATH, check_same_thread=False, timeout=30) as conn:
-            conn.execute("PRAGMA journal_mode=WAL;")
-            conn.execute("PRAGMA synchronous=NORMAL;")
-            conn.execute("PRAGMA busy_timeout=30000;")
-            setup_database(conn)
-            setup_share_database(conn)
-        print("✅ Database initialization completed")
+        if LOG_MAINTENANCE_INTERVAL_SECONDS > 0:
+            asyncio.create_task(log_maintenance_loop())
+        if FAQ_REFRESH_SECONDS > 0:
+            asyncio.create_task(faq_refresh_loop())
+        if INDEX_WATCH_SECONDS > 0:
+            asyncio.create_task(index_watch_loop())
 
         # Validate external dependencies
         print("🔍 Validating external dependencies...")
 
-        # Test ChromaDB setup instead of just embedder
-        try:
-            if collection is not None:
-                print("✅ ChromaDB collection accessible")
-            else:
-                print("⚠️ ChromaDB will be built on first request")
-        except Exception as e:
-            print(f"❌ ChromaDB validation failed: {e}")
-
-        # Test embedding model
-        try:
-            embedder.encode("test")  # Simple test
-            print("✅ Embedding model loaded and functional")
-        except Exception as e:
-            print(f"❌ Embedding model validation failed: {e}")
-            raise
-
         # Test OpenRouter connectivity (optional - don't want to waste API calls)
         openrouter_key = os.getenv("OPENROUTER_API_KEY")
         if len(openrouter_key) < 20:  # Basic sanity check
             raise ValueError("OPENROUTER_API_KEY appears to be invalid (too short)")
         print("✅ OpenRouter API key format validation passed")
 
-        print("🎉 Application startup completed successfully")
+        # Under gunicorn's preload these were loaded in the master already, so this returns at once
+        if startup_loader.ready():
+            print("🎉 Application startup completed successfully")
+        else:
+            startup_loader.start()
+            print("🎉 Server started; loading the model, index and databases in the background")
 
     except Exception as e:
         print(f"💥 Startup failed: {e}")
@@ -166,19 +302,12 @@ def clean_duplicated_text(text):
     text = re.sub(r'\s+([?.!,])', r'\1', text) # remove space before punctuation
     return text
 
-def format_prompt(chunks, question):
-    """
-    Formats historical excerpts and the user's question into a comprehensive prompt for OpenRouter.
-    """
-    # Clean the chunks before formatting
-    cleaned_chunks = [(clean_duplicated_text(doc), meta) for doc, meta in chunks]
-
-    context = "\n\n".join([
-        f"[Excerpt from {meta.get('source', 'Unknown source')} - page {meta.get('page', 'Unknown')}, {meta.get('year', 'Unknown year')}]\n{doc}"
-        for doc, meta in cleaned_chunks
-    ])
+# --- Prompt Template ---
+SYSTEM_PROMPT = "You are Sir John A. Macdonald, Canada's first Prime Minister. You are an experienced educator and statesman who enjoys sharing comprehensive historical knowledge. Your responses should be thorough, informative, and engaging. IMPORTANT: Respond ONLY in English. Do not use any other languages or characters."
 
-    return f"""You are simulating the voice and perspective of **Sir John A. Macdonald**, Canada’s first Prime Minister (1867–1873, 1878–1891).
+# The static parts of the prompt are built once at import time; format_prompt only
+# joins them with the packed context and the question.
+PROMPT_PREAMBLE = """You are simulating the voice and perspective of **Sir John A. Macdonald**, Canada’s first Prime Minister (1867–1873, 1878–1891).
 
 You are answering a curious modern reader who wants to understand Canadian history. They may not have much background knowledge, so your role is to explain clearly — with context, storytelling, and personality.
 
@@ -217,19 +346,57 @@ At the end of your answer, **suggest 2 natural follow-up questions** the reader
 
 You may use the following memories and details to inform your response:
 
-{context}
+"""
+
+PROMPT_HISTORY_HEADER = "\n\nYour conversation with the reader so far:\n"
+
+PROMPT_QUESTION_HEADER = "\n\nUser's question:\n"
 
-User's question:
-{question}
+PROMPT_CLOSING = """
 
 ---
 
 **Language note:** Do not use outdated or offensive phrases such as “the Indian problem” or other language that would be considered harmful today. Speak with respect and care when referring to Indigenous peoples and sensitive historical topics.
 """
+
+# Token budget for the excerpts section of the prompt (measured with the local tokenizer)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+
+def format_excerpt(doc, meta):
+    return f"[Excerpt from {meta.get('source', 'Unknown source')} - page {meta.get('page', 'Unknown')}, {meta.get('year', 'Unknown year')}]\n{doc}"
+
+def format_prompt(chunks, question, history=None):
+    """
+    Formats historical excerpts and the user's question into a comprehensive prompt for OpenRouter.
+    Excerpts are packed into CONTEXT_TOKEN_BUDGET by relevance. `history` is the conversation
+    so far, for follow-up questions (see format_history).
+    Returns (prompt, packed_tokens), where packed_tokens is the local estimate for the whole prompt.
+    """
+    # Clean the chunks before formatting
+    cleaned_chunks = [(clean_duplicated_text(doc), meta) for doc, meta in chunks]
+
+    excerpts, context_tokens = pack_context(
+        cleaned_chunks, CONTEXT_TOKEN_BUDGET, count_tokens, format_excerpt
+    )
+    context = "\n\n".join(excerpts)
+
+    parts = [PROMPT_PREAMBLE, context]
+    if history:
+        parts += [PROMPT_HISTORY_HEADER, history]
+    parts += [PROMPT_QUESTION_HEADER, question, PROMPT_CLOSING]
+    prompt = "".join(parts)
+    packed_tokens = static_prompt_tokens() + context_tokens + count_tokens(question)
+    if history:
+        packed_tokens += count_tokens(PROMPT_HISTORY_HEADER + history)
+    return prompt, packed_tokens
+
 # --- Rate Limiting Setup ---
 
-# Create a limiter instance that uses the client's IP address as the identifier
-limiter = Limiter(key_func=get_remote_address)
+# Create a limiter instance that uses the client's IP address as the identifier.
+# Counters live in SQLite so every uvicorn worker sees the same counts;
+# set RATE_LIMIT_STORAGE_URI=memory:// for the old per-process behaviour.
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "sqlite:///rate_limits.db")
+limiter = Limiter(key_func=get_remote_address, storage_uri=RATE_LIMIT_STORAGE_URI)
 
 # Register the limiter with the app
 # This sets the default rate limit for all routes decorated with @limiter.limit
@@ -240,33 +407,237 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 # --- End Rate Limiting Setup ---
 
 
-# Load embedding model (same one used for indexing)
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+# Embedding model (same one used for indexing), set by load_model
+embedder = None
+
+# Local token counter for prompt budgeting, using the embedding model's tokenizer
+count_tokens = None
+
+# Concurrent questions are encoded together in batches; repeated questions come from the cache
+query_encoder = QueryEncoder(
+    None,
+    window_ms=float(os.getenv("ENCODER_BATCH_WINDOW_MS", "5")),
+    max_batch=int(os.getenv("ENCODER_MAX_BATCH", "32")),
+    cache_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "2048")),
+)
+
+@startup_loader.component("model")
+def load_model():
+    global embedder, count_tokens
+    start = time.perf_counter()
+    # Imported here rather than at the top: sentence-transformers pulls in torch, which alone takes seconds
+    from sentence_transformers import SentenceTransformer
+    startup_loader.record("import sentence_transformers", time.perf_counter() - start)
+
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    if model.max_seq_length != MAX_SEQ_LENGTH:
+        print(f"[WARNING] {EMBEDDING_MODEL} reads {model.max_seq_length} tokens but chunks are sized for "
+              f"{MAX_SEQ_LENGTH}; update MAX_SEQ_LENGTH in text_chunker.py and re-ingest")
+    model.encode("test")  # So the first question doesn't pay for the first forward pass
+    count_tokens = make_token_counter(model.tokenizer)
+    query_encoder.model = model
+    embedder = model
+    print("✅ Embedding model loaded and functional")
+
+@lru_cache(maxsize=1)
+def static_prompt_tokens():
+    """
+    Token count of the fixed parts of the prompt (system message and template), computed once.
+    """
+    return sum(count_tokens(part) for part in (SYSTEM_PROMPT, PROMPT_PREAMBLE, PROMPT_QUESTION_HEADER, PROMPT_CLOSING))
 
 # Load ChromaDB collection lazily
-chroma_client = None
-collection = None
+# Chroma clients by version; the active one's and the previous one's (which requests
+# started before a swap may still be using) are kept open
+chroma_clients = {}
+# The loaded collection and its snapshot version ("legacy" for chroma_store/ and index_cache/).
+# They are swapped as one tuple, so a request never pairs a collection with another's version.
+active_index = (None, None)
+_index_reload_lock = threading.Lock()
+
+# "chroma" queries the Chroma collection directly. "numpy" serves queries from a
+# memory-mapped export of it (index_cache/ or the snapshot), which worker processes can share.
+INDEX_BACKEND = os.getenv("INDEX_BACKEND", "chroma")
+# With the numpy backend: scan an "int8" or "binary" copy of the embeddings first and rescore
+# the best INDEX_RESCORE_FACTOR x n_results candidates exactly; "none" scans the float32 matrix
+INDEX_QUANTIZATION = os.getenv("INDEX_QUANTIZATION", "none")
+INDEX_RESCORE_FACTOR = int(os.getenv("INDEX_RESCORE_FACTOR", "4"))
+# How often each process checks for a newly published index snapshot; 0 disables the check
+INDEX_WATCH_SECONDS = int(os.getenv("INDEX_WATCH_SECONDS", "30"))
+
+def _open_chroma_collection():
+    # chromadb is imported where it's used, so the server can start before it's loaded
+    import chromadb
+    client = chroma_clients["legacy"] = chromadb.PersistentClient(path="./chroma_store")
+    coll = client.get_or_create_collection("macdonald_speeches")
+
+    # Check if collection exists and has data
+    if coll.count() == 0:
+        print("ChromaDB is empty, rebuilding from source files...")
+        from setup_chroma import setup_chroma_db
+        setup_chroma_db()
+        coll = client.get_or_create_collection("macdonald_speeches")
+    return coll
+
+def _open_snapshot(version):
+    path = snapshot_dir(version)
+    if INDEX_BACKEND == "numpy":
+        return NumpyIndex.load(path, quantization=INDEX_QUANTIZATION, rescore_factor=INDEX_RESCORE_FACTOR)
+    import chromadb
+    client = chroma_clients[version] = chromadb.PersistentClient(path=os.path.join(path, "chroma_store"))
+    return client.get_collection("macdonald_speeches")
+
+def _close_chroma_clients(keep):
+    """Stops the Chroma clients of versions not in `keep`; each one holds its own system."""
+    for version in [version for version in chroma_clients if version not in keep]:
+        chroma_clients.pop(version)._system.stop()
 
 def get_collection():
-    global chroma_client, collection
-    if collection is None:
+    """
+    Returns (collection, version) for the index this process serves. A request should use
+    the pair it got for its whole run: a swap replaces both without touching its copy.
+    The collection is None if the index couldn't be loaded.
+    """
+    global active_index
+    if active_index[0] is None:
         try:
-            chroma_client = chromadb.PersistentClient(path="./chroma_store")
-            collection = chroma_client.get_or_create_collection("macdonald_speeches")
+            version = current_version()
+            if version is not None:
+                coll = _open_snapshot(version)
+                print(f"✅ Index snapshot {version} loaded with {coll.count()} documents")
+            elif INDEX_BACKEND == "numpy":
+                if not index_cache_exists():
+                    print("Index cache missing, exporting it from ChromaDB...")
+                    export_collection(_open_chroma_collection())
+                    # The Chroma client isn't needed once the export exists
+                    _close_chroma_clients(keep=())
+                coll = NumpyIndex.load(quantization=INDEX_QUANTIZATION, rescore_factor=INDEX_RESCORE_FACTOR)
+                version = "legacy"
+                print(f"✅ NumPy index loaded with {coll.count()} documents")
+            else:
+                coll = _open_chroma_collection()
+                version = "legacy"
+                print(f"✅ ChromaDB loaded with {coll.count()} documents")
+            active_index = (coll, version)
+        except Exception as e:
+            print(f"❌ ChromaDB failed: {e}")
+            active_index = (None, None)
 
-            # Check if collection exists and has data
-            if collection.count() == 0:
-                print("ChromaDB is empty, rebuilding from source files...")
-                from setup_chroma import setup_chroma_db
-                setup_chroma_db()
-                collection = chroma_client.get_or_create_collection("macdonald_speeches")
+    return active_index
+
+def reload_index():
+    """
+    Swaps to the published snapshot if it isn't the one loaded. The new index is fully
+    loaded before the swap, and requests already holding the old collection finish on it.
+    Returns True if the index was swapped.
+    """
+    global active_index
+    with _index_reload_lock:
+        version = current_version()
+        previous = active_index[1]
+        if version is None or version == previous:
+            return False
+        new_collection = _open_snapshot(version)
+        if CONTEXT_EXPANSION:
+            get_neighbor_index(new_collection, version)
+        active_index = (new_collection, version)
+        _close_chroma_clients(keep=(version, previous))
+    print(f"[INFO] Swapped index snapshot {previous} -> {version} ({new_collection.count()} documents)")
+    return True
+
+# Optional: if it fails, requests retry get_collection() and report the index as unavailable
+@startup_loader.component("index", required=False)
+def load_index():
+    coll, version = get_collection()
+    if coll is None:
+        raise RuntimeError("The vector index could not be loaded")
+    if CONTEXT_EXPANSION:
+        get_neighbor_index(coll, version)
 
-            print(f"✅ ChromaDB loaded with {collection.count()} documents")
+async def index_watch_loop():
+    while True:
+        await asyncio.sleep(INDEX_WATCH_SECONDS)
+        try:
+            await asyncio.to_thread(reload_index)
         except Exception as e:
-            print(f"❌ ChromaDB failed: {e}")
-            collection = None
+            # Keep serving the current snapshot; the next check tries again
+            print(f"[ERROR] Loading index snapshot {current_version()} failed: {e}")
+
+
+# --- Retrieval Settings ---
+# Number of candidates fetched from the vector store before re-ranking
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "30"))
+# Number of chunks passed on to the prompt
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+# 0.0 = rank purely by similarity, 1.0 = purely by diversity
+RETRIEVAL_DIVERSITY = float(os.getenv("RETRIEVAL_DIVERSITY", "0.3"))
+# Stitch each retrieved chunk with the chunks before and after it in the same speech
+CONTEXT_EXPANSION = os.getenv("CONTEXT_EXPANSION", "false").lower() == "true"
+# Maximum tokens for one retrieved chunk plus its stitched neighbours
+EXPANSION_TOKEN_BUDGET = int(os.getenv("EXPANSION_TOKEN_BUDGET", "900"))
+# Follow-up questions in a session also get up to this many chunks from the previous turn
+SESSION_CARRY_CHUNKS = int(os.getenv("SESSION_CARRY_CHUNKS", "3"))
+# Token budget for the recent turns' answers in a follow-up prompt (older turns are a short summary)
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "600"))
+# How much excerpt text /api/ask returns when the request doesn't say: full, truncated or none
+DEFAULT_QUOTE_MODE = os.getenv("DEFAULT_QUOTE_MODE", "full")
+# Rescore the RETRIEVAL_FETCH_K candidates with a cross-encoder before MMR picks the top_k
+RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "false").lower() == "true"
+
+reranker = CrossEncoderReranker(
+    os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+    # Per question; over budget, the embedding order is kept
+    budget_ms=float(os.getenv("RERANKER_BUDGET_MS", "150")),
+    cache_size=int(os.getenv("RERANKER_CACHE_SIZE", "20000")),
+)
+if RERANKER_ENABLED:
+    # Optional: without it, retrieval keeps the embedding order
+    startup_loader.component("reranker", required=False)(reranker.load)
+
+def retrieve_chunks_batch(coll, question_embeddings, top_k=RETRIEVAL_TOP_K, diversity=RETRIEVAL_DIVERSITY, questions=None):
+    """
+    Over-fetches candidates for every question in one collection query and re-ranks each
+    question's candidates with MMR so the top_k aren't all adjacent chunks of the same speech.
+    With RERANKER_ENABLED and the question texts given, the cross-encoder's scores replace
+    embedding similarity as the relevance MMR ranks by.
+    Returns one list of (chunk_id, document, metadata) tuples per question.
+    """
+    results = coll.query(
+        query_embeddings=question_embeddings,
+        n_results=max(RETRIEVAL_FETCH_K, top_k),
+        include=["documents", "metadatas", "embeddings"]
+    )
+
+    all_hits = []
+    for q, question_embedding in enumerate(question_embeddings):
+        ids = results["ids"][q]
+        documents = results["documents"][q]
+        metadatas = results["metadatas"][q]
+
+        relevance = None
+        if RERANKER_ENABLED and questions is not None:
+            relevance = reranker.score(questions[q], ids, documents)
 
-    return collection
+        if diversity <= 0:
+            if relevance is None:
+                order = range(min(top_k, len(ids)))
+            else:
+                order = sorted(range(len(ids)), key=lambda i: -relevance[i])[:top_k]
+        else:
+            order = mmr_select(
+                question_embedding, results["embeddings"][q], top_k,
+                lambda_mult=1.0 - diversity, relevance=relevance
+            )
+
+        all_hits.append([(ids[i], documents[i], metadatas[i]) for i in order])
+    return all_hits
+
+def retrieve_chunks(coll, question_embedding, top_k=RETRIEVAL_TOP_K, diversity=RETRIEVAL_DIVERSITY, question=None):
+    """
+    Retrieval for a single question. Returns a list of (chunk_id, document, metadata) tuples.
+    """
+    questions = None if question is None else [question]
+    return retrieve_chunks_batch(coll, [question_embedding], top_k, diversity, questions)[0]
 
 
 # Production security middleware (only in production)
@@ -318,10 +689,28 @@ async def add_security_headers(request: Request, call_next):
 
     # Always add these headers
     response.headers["X-API-Version"] = "1.0.0"
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    # Routes serving immutable content (share pages) set their own caching
+    if "Cache-Control" not in response.headers:
+        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
 
     return response
 
+# Compress responses larger than GZIP_MINIMUM_SIZE bytes (answers with sources are several KB of text).
+# Added last so it wraps every other middleware and compresses the final body.
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MINIMUM_SIZE", "500")))
+
+def check_question_text(v):
+    # Remove extra whitespace and validate
+    v = v.strip()
+    if not v:
+        raise ValueError('Question cannot be empty')
+
+    # Check for suspicious patterns (basic protection)
+    if any(suspicious in v.lower() for suspicious in ['<script', 'javascript:', 'data:', 'vbscript:']):
+        raise ValueError('Question contains invalid content')
+
+    return v
+
 class QuestionRequest(BaseModel):
     question: str = Field(
         ...,
@@ -332,17 +721,79 @@ class QuestionRequest(BaseModel):
 
     @validator('question')
     def validate_question(cls, v):
-        # Remove extra whitespace and validate
-        v = v.strip()
-        if not v:
-            raise ValueError('Question cannot be empty')
-
-        # Check for suspicious patterns (basic protection)
-        if any(suspicious in v.lower() for suspicious in ['<script', 'javascript:', 'data:', 'vbscript:']):
-            raise ValueError('Question contains invalid content')
+        return check_question_text(v)
+
+class AnswerOptions(BaseModel):
+    top_k: Optional[int] = Field(
+        None,
+        ge=1,
+        le=10,
+        description="Number of excerpts to retrieve (defaults to RETRIEVAL_TOP_K)"
+    )
+    diversity: Optional[float] = Field(
+        None,
+        ge=0.0,
+        le=1.0,
+        description="0 ranks excerpts purely by similarity, 1 purely by diversity"
+    )
+    expand_context: Optional[bool] = Field(
+        None,
+        description="Include the chunks surrounding each excerpt (defaults to CONTEXT_EXPANSION)"
+    )
+    include_quotes: Optional[str] = Field(
+        None,
+        description="Excerpt text in sources: full, truncated or none (defaults to DEFAULT_QUOTE_MODE). "
+                    "Full excerpts are available from /api/source/{chunk_id}"
+    )
 
+    @validator('include_quotes')
+    def validate_include_quotes(cls, v):
+        if v is not None and v not in QUOTE_MODES:
+            raise ValueError(f"include_quotes must be one of: {', '.join(QUOTE_MODES)}")
         return v
 
+    def resolve(self):
+        """Returns (top_k, diversity, expand, quote_mode) with server defaults filled in."""
+        return (
+            self.top_k or RETRIEVAL_TOP_K,
+            RETRIEVAL_DIVERSITY if self.diversity is None else self.diversity,
+            CONTEXT_EXPANSION if self.expand_context is None else self.expand_context,
+            self.include_quotes or DEFAULT_QUOTE_MODE,
+        )
+
+class AskRequest(QuestionRequest, AnswerOptions):
+    conversation: bool = Field(
+        False,
+        description="Start a conversation session; the response includes its session_id"
+    )
+    session_id: Optional[str] = Field(
+        None,
+        max_length=64,
+        description="Continue a conversation. An expired session is replaced by a new one"
+    )
+
+# Largest number of questions accepted in one /api/ask/batch request
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "200"))
+# Questions each IP may send through /api/ask/batch; every question is one LLM call, so the
+# request limit alone would let one client make hundreds of calls a minute
+BATCH_QUESTION_RATE_LIMIT = parse_rate_limit(os.getenv("BATCH_QUESTION_RATE_LIMIT", "200/hour"))
+
+class BatchAskRequest(AnswerOptions):
+    questions: list[str] = Field(
+        ...,
+        min_length=1,
+        description=f"Up to {BATCH_MAX_QUESTIONS} questions, answered with the same settings"
+    )
+
+    @validator('questions')
+    def validate_questions(cls, v):
+        if len(v) > BATCH_MAX_QUESTIONS:
+            raise ValueError(f'At most {BATCH_MAX_QUESTIONS} questions per batch')
+        for question in v:
+            if len(question) > 1000:
+                raise ValueError('Questions must be at most 1000 characters')
+        return [check_question_text(question) for question in v]
+
 class ShareRequest(BaseModel):
     question: str = Field(..., min_length=1, max_length=1000, description="User question")
     answer: str = Field(..., min_length=1, max_length=10000, description="AI response")
@@ -364,10 +815,204 @@ class ShareRequest(BaseModel):
 def read_root():
     return {"message": "Welcome to the John A. Macdonald chatbot API."}
 
+@app.get("/api/health")
+async def health():
+    """
+    Liveness plus load information: startup progress, admission queue, shed counts and LLM circuit state.
+    Answers 503 once a required component has failed to load, so the server gets restarted.
+    """
+    state = startup_loader.state()
+    content = {
+        "status": state,
+        "startup": startup_loader.stats(),
+        "admission": admission_controller.stats(),
+        "coalesced_requests": inflight_questions.coalesced_count,
+        "llm_circuits": llm_client.status(),
+        "faq": faq_cache.stats(),
+        "query_encoder": query_encoder.stats(),
+        "reranker": reranker.stats() if RERANKER_ENABLED else None,
+        "index_version": active_index[1],
+    }
+    if state == "failed":
+        return JSONResponse(status_code=503, content=content)
+    return content
+
+# --- Answer Pipeline ---
+# Models are tried in order until one answers
+LLM_MODELS = [m.strip() for m in os.getenv("LLM_MODELS", "google/gemini-2.0-flash-001").split(",") if m.strip()]
+LLM_TEMPERATURE = 0.8
+LLM_MAX_TOKENS = 1500
+
+llm_client = LLMClient(
+    models=LLM_MODELS,
+    api_key=os.getenv("OPENROUTER_API_KEY"),
+    base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+    timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+    total_timeout=float(os.getenv("LLM_TOTAL_TIMEOUT_SECONDS", "60")),
+    hedge_delay=float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "8")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+    breaker_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+    breaker_reset=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+)
+
+GENERIC_ERROR_MESSAGE = "I'm experiencing technical difficulties. Please try again in a moment."
+
+class AnswerError(Exception):
+    """
+    A failed answer. `user_message` is returned to the client; `log_message`, if set,
+    is what gets written to the logs table. `index_version` is the snapshot the request
+    was using, if it got that far.
+    """
+    def __init__(self, user_message, log_message=None, index_version=None):
+        super().__init__(log_message or user_message)
+        self.user_message = user_message
+        self.log_message = log_message
+        self.index_version = index_version
+
+def format_history(session):
+    """
+    The conversation so far as prompt text: the summary of compacted turns, then the recent
+    turns with their answers trimmed to share HISTORY_TOKEN_BUDGET.
+    """
+    lines = [session["summary"]] if session["summary"] else []
+    turns = session["turns"]
+    for turn in turns:
+        answer, _ = trim_to_sentences(turn["answer"], HISTORY_TOKEN_BUDGET // len(turns), count_tokens)
+        lines.append(f"Reader: {turn['question']}\nYou: {answer or '...'}")
+    return "\n\n".join(lines)
+
+def carried_hits(coll, session, hits):
+    """
+    Chunks retrieved for the previous turn that aren't among `hits`, in their original order,
+    so a follow-up keeps the context it builds on.
+    """
+    new_ids = {chunk_id for chunk_id, _, _ in hits}
+    carry = [cid for cid in session["turns"][-1]["chunk_ids"] if cid not in new_ids][:SESSION_CARRY_CHUNKS]
+    if not carry:
+        return []
+    result = coll.get(ids=carry, include=["documents", "metadatas"])
+    found = {cid: (cid, doc, meta) for cid, doc, meta in zip(result["ids"], result["documents"], result["metadatas"])}
+    return [found[cid] for cid in carry if cid in found]
+
+def generate_answer(question, top_k, diversity, expand, session=None):
+    """
+    Runs retrieval, prompt packing and the OpenRouter call for a single question.
+    With a conversation `session` (see conversation_store.py), retrieval also looks at the
+    previous question, the previous turn's chunks are carried over and the history is
+    added to the prompt.
+    Returns a dict with the answer, the retrieved hits, token usage and the index version
+    used. Raises AnswerError.
+    """
+    follow_up = session is not None and bool(session["turns"])
+    # Follow-ups are often elliptical ("What happened next?"), so retrieve for both questions
+    retrieval_text = f"{session['turns'][-1]['question']} {question}" if follow_up else question
+    question_embedding = query_encoder.encode(retrieval_text)
+
+    # Over-fetch and re-rank for a more varied set of excerpts
+    coll, version = get_collection()
+    if coll is None:
+        raise AnswerError("Vector database not available")
+    hits = retrieve_chunks(coll, question_embedding, top_k=top_k, diversity=diversity, question=retrieval_text)
+    if follow_up:
+        hits += carried_hits(coll, session, hits)
+
+    history = format_history(session) if session is not None and (session["turns"] or session["summary"]) else None
+    return answer_from_hits(coll, version, question, hits, expand, history)
+
+def answer_from_hits(coll, version, question, hits, expand, history=None):
+    """
+    Packs the prompt from already retrieved hits and calls the LLM. `version` is the index
+    snapshot `coll` belongs to. Raises AnswerError.
+    """
+    if expand:
+        prompt_hits = get_neighbor_index(coll, version).expand(hits, EXPANSION_TOKEN_BUDGET, count_tokens)
+    else:
+        prompt_hits = hits
+    prompt, packed_prompt_tokens = format_prompt(
+        [(doc, meta) for _, doc, meta in prompt_hits], question, history
+    )
+
+    # Hedged, retried and with model fallback - see llm_client.py
+    try:
+        llm_result = llm_client.complete(
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_TOKENS,
+        )
+        response_data = llm_result.response_data
+
+        # Extract the answer
+        answer = response_data["choices"][0]["message"]["content"]
+
+    except LLMError as e:
+        error_msg = f"Request failed: {str(e)}"
+        print(error_msg)
+        raise AnswerError(GENERIC_ERROR_MESSAGE, error_msg, version)
+    except (KeyError, IndexError, TypeError) as e:
+        print(f"Malformed response: {e}")
+        print(f"Response data: {response_data}")  # Keep detailed logging
+        raise AnswerError(GENERIC_ERROR_MESSAGE, f"Malformed response: {e}, Response: {response_data}", version)
+
+    if llm_result.attempt > 1 or llm_result.hedged:
+        print(f"[INFO] Answered by {llm_result.model} on attempt {llm_result.attempt}" + (" (hedged)" if llm_result.hedged else ""))
+
+    # Extract usage data from the response
+    usage = response_data.get("usage", {})
+    return {
+        "answer": answer.strip(),
+        "hits": hits,
+        "model": llm_result.model,
+        "llm_attempt": llm_result.attempt,
+        "llm_hedged": llm_result.hedged,
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "packed_prompt_tokens": packed_prompt_tokens,
+        "completion_tokens": usage.get("completion_tokens"),
+        "total_tokens": usage.get("total_tokens"),
+        "index_version": version,
+    }
+
+def _answer_or_error(question, top_k, diversity, expand, session=None):
+    # Errors are returned rather than raised so coalesced callers can tell them apart from their own
+    try:
+        return generate_answer(question, top_k, diversity, expand, session), None
+    except AnswerError as e:
+        return None, e
+
+def _answer_hits_or_error(coll, version, question, hits, expand):
+    try:
+        return answer_from_hits(coll, version, question, hits, expand), None
+    except AnswerError as e:
+        return None, e
+
+# Identical questions arriving while one is already being answered share its result
+inflight_questions = SingleFlight()
+
+def question_flight_key(question, top_k, diversity, expand):
+    # Everything that changes the answer is part of the key
+    return (normalize_question(question), tuple(LLM_MODELS), LLM_TEMPERATURE, top_k, diversity, expand)
+
+def format_sources(hits):
+    return [
+        {
+            "chunk_id": chunk_id,
+            "quote": clean_duplicated_text(doc),
+            "source": meta.get("source", "Unknown source"),
+            "page": meta.get("page", "Unknown"),
+            "year": meta.get("year", "Unknown year"),
+            "parliament": meta.get("parliament"),
+            "session": meta.get("session")
+        }
+        for chunk_id, doc, meta in hits
+    ]
+
 @app.post("/api/ask") # Prefixed with /api
 @limiter.limit("10/minute")  # Apply a rate limit of 10 requests per minute to this endpoint
+@profile_thread
 def ask_macdonald(
-    question_request: QuestionRequest,
+    question_request: AskRequest,
     request: Request,
     db: sqlite3.Connection = Depends(get_database)  # Add this dependency
 ):
@@ -375,131 +1020,219 @@ def ask_macdonald(
     # --- Start Usage Logging ---
     start_time = time.time()
     user_ip = get_remote_address(request)
-    model_used = "google/gemini-2.0-flash-001"
     # --- End Usage Logging ---
 
-    question_embedding = embedder.encode(question_request.question).tolist()
-
-    # Increase results to get more historical context
-    coll = get_collection()
-    if coll is None:
-        return {"error": "Vector database not available"}
-    results = coll.query(
-        query_embeddings=[question_embedding],
-        n_results=5  # Increased from 3 to 5 for more context
+    question = question_request.question
+    top_k, diversity, expand, quote_mode = question_request.resolve()
+
+    # Conversation sessions: an unknown or expired session_id starts a new session
+    session_id, session = None, None
+    if question_request.session_id or question_request.conversation:
+        if question_request.session_id:
+            session = load_session(db, question_request.session_id)
+        if session is None:
+            session_id, session = create_session(db), {"summary": "", "turns": []}
+        else:
+            session_id = question_request.session_id
+
+    # Common questions asked with default settings are answered from the pre-generated FAQ.
+    # Answers in a session depend on the conversation, so they skip the FAQ and coalescing.
+    uses_defaults = (
+        session is None
+        and question_request.top_k is None
+        and question_request.diversity is None
+        and question_request.expand_context is None
     )
+    faq_entry = faq_cache.lookup(question) if uses_defaults else None
+    if faq_entry is not None:
+        log_request(
+            conn=db,
+            user_ip=user_ip,
+            question=question,
+            is_successful=True,
+            llm_response=faq_entry["answer"],
+            llm_model_used=faq_entry["model"],
+            latency_ms=int((time.time() - start_time) * 1000),
+            faq_hit=True
+        )
+        return {
+            "question": question,
+            "answer": faq_entry["answer"],
+            "sources": apply_quote_mode(faq_entry["sources"], quote_mode)
+        }
+
+    if session is not None:
+        (result, error), coalesced = _answer_or_error(question, top_k, diversity, expand, session), False
+    else:
+        (result, error), coalesced = inflight_questions.do(
+            question_flight_key(question, top_k, diversity, expand), lambda: _answer_or_error(question, top_k, diversity, expand)
+        )
+    latency = int((time.time() - start_time) * 1000)
 
-    chunks = list(zip(results["documents"][0], results["metadatas"][0]))
-    prompt = format_prompt(chunks, question_request.question)
+    if error is not None:
+        if error.log_message:
+            log_request(
+                conn=db,
+                user_ip=user_ip, question=question, is_successful=False,
+                latency_ms=latency, error_message=error.log_message, coalesced=coalesced,
+                index_version=error.index_version
+            )
+        if session_id is not None:
+            return {"error": error.user_message, "session_id": session_id}
+        return {"error": error.user_message}
 
-    # Use OpenRouter with better error handling
-    try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
-                "Content-Type": "application/json",
-            },
-            data=json.dumps({
-                "model": model_used,
-                "messages": [
-                    {"role": "system", "content": "You are Sir John A. Macdonald, Canada's first Prime Minister. You are an experienced educator and statesman who enjoys sharing comprehensive historical knowledge. Your responses should be thorough, informative, and engaging. IMPORTANT: Respond ONLY in English. Do not use any other languages or characters."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.8,
-                "max_tokens": 1500,
-            }),
-            timeout=60
-        )
+    # Log the successful request. Token counts are only logged for the request that
+    # actually called the LLM, so token sums reflect what was spent.
+    log_request(
+        conn=db,
+        user_ip=user_ip,
+        question=question,
+        is_successful=True,
+        llm_response=result["answer"],
+        llm_model_used=result["model"],
+        llm_attempt=result["llm_attempt"],
+        llm_hedged=result["llm_hedged"],
+        prompt_tokens=None if coalesced else result["prompt_tokens"],
+        packed_prompt_tokens=None if coalesced else result["packed_prompt_tokens"],
+        completion_tokens=None if coalesced else result["completion_tokens"],
+        total_tokens=None if coalesced else result["total_tokens"],
+        latency_ms=latency,
+        coalesced=coalesced,
+        index_version=result["index_version"]
+    )
 
-        # Check if request was successful
-        response.raise_for_status()
+    response = {
+        "question": question,
+        "answer": result["answer"],
+        "sources": apply_quote_mode(format_sources(result["hits"]), quote_mode)
+    }
+    if session_id is not None:
+        add_turn(db, session_id, question, result["answer"], [chunk_id for chunk_id, _, _ in result["hits"]])
+        response["session_id"] = session_id
+    return response
 
-        # Parse the response
-        response_data = response.json()
-        latency = int((time.time() - start_time) * 1000)
 
-        # Extract usage data from the response
-        usage = response_data.get("usage", {})
-        prompt_tokens = usage.get("prompt_tokens")
-        completion_tokens = usage.get("completion_tokens")
-        total_tokens = usage.get("total_tokens")
+@app.get("/api/source/{chunk_id}")
+@limiter.limit("60/minute")
+def get_source(chunk_id: str, request: Request):
+    """
+    Returns the full excerpt for a source cited in an answer, for clients that asked
+    /api/ask for truncated or no quotes.
+    """
+    coll, _ = get_collection()
+    if coll is None:
+        return JSONResponse(status_code=503, content={"error": "Vector database not available"})
 
-        # Check if response has expected structure
-        if "choices" not in response_data or not response_data["choices"]:
-            error_msg = "API response missing 'choices' field."
-            print(f"Error: {error_msg}")
-            print(f"Detailed response data: {response_data}")  # Log for debugging
-            log_request(
-                conn=db,
-                user_ip=user_ip, question=question_request.question, is_successful=False,
-                latency_ms=latency, error_message=f"Unexpected response format: {response_data}"
-            )
-            return {"error": "I'm experiencing technical difficulties. Please try again in a moment."}  # Generic message
+    result = coll.get(ids=[chunk_id], include=["documents", "metadatas"])
+    if not result["ids"]:
+        return JSONResponse(status_code=404, content={"error": "Source not found."})
+    return format_sources([(result["ids"][0], result["documents"][0], result["metadatas"][0])])[0]
 
-        # Extract the answer
-        answer = response_data["choices"][0]["message"]["content"]
 
-        # Log the successful request
-        log_request(
-            conn=db,
-            user_ip=user_ip,
-            question=question_request.question,
-            is_successful=True,
-            llm_response=answer,
-            llm_model_used=model_used,
-            prompt_tokens=prompt_tokens,
-            completion_tokens=completion_tokens,
-            total_tokens=total_tokens,
-            latency_ms=latency
-        )
+@app.post("/api/ask/batch")
+@limiter.limit("2/minute")
+async def ask_macdonald_batch(batch_request: BatchAskRequest, request: Request):
+    """
+    Answers many questions in one request. All questions are encoded in one batch and
+    retrieved with one collection query; LLM calls then run BATCH_LLM_CONCURRENCY at a time.
+    Each question counts against the caller's BATCH_QUESTION_RATE_LIMIT.
 
-    except requests.exceptions.RequestException as e:
-        latency = int((time.time() - start_time) * 1000)
-        error_msg = f"Request failed: {str(e)}"
-        print(error_msg)
-        log_request(
-            conn=db,
-            user_ip=user_ip, question=question_request.question, is_successful=False,
-            latency_ms=latency, error_message=error_msg
-        )
-        return {"error": error_msg}
-    except KeyError as e:
-        print(f"KeyError: {e}")
-        print(f"Response data: {response_data}")  # Keep detailed logging
-        log_request(
-            conn=db,
-            user_ip=user_ip, question=question_request.question, is_successful=False,
-            latency_ms=latency, error_message=f"KeyError: {e}, Response: {response_data}"
-        )
-        return {"error": "I'm experiencing technical difficulties. Please try again in a moment."}
-    except Exception as e:
-        print(f"Unexpected error: {e}")  # Keep detailed logging
-        log_request(
-            conn=db,
-            user_ip=user_ip, question=question_request.question, is_successful=False,
-            latency_ms=latency, error_message=f"Unexpected error: {str(e)}"
+    Streams newline-delimited JSON, one line per question in the order answers complete:
+    {"index", "question", "answer", "sources"} or {"index", "question", "error"}.
+    """
+    user_ip = get_remote_address(request)
+    questions = batch_request.questions
+    top_k, diversity, expand, quote_mode = batch_request.resolve()
+
+    # Charged per question; a batch that doesn't fit is refused without using the allowance
+    question_limiter = limiter.limiter
+    if not question_limiter.test(BATCH_QUESTION_RATE_LIMIT, "batch_questions", user_ip, cost=len(questions)) \
+            or not question_limiter.hit(BATCH_QUESTION_RATE_LIMIT, "batch_questions", user_ip, cost=len(questions)):
+        window = question_limiter.get_window_stats(BATCH_QUESTION_RATE_LIMIT, "batch_questions", user_ip)
+        return JSONResponse(
+            status_code=429,
+            content={"error": f"Batch limit exceeded: {window.remaining} of {BATCH_QUESTION_RATE_LIMIT} questions left."},
+            headers={"Retry-After": str(max(1, int(window.reset_time - time.time())))}
         )
-        return {"error": "I'm unable to respond at the moment. Please try again shortly."}
 
-    # Clean up the response
-    main_response = answer.strip()
+    coll, version = await asyncio.to_thread(get_collection)
+    if coll is None:
+        return JSONResponse(status_code=503, content={"error": "Vector database not available"})
 
-    return {
-        "question": question_request.question,
-        "answer": main_response,
-        "sources": [
-            {
-                "quote": clean_duplicated_text(doc),  # We still send it, but won't display it
-                "source": meta.get("source", "Unknown source"),
-                "page": meta.get("page", "Unknown"),
-                "year": meta.get("year", "Unknown year"),
-                "parliament": meta.get("parliament"),
-                "session": meta.get("session")
-            }
-            for doc, meta in zip(results["documents"][0], results["metadatas"][0])
-        ]
-    }
+    @profile_thread
+    def retrieve_all():
+        embeddings = query_encoder.encode_many(questions)
+        return retrieve_chunks_batch(coll, embeddings, top_k, diversity, questions)
+
+    start_time = time.time()
+    all_hits = await asyncio.to_thread(retrieve_all)
+    # Each question's logged latency includes its share of the batched encode and query
+    retrieval_ms = (time.time() - start_time) * 1000 / len(questions)
+
+    semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+    async def answer(index):
+        async with semaphore:
+            started = time.time()
+            result, error = await asyncio.to_thread(
+                profile_thread(_answer_hits_or_error), coll, version, questions[index], all_hits[index], expand
+            )
+            return index, result, error, int((time.time() - started) * 1000 + retrieval_ms)
+
+    async def stream():
+        # The request's dependencies may be torn down before the stream finishes, so the
+        # stream uses its own connection
+        db = connect_database()
+        tasks = [asyncio.create_task(answer(i)) for i in range(len(questions))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, result, error, latency = await next_done
+                question = questions[index]
+
+                if error is not None:
+                    if error.log_message:
+                        log_request(
+                            conn=db,
+                            user_ip=user_ip, question=question, is_successful=False,
+                            latency_ms=latency, error_message=error.log_message,
+                            index_version=version
+                        )
+                    line = {"index": index, "question": question, "error": error.user_message}
+                else:
+                    log_request(
+                        conn=db,
+                        user_ip=user_ip,
+                        question=question,
+                        is_successful=True,
+                        llm_response=result["answer"],
+                        llm_model_used=result["model"],
+                        llm_attempt=result["llm_attempt"],
+                        llm_hedged=result["llm_hedged"],
+                        prompt_tokens=result["prompt_tokens"],
+                        packed_prompt_tokens=result["packed_prompt_tokens"],
+                        completion_tokens=result["completion_tokens"],
+                        total_tokens=result["total_tokens"],
+                        latency_ms=latency,
+                        index_version=version
+                    )
+                    line = {
+                        "index": index,
+                        "question": question,
+                        "answer": result["answer"],
+                        "sources": apply_quote_mode(format_sources(result["hits"]), quote_mode)
+                    }
+                yield json.dumps(line) + "\n"
+        finally:
+            # If the client goes away, questions still waiting for the semaphore never start.
+            # LLM calls already running in worker threads can't be interrupted; they finish
+            # in the background and their answers are dropped.
+            for task in tasks:
+                task.cancel()
+            db.close()
+
+    # Content-Encoding makes GZipMiddleware pass the stream through, so each line is
+    # sent as soon as its answer is ready instead of waiting for the compressor's buffer
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers={"Content-Encoding": "identity"})
 
 
 # --- Share Link Endpoints ---
@@ -521,6 +1254,11 @@ async def share_conversation(
         sources=share_request.sources
     )
     if share_id:
+        # Rendered now so the first view of the link is a static file read
+        await asyncio.to_thread(
+            write_share_page, share_id, share_request.question, share_request.answer,
+            share_request.sources, FRONTEND_URL
+        )
         return {"share_id": share_id}
     else:
         return JSONResponse(status_code=500, content={"error": "Could not create share link."})
@@ -542,6 +1280,137 @@ async def get_conversation(
         return JSONResponse(status_code=404, content={"error": "Shared conversation not found."})
 
 
+@app.get("/share/{share_id}")
+@limiter.limit("60/minute")
+async def get_share_page(
+    share_id: str,
+    request: Request,
+    db: sqlite3.Connection = Depends(get_database)
+):
+    """
+    Serves the static HTML snapshot of a shared conversation (for link previews and
+    first-time visitors). Snapshots missing from disk, e.g. for shares created before
+    snapshots existed, are rendered on first request.
+    """
+    path = share_page_path(share_id)
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": "Shared conversation not found."})
+
+    if not os.path.exists(path):
+        shared_data = get_shared_link(conn=db, share_id=share_id)
+        if not shared_data:
+            return JSONResponse(status_code=404, content={"error": "Shared conversation not found."})
+        path = await asyncio.to_thread(write_share_page, share_id, **shared_data, site_url=FRONTEND_URL)
+        if path is None:
+            return JSONResponse(status_code=500, content={"error": "Could not render shared conversation."})
+
+    return FileResponse(path, media_type="text/html", headers={"Cache-Control": SHARE_PAGE_CACHE_CONTROL})
+
+
+# --- Admin Endpoints ---
+
+# Dashboards poll every few seconds; identical queries within this window are served from memory
+admin_stats_cache = TTLCache(ttl=float(os.getenv("ADMIN_STATS_CACHE_SECONDS", "5")))
+
+@app.get("/api/admin/stats", dependencies=[Depends(require_admin)])
+def admin_stats(
+    granularity: str = "hour",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    db: sqlite3.Connection = Depends(get_database)
+):
+    """
+    Request counts, success rate, token usage and latency percentiles per hour or day,
+    read from the rollup tables maintained by log_maintenance.py.
+    """
+    if granularity not in GRANULARITIES:
+        return JSONResponse(status_code=400, content={"error": f"granularity must be one of: {', '.join(GRANULARITIES)}"})
+
+    default_start, default_end = default_range(granularity)
+    try:
+        start = parse_time(start) if start else default_start
+        end = parse_time(end) if end else default_end
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "start and end must be ISO dates or datetimes"})
+    if start > end:
+        return JSONResponse(status_code=400, content={"error": "start must not be after end"})
+
+    cache_key = (granularity, start, end)
+    stats = admin_stats_cache.get(cache_key)
+    if stats is None:
+        stats = fetch_stats(db, start, end, granularity)
+        admin_stats_cache.set(cache_key, stats)
+    return stats
+
+
+@app.get("/api/admin/index", dependencies=[Depends(require_admin)])
+def admin_index():
+    """
+    The index snapshot this process serves, the published one, and all available snapshots.
+    """
+    return {"active": active_index[1], "published": current_version(), "versions": list_versions()}
+
+@app.post("/api/admin/index/reload", dependencies=[Depends(require_admin)])
+def admin_index_reload(version: Optional[str] = None):
+    """
+    Publishes `version` (if given, e.g. to roll back) and swaps this process to the
+    published snapshot. Other worker processes follow within INDEX_WATCH_SECONDS.
+    Old snapshots are deleted only with the numpy backend: a Chroma client still reading
+    a deleted snapshot would fail (see gc_snapshots).
+    """
+    if version is not None:
+        try:
+            publish(version)
+        except ValueError as e:
+            return JSONResponse(status_code=404, content={"error": str(e)})
+    try:
+        swapped = reload_index()
+    except Exception as e:
+        print(f"[ERROR] Index reload failed: {e}")
+        return JSONResponse(status_code=500, content={"error": "Could not load the index snapshot."})
+    deleted = gc_snapshots() if INDEX_BACKEND == "numpy" else []
+    return {"active": active_index[1], "swapped": swapped, "deleted_snapshots": deleted}
+
+
+@app.post("/api/admin/profile", dependencies=[Depends(require_admin)])
+async def admin_profile(requests: Optional[int] = None, seconds: Optional[float] = None):
+    """
+    Starts profiling either the next `requests` /api/ask requests (one report each) or
+    the whole process for `seconds`. Reports are listed at /api/admin/profiles.
+    """
+    if (requests is None) == (seconds is None):
+        return JSONResponse(status_code=400, content={"error": "Pass either requests or seconds."})
+    if requests is not None:
+        if not 0 <= requests <= PROFILE_MAX_REQUESTS:
+            return JSONResponse(status_code=400, content={"error": f"requests must be between 0 and {PROFILE_MAX_REQUESTS}."})
+        request_profiler.arm_requests(requests)
+    else:
+        if not 0 < seconds <= PROFILE_MAX_SECONDS:
+            return JSONResponse(status_code=400, content={"error": f"seconds must be between 0 and {PROFILE_MAX_SECONDS}."})
+        try:
+            request_profiler.start_window(seconds)
+        except RuntimeError as e:
+            return JSONResponse(status_code=409, content={"error": str(e)})
+    return request_profiler.status()
+
+@app.get("/api/admin/profiles", dependencies=[Depends(require_admin)])
+def admin_profiles():
+    """
+    Profiling status and the saved reports, newest first.
+    """
+    return {**request_profiler.status(), "reports": request_profiler.list_reports()}
+
+@app.get("/api/admin/profiles/{name}", dependencies=[Depends(require_admin)])
+def admin_profile_report(name: str):
+    """
+    One report in collapsed-stack format, for flamegraph.pl or speedscope.
+    """
+    path = request_profiler.report_path(name)
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": "Report not found"})
+    return FileResponse(path, media_type="text/plain", filename=name)
+
+
 # --- Frontend Serving ---
 
 # Define the path to the built frontend files
@@ -0,0 +1,66 @@
+"""
+Maximal-marginal-relevance (MMR) re-ranking of an over-fetched candidate pool.
+
+The nearest neighbours of a question are often adjacent chunks of the same speech.
+MMR picks candidates one at a time, trading similarity to the question against
+similarity to what has already been picked, so the final top-k covers more ground.
+"""
+import numpy as np
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _match_range(scores, reference):
+    """Maps `scores` linearly onto [min, max] of `reference`, keeping their order."""
+    low, high = float(scores.min()), float(scores.max())
+    if high - low < 1e-12:
+        return np.full_like(reference, reference.max())
+    return reference.min() + (scores - low) * ((reference.max() - reference.min()) / (high - low))
+
+
+def mmr_select(query_embedding, candidate_embeddings, k, lambda_mult=0.7, relevance=None):
+    """
+    Returns the indices of `k` candidates in selection order.
+
+    lambda_mult: 1.0 ranks purely by relevance, 0.0 purely by diversity.
+    relevance: optional precomputed relevance scores (one per candidate, higher is better),
+               e.g. a cross-encoder's. Redundancy is a cosine similarity, so they are mapped
+               linearly onto the range of the candidates' cosine similarity with the query:
+               the order they give is kept, and lambda_mult weighs the two as it does without
+               them. Defaults to cosine similarity with the query.
+    """
+    candidates = _normalize(np.asarray(candidate_embeddings, dtype=np.float32))
+    n = len(candidates)
+    if n == 0:
+        return []
+    k = min(k, n)
+
+    query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+    cosine = candidates @ query
+    if relevance is None:
+        relevance = cosine
+    else:
+        relevance = _match_range(np.asarray(relevance, dtype=np.float32), cosine)
+
+    # Pairwise cosine similarity of the pool, computed once (30 x 30 for the default pool)
+    similarity = candidates @ candidates.T
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    # Highest similarity of each candidate to anything selected so far
+    max_similarity = similarity[first].copy()
+    available = np.ones(n, dtype=bool)
+    available[first] = False
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+    return selected
@@ -0,0 +1,177 @@
+"""
+Index of chunks by (document, page, chunk_index), used to stitch a retrieved chunk
+together with the chunks just before and after it.
+
+chunk_text splits long speeches, so a retrieved chunk often starts mid-argument.
+All chunks of one Hansard speech share the speech's starting page, so their keys only
+differ in chunk_index and the neighbours are two binary searches away - no extra
+vector queries needed. Hansard chunks are only stitched when they carry a speech_index.
+
+The document is the chunk's url when it has one, otherwise its source: several web pages
+share a source name, and their chunk_index restarts at 0 on every page.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from chunk_store import INT_MISSING, STRING_MISSING, ChunkStore
+
+# Bits per part of the packed (document, page, chunk_index) key
+_KEY_BITS = 21
+
+
+def _document(source_code, url_code, source_count):
+    # Urls are numbered after the sources so the two never share a code
+    return np.where(url_code == STRING_MISSING, source_code, source_count + url_code)
+
+
+def _pack(document, page, chunk_index):
+    # Pages are missing (INT_MISSING) for web sources; they pack as 0, real pages as page + 1
+    page = np.where(page == INT_MISSING, 0, page + 1)
+    return (np.int64(document) << (2 * _KEY_BITS)) | (np.int64(page) << _KEY_BITS) | np.int64(chunk_index)
+
+
+class NeighborIndex:
+    def __init__(self, store):
+        """
+        store: a ChunkStore holding every chunk (see get_neighbor_index).
+        Keys are packed into one int64 per chunk and sorted, so a lookup is a binary search.
+        """
+        self.store = store
+        # Token counts are computed on first use and kept, since the same chunks come up often
+        self._token_counts = np.full(len(store), -1, dtype=np.int32)
+        self._source_count = len(store.vocab.get("source", []))
+        if "source" not in store.columns or "chunk_index" not in store.columns:
+            self._keys = self._rows = np.zeros(0, dtype=np.int64)
+            return
+
+        source = np.asarray(store.columns["source"], dtype=np.int64)
+        if store.kinds.get("url") == "str":
+            url = np.asarray(store.columns["url"], dtype=np.int64)
+        else:
+            url = np.full(len(store), STRING_MISSING, dtype=np.int64)
+        document = _document(source, url, self._source_count)
+        page = np.asarray(store.columns.get("page", np.full(len(store), INT_MISSING)), dtype=np.int64)
+        chunk_index = np.asarray(store.columns["chunk_index"], dtype=np.int64)
+
+        rows = np.flatnonzero(chunk_index != INT_MISSING)
+        keys = _pack(document[rows], page[rows], chunk_index[rows])
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._rows = rows[order]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _key(self, meta):
+        source_code = self.store.code("source", meta.get("source"))
+        if source_code is None or meta.get("chunk_index") is None:
+            return None
+        url_code = STRING_MISSING
+        if meta.get("url") is not None:
+            url_code = self.store.code("url", meta["url"])
+            if url_code is None:
+                return None
+        page = meta.get("page")
+        document = _document(source_code, url_code, self._source_count)
+        return int(_pack(document, INT_MISSING if page is None else page, meta["chunk_index"]))
+
+    def _find(self, key):
+        i = int(np.searchsorted(self._keys, key))
+        if i < len(self._keys) and self._keys[i] == key:
+            return int(self._rows[i])
+        return None
+
+    def neighbor(self, meta, offset):
+        """
+        Returns the row of the chunk `offset` chunks away from `meta` in the same speech,
+        or None if there isn't one.
+        """
+        key = self._key(meta)
+        if key is None:
+            return None
+        row = self._find(key + offset)
+        if row is None:
+            return None
+        # In Hansard (chunks with a parliament number) two speeches can start on the same
+        # page, and only speech_index tells them apart. Chunks extracted before it was
+        # added aren't stitched at all; see "Context expansion" in the README.
+        if meta.get("parliament") is not None:
+            speech = meta.get("speech_index")
+            if speech is None or "speech_index" not in self.store.columns:
+                return None
+            if self.store.value("speech_index", row) != speech:
+                return None
+        return row
+
+    def _tokens(self, row, count_tokens, doc=None):
+        if self._token_counts[row] < 0:
+            self._token_counts[row] = count_tokens(self.store.document(row) if doc is None else doc)
+        return int(self._token_counts[row])
+
+    def expand(self, hits, token_budget, count_tokens):
+        """
+        Stitches each hit with its previous and next chunk while the stitched text stays
+        within `token_budget` tokens. Neighbours that are hits themselves are left alone
+        so the same text doesn't appear twice in the prompt.
+
+        hits: list of (chunk_id, document, metadata).
+        Returns a new list of (chunk_id, document, metadata) with expanded documents.
+        """
+        hit_rows = {self._find(key) for key in (self._key(meta) for _, _, meta in hits) if key is not None}
+        expanded = []
+
+        for chunk_id, doc, meta in hits:
+            key = self._key(meta)
+            row = self._find(key) if key is not None else None
+            used = self._tokens(row, count_tokens, doc) if row is not None else count_tokens(doc)
+            parts = [doc]
+
+            for offset in (-1, 1):
+                neighbor_row = self.neighbor(meta, offset)
+                if neighbor_row is None or neighbor_row in hit_rows:
+                    continue
+                neighbor_tokens = self._tokens(neighbor_row, count_tokens)
+                if used + neighbor_tokens > token_budget:
+                    continue
+                neighbor_doc = self.store.document(neighbor_row)
+                used += neighbor_tokens
+                if offset < 0:
+                    parts.insert(0, neighbor_doc)
+                else:
+                    parts.append(neighbor_doc)
+
+            expanded.append((chunk_id, " ".join(parts), meta))
+
+        return expanded
+
+
+# Indexes by snapshot version; during a swap, requests on the old and the new snapshot
+# both find theirs instead of rebuilding it in turn
+_indexes = OrderedDict()
+_INDEXES_KEPT = 2
+_index_lock = threading.Lock()
+
+
+def get_neighbor_index(coll, version):
+    """
+    Builds the index for the collection of snapshot `version` on first use and reuses it
+    afterwards. The indexes of the last _INDEXES_KEPT versions are kept.
+    A NumpyIndex already holds its chunks in a ChunkStore, which is shared rather than copied.
+    """
+    index = _indexes.get(version)
+    if index is None:
+        with _index_lock:
+            index = _indexes.get(version)
+            if index is None:
+                store = getattr(coll, "store", None)
+                if store is None:
+                    data = coll.get(include=["documents", "metadatas"])
+                    store = ChunkStore.from_records(data["ids"], data["documents"], data["metadatas"])
+                index = NeighborIndex(store)
+                _indexes[version] = index
+                while len(_indexes) > _INDEXES_KEPT:
+                    _indexes.popitem(last=False)
+                print(f"[INFO] Neighbor index built for {version} with {len(index)} chunks")
+    return index
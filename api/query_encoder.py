@@ -0,0 +1,139 @@
+"""
+Micro-batching encoder for question embeddings, with an LRU cache in front.
+
+Requests run in FastAPI's thread pool, and each one used to call embedder.encode() on its
+own. Here, questions that arrive within `window_ms` of each other are encoded together in
+one call, which uses the model's batching and stops the threads competing for CPU. Repeated
+questions (same normalized text) are answered from the cache without touching the model.
+"""
+import contextlib
+import os
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+
+from question_utils import normalize_question
+from request_profiler import current_sampler, sample_thread
+
+
+class QueryEncoder:
+    def __init__(self, model, window_ms=5, max_batch=32, cache_size=2048):
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_pid = None
+        self._worker_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.batch_sizes = Counter()
+
+    def _cache_get(self, key):
+        with self._cache_lock:
+            embedding = self._cache.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def _cache_put(self, key, embedding):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _ensure_worker(self):
+        # Threads don't survive fork, so a worker started in a preloading master is restarted per process
+        with self._worker_lock:
+            if self._worker is None or self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, name="query-encoder", daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def _run(self):
+        jobs = self._queue
+        while True:
+            batch = [jobs.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(jobs.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self.batch_sizes[len(batch)] += 1
+            try:
+                with contextlib.ExitStack() as stack:
+                    # Profiled requests in the batch sample this thread while it encodes for them
+                    for sampler in {id(sampler): sampler for _, _, sampler in batch if sampler is not None}.values():
+                        stack.enter_context(sample_thread(threading.get_ident(), sampler))
+                    embeddings = self.model.encode([text for text, _, _ in batch], batch_size=len(batch)).tolist()
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+    def encode(self, text):
+        """
+        Returns the embedding of one question as a list of floats. Blocks until the batch it
+        joined has been encoded (at most window_ms plus one model call).
+        """
+        key = normalize_question(text)
+        embedding = self._cache_get(key)
+        if embedding is not None:
+            return embedding
+
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future, current_sampler()))
+        embedding = future.result()
+        self._cache_put(key, embedding)
+        return embedding
+
+    def encode_many(self, texts):
+        """
+        Embeddings for a list of questions that arrived together (e.g. /api/ask/batch).
+        They are already a batch, so cache misses are encoded directly in one call.
+        """
+        keys = [normalize_question(text) for text in texts]
+        embeddings = [self._cache_get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self.model.encode([texts[i] for i in missing], batch_size=64).tolist()
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+                self._cache_put(keys[i], embedding)
+        return embeddings
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        batches = sum(self.batch_sizes.values())
+        return {
+            "cache_size": len(self._cache),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "batches": batches,
+            "mean_batch_size": round(sum(size * n for size, n in self.batch_sizes.items()) / batches, 2) if batches else None,
+            # JSON object keys are strings; sorted so the distribution reads in order
+            "batch_size_distribution": {str(size): self.batch_sizes[size] for size in sorted(self.batch_sizes)},
+        }
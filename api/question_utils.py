@@ -0,0 +1,13 @@
+"""
+Helpers for comparing questions that were typed slightly differently.
+"""
+import re
+
+
+def normalize_question(question):
+    """
+    Lower-cases a question, collapses whitespace and drops trailing punctuation, so that
+    "Why did you build the railway?" and "why did you build the railway" match.
+    """
+    question = re.sub(r"\s+", " ", question).strip().lower()
+    return question.rstrip("?!. ")
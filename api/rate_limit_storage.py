@@ -0,0 +1,102 @@
+"""
+SQLite storage backend for slowapi / limits, so rate-limit counters are shared by all
+uvicorn workers on one host and survive restarts.
+
+Importing this module registers the "sqlite" scheme with limits, after which
+    Limiter(key_func=..., storage_uri="sqlite:///rate_limits.db")
+uses it. Paths follow the SQLAlchemy convention: three slashes for a relative path,
+four for an absolute one.
+
+Each check is a single INSERT ... ON CONFLICT ... RETURNING statement, which SQLite
+runs atomically, so concurrent workers can't lose increments.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from limits.storage import Storage
+
+# Expired counters are deleted every this many increments
+CLEANUP_EVERY = 1000
+
+
+class SQLiteStorage(Storage):
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        self.path = uri[len("sqlite:///"):] if uri else "rate_limits.db"
+        if not os.path.isabs(self.path):
+            self.path = os.path.join(os.path.dirname(os.path.abspath(__file__)), self.path)
+        self._local = threading.local()
+        self._increments = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self._setup()
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        # One connection per thread; sqlite3 connections must not be shared between threads,
+        # nor with a forked child, hence the pid check for preloaded workers
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            # Counters can afford to lose the last moments before a power cut
+            conn.execute("PRAGMA synchronous=OFF;")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _setup(self):
+        self._connection().execute("""
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """)
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        # elastic_expiry is only passed by older versions of limits; fixed windows don't use it
+        now = time.time()
+        conn = self._connection()
+        count = conn.execute("""
+        INSERT INTO rate_limits (key, count, expires_at) VALUES (?, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET
+            count = CASE WHEN expires_at <= ? THEN excluded.count ELSE count + excluded.count END,
+            expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+        RETURNING count
+        """, (key, amount, now + expiry, now, now)).fetchone()[0]
+
+        self._increments += 1
+        if self._increments % CLEANUP_EVERY == 0:
+            conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+        return count
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT count FROM rate_limits WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = self._connection().execute(
+            "SELECT expires_at FROM rate_limits WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            self._connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self._connection().execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key):
+        self._connection().execute("DELETE FROM rate_limits WHERE key = ?", (key,))
@@ -0,0 +1,67 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+When a class submits the same question at the same moment, only the first request
+runs the pipeline. The others wait for it and reuse its result.
+"""
+import threading
+
+from request_profiler import sample_thread
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # The leader's thread, which does the work its followers wait for
+        self.thread = threading.get_ident()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced_count = 0
+
+    def in_flight(self):
+        """Number of distinct keys currently being computed."""
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key, fn):
+        """
+        Runs fn() unless a call with the same key is already running, in which case it
+        waits for that call instead. Exceptions raised by fn() are re-raised in every caller.
+        Returns (result, coalesced), where coalesced is True if the result came from another caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.coalesced_count += 1
+
+        if not leader:
+            # A profiled follower samples the leader's thread while it waits
+            with sample_thread(call.thread):
+                call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Remove the key before waking the waiters, so a request arriving after
+            # this point starts a fresh call instead of reading a finished one
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
@@ -0,0 +1,316 @@
+"""
+On-demand sampling profiler for live requests.
+
+Nothing runs until an admin arms it (see /api/admin/profile in main.py). While a capture
+is active, a background thread reads thread stacks with sys._current_frames() every
+`interval_ms` and counts identical stacks.
+
+A time window samples every thread in the process and leaves out idle threads (waiting on
+a lock, a queue or the selector). A single-request report samples only the threads
+handling that request: ProfilerMiddleware puts the request's sampler in a context
+variable, which FastAPI's thread pool and asyncio.to_thread copy into the worker thread,
+and functions decorated with @profile_thread add their thread while they run. Shared
+threads that do work for the request (the LLM client's pool, the query encoder, the
+request a coalesced question waits for) add themselves with bind_profiler() and
+sample_thread(). A request thread blocked on one of them isn't idle: it is counted as
+"(waiting on future)" or "(waiting on event)" under the frame that waits.
+
+Reports are written in the "collapsed stack" format, one line per distinct stack:
+
+    MainThread;main.py:ask_macdonald;main.py:generate_answer;llm_client.py:call 42
+
+which flamegraph.pl, speedscope (https://www.speedscope.app) and inferno read directly.
+Only the newest `max_reports` reports are kept.
+
+Arming is per process: with several workers, only the worker that received the admin
+request profiles its requests.
+"""
+import asyncio
+import contextlib
+import contextvars
+import functools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(API_DIR, "profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_REPORTS = int(os.getenv("PROFILE_MAX_REPORTS", "50"))
+REPORT_SUFFIX = ".folded"
+REPORT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+\.folded$")
+
+# Innermost Python frames of threads that are blocked waiting for work
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+# Standard library frames a blocked request thread waits in, outermost first, and what
+# the wait is reported as
+WAIT_FRAMES = {
+    ("_base.py", "result"): "future",
+    ("_base.py", "wait"): "future",
+    ("threading.py", "wait"): "event",
+}
+
+
+# Sampler of the request being profiled, in the request's context
+_request_sampler = contextvars.ContextVar("request_sampler", default=None)
+
+
+def _frame_label(frame):
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"
+
+
+class StackSampler:
+    """
+    Samples thread stacks until stop() is called: every other thread, or only the thread
+    IDs in `threads` if that is a set (which may change while sampling).
+    """
+
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS, threads=None):
+        self.interval = interval_ms / 1000
+        self.threads = threads
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops sampling and returns the collected stacks as a Counter."""
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self.stacks
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.threads is not None and thread_id not in self.threads):
+                    continue
+                code = frame.f_code
+                labels = []
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    if self.threads is None:
+                        continue
+                    # A request thread blocked on work done elsewhere: one "waiting" frame
+                    # replaces the standard library frames it waits in
+                    waiting = None
+                    while frame is not None:
+                        code = frame.f_code
+                        waiting_on = WAIT_FRAMES.get((os.path.basename(code.co_filename), code.co_name))
+                        if waiting_on is None:
+                            break
+                        waiting = waiting_on
+                        frame = frame.f_back
+                    labels.append(f"(waiting on {waiting or 'io'})")
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(labels))] += 1
+
+
+class RequestProfiler:
+    """
+    Decides which requests are profiled and stores the reports.
+
+    Armed either for the next `count` requests (one report each) or for a time window
+    (one report for the whole process). When not armed, `armed` is False and
+    ProfilerMiddleware passes requests straight through.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, interval_ms=PROFILE_INTERVAL_MS, max_reports=PROFILE_MAX_REPORTS):
+        self.directory = directory
+        self.interval_ms = interval_ms
+        self.max_reports = max_reports
+        self.armed = False
+        self._remaining = 0
+        self._window_until = None
+        self._lock = threading.Lock()
+
+    def arm_requests(self, count):
+        with self._lock:
+            self._remaining = count
+            self.armed = count > 0
+
+    def take_request(self):
+        """Claims one of the armed request slots. Returns False if none are left."""
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            self.armed = self._remaining > 0
+            return True
+
+    def start_window(self, seconds):
+        """
+        Samples the whole process for `seconds` in the background and then saves one report.
+        Raises RuntimeError if a window is already running.
+        """
+        with self._lock:
+            if self._window_until is not None:
+                raise RuntimeError("A profiling window is already running")
+            self._window_until = time.time() + seconds
+        threading.Thread(target=self._profile_window, args=(seconds,), name="profile-window", daemon=True).start()
+
+    def _profile_window(self, seconds):
+        try:
+            sampler = StackSampler(self.interval_ms).start()
+            time.sleep(seconds)
+            sampler.stop()
+            self.save(sampler, "window")
+        finally:
+            with self._lock:
+                self._window_until = None
+
+    def start_request(self):
+        """A sampler for one request; it samples the threads that profile_thread adds."""
+        return StackSampler(self.interval_ms, threads=set()).start()
+
+    def finish_request(self, sampler, label):
+        sampler.stop()
+        return self.save(sampler, label)
+
+    def save(self, sampler, label):
+        """Writes the sampler's stacks as a collapsed-stack report and prunes old reports."""
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S_%fZ")
+        label = re.sub(r"[^A-Za-z0-9]+", "-", label).strip("-") or "request"
+        name = f"{stamp}_{label}_{int(sampler.duration * 1000)}ms{REPORT_SUFFIX}"
+        lines = [f"{stack} {count}\n" for stack, count in sampler.stacks.most_common()]
+        tmp = os.path.join(self.directory, name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        os.replace(tmp, os.path.join(self.directory, name))
+        print(f"[INFO] Profile saved: {name} ({sampler.samples} samples)")
+        self.prune()
+        return name
+
+    def prune(self):
+        reports = self.list_reports()
+        for report in reports[self.max_reports:]:
+            try:
+                os.remove(os.path.join(self.directory, report["name"]))
+            except FileNotFoundError:
+                pass
+
+    def list_reports(self):
+        """Saved reports, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        reports = []
+        for name in os.listdir(self.directory):
+            if name.endswith(REPORT_SUFFIX):
+                stat = os.stat(os.path.join(self.directory, name))
+                reports.append({"name": name, "bytes": stat.st_size, "created": stat.st_mtime})
+        return sorted(reports, key=lambda report: report["name"], reverse=True)
+
+    def report_path(self, name):
+        """Path of a saved report, or None if the name isn't a report in the directory."""
+        if not REPORT_NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def status(self):
+        with self._lock:
+            return {
+                "requests_remaining": self._remaining,
+                "window_until": self._window_until,
+                "interval_ms": self.interval_ms,
+                "reports": len(self.list_reports()),
+                "max_reports": self.max_reports,
+            }
+
+
+def current_sampler():
+    """The sampler of the request being profiled in this context, or None."""
+    return _request_sampler.get()
+
+
+@contextlib.contextmanager
+def sample_thread(thread_id, sampler=None):
+    """
+    Adds `thread_id` to `sampler` (by default the current request's) for the duration of
+    the block. A no-op when no request is being profiled or the thread is already sampled.
+    """
+    sampler = sampler if sampler is not None else _request_sampler.get()
+    if sampler is None or thread_id in sampler.threads:
+        yield
+        return
+    sampler.threads.add(thread_id)
+    try:
+        yield
+    finally:
+        sampler.threads.discard(thread_id)
+
+
+def profile_thread(fn):
+    """
+    Samples the calling thread while `fn` runs, if it runs for a request being profiled.
+    For request handlers and functions run in worker threads; otherwise a no-op.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with sample_thread(threading.get_ident()):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def bind_profiler(fn):
+    """
+    Wraps `fn` so that the thread it later runs on, e.g. in a ThreadPoolExecutor (which
+    doesn't copy context variables), is sampled for the request calling bind_profiler().
+    Returns `fn` unchanged when no request is being profiled.
+    """
+    sampler = _request_sampler.get()
+    if sampler is None:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with sample_thread(threading.get_ident(), sampler):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware that profiles the requests an admin armed the profiler for.
+    When it isn't armed, a request costs one attribute check on its way to the app. The
+    report is saved once the app returns, i.e. after a streamed body has been sent.
+    """
+
+    def __init__(self, app, profiler, paths):
+        self.app = app
+        self.profiler = profiler
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if (not self.profiler.armed or scope["type"] != "http" or not scope["path"].startswith(self.paths)
+                or not self.profiler.take_request()):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = self.profiler.start_request()
+        token = _request_sampler.set(sampler)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_sampler.reset(token)
+            await asyncio.to_thread(self.profiler.finish_request, sampler, scope["path"])
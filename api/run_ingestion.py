@@ -1,11 +1,29 @@
+"""
+Rebuilds the index from the Hansard PDFs, the biography web pages (ingest_web.py) and the
+correspondence PDFs (ingest_pdf.py) into a new snapshot (see index_snapshots.py) and
+publishes it. The running API keeps serving the previous snapshot until the new
+one is complete, then swaps to it without a restart.
+
+Usage (from the api directory):
+    python run_ingestion.py               # build, publish, delete old snapshots
+    python run_ingestion.py --no-publish  # build only; publish later with index_snapshots.py
+"""
+import argparse
 import os
 import shutil
 import subprocess
 import sys
 
+import chromadb
+
+from index_snapshots import building_dir, finish_build, gc_snapshots, new_version, publish
+from ingest_pdf import pdf_sources
+from ingest_web import web_sources
+from ingestion import ingest
+from vector_index import export_collection
+
 # Define paths
 API_DIR = os.path.dirname(os.path.abspath(__file__))
-CHROMA_STORE_PATH = os.path.join(API_DIR, "chroma_store")
 OUTPUT_PATH = os.path.join(API_DIR, "output") # Path to generated JSON files
 
 # --- Updated script paths for the Macdonald speeches pipeline ---
@@ -13,12 +31,15 @@ EXTRACT_SPEECHES_SCRIPT = os.path.join(API_DIR, "scraper_files", "extract_macdon
 EMBED_CHUNKS_SCRIPT = os.path.join(API_DIR, "scraper_files", "embed_chunks_local.py")
 
 
-def run_script(script_path):
-    """Run a Python script and handle errors."""
+def run_script(script_path, env=None):
+    """Run a Python script and handle errors. `env` adds environment variables."""
     try:
         print(f"\n----- Running {os.path.basename(script_path)} -----")
         # Ensure that the script is run with the python executable that is running this script
-        result = subprocess.run([sys.executable, script_path], check=True, text=True, capture_output=True)
+        result = subprocess.run(
+            [sys.executable, script_path], check=True, text=True, capture_output=True,
+            env=dict(os.environ, **(env or {}))
+        )
         print(result.stdout)
         if result.stderr:
             print("----- Errors -----")
@@ -36,12 +57,13 @@ def run_script(script_path):
         sys.exit(1)
 
 
-def main():
+def main(publish_snapshot=True):
     """Main function to run the Hansard debates ingestion pipeline."""
     print("[INFO] Starting the Hansard debates data ingestion process...")
 
-    # 1. Delete existing data directories to ensure a fresh start
-    for path in [CHROMA_STORE_PATH, OUTPUT_PATH]:
+    # 1. Delete the intermediate JSON files to ensure a fresh start.
+    #    The index being served lives in its own snapshot and is not touched.
+    for path in [OUTPUT_PATH]:
         if os.path.exists(path):
             print(f"[INFO] Deleting existing data at: {path}")
             try:
@@ -56,11 +78,36 @@ def main():
     # 2. Run the script to extract speeches from PDFs into JSON files
     run_script(EXTRACT_SPEECHES_SCRIPT)
 
-    # 3. Run the script to embed the JSON content and store it in Chroma
-    run_script(EMBED_CHUNKS_SCRIPT)
+    # 3. Run the script to embed the JSON content into a new snapshot's Chroma store
+    version = new_version()
+    build_path = building_dir(version)
+    chroma_path = os.path.join(build_path, "chroma_store")
+    run_script(EMBED_CHUNKS_SCRIPT, env={"CHROMA_PATH": chroma_path})
+
+    # 4. Add the web pages and PDFs, so the new snapshot keeps every source of the old one
+    collection = chromadb.PersistentClient(path=chroma_path).get_or_create_collection("macdonald_speeches")
+    ingest(web_sources() + pdf_sources(), collection=collection)
+
+    # 5. Export the NumPy index next to it, so either INDEX_BACKEND can serve the snapshot
+    chunk_count = collection.count()
+    if chunk_count == 0:
+        print("[ERROR] The new index is empty; not publishing it.")
+        sys.exit(1)
+    export_collection(collection, build_path)
+    finish_build(version, chunk_count)
 
     print("\n[SUCCESS] All data ingestion scripts have been executed successfully!")
-    print("[SUCCESS] The Chroma vector store is now up to date with Macdonald's speeches.")
+    print(f"[SUCCESS] Index snapshot {version} built with {chunk_count} chunks.")
+
+    # 6. Make it active; running API processes swap to it on their next check
+    if publish_snapshot:
+        publish(version)
+        gc_snapshots()
+    else:
+        print(f"[INFO] Publish it with: python index_snapshots.py publish {version}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Rebuild the index into a new snapshot")
+    parser.add_argument("--no-publish", action="store_true", help="Build the snapshot without making it active")
+    args = parser.parse_args()
+    main(publish_snapshot=not args.no_publish)
\ No newline at end of file
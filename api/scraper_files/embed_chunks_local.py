@@ -1,14 +1,20 @@
 import os
+import sys
 import json
 import chromadb
 from tqdm import tqdm
 from sentence_transformers import SentenceTransformer
 
-# Load local embedding model
-model = SentenceTransformer("all-MiniLM-L6-v2")  # Small, fast, good quality
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_chunker import EMBEDDING_MODEL
 
-# Setup ChromaDB client with new API
-client = chromadb.PersistentClient(path="./chroma_store")
+# Load local embedding model (the one the API and the chunker are sized for)
+model = SentenceTransformer(EMBEDDING_MODEL)
+
+# Setup ChromaDB client with new API.
+# run_ingestion.py sets CHROMA_PATH to the snapshot being built.
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_store")
+client = chromadb.PersistentClient(path=CHROMA_PATH)
 
 # Create a collection (or load it)
 collection = client.get_or_create_collection(name="macdonald_speeches")
@@ -52,9 +58,11 @@ def embed_and_store(chunks, batch_size=128):
                     "chunk_index": chunk["chunk_index"]
                 }
 
-                # Only add volume if it exists
+                # Only add volume and speech_index if they exist
                 if "volume" in chunk and chunk["volume"] is not None:
                     metadata["volume"] = chunk["volume"]
+                if chunk.get("speech_index") is not None:
+                    metadata["speech_index"] = chunk["speech_index"]
 
                 ids.append(chunk_id)
                 contents.append(chunk["content"])
@@ -84,4 +92,4 @@ if __name__ == "__main__":
     chunk_folder = "./output"  # Folder containing your JSON files
     chunks = load_chunks(chunk_folder)
     embed_and_store(chunks)
-    print("[SUCCESS] Embedding complete! Stored in ./chroma_store")
+    print(f"[SUCCESS] Embedding complete! Stored in {CHROMA_PATH}")
@@ -2,22 +2,143 @@ import fitz  # PyMuPDF
 import os
 import re
 import json
+import sys
 from tqdm import tqdm
 
+# The chunker is shared with the API's ingestion pipeline
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from text_chunker import chunk_text as token_chunk_text
+
 # Settings
 INPUT_FOLDER = "./pdfs"        # Folder containing Hansard PDFs
 OUTPUT_FOLDER = "./output"     # Where to save JSON files
-CHUNK_WORDS = 500              # Approximate chunk size
+LAYOUT_MODE = True             # Use block/span coordinates instead of plain page.get_text()
+DUPLICATE_OVERLAP = 0.6        # Bbox overlap above which a repeated span counts as a duplicate layer
+COLUMN_TOLERANCE = 10          # Points a line may cross the page middle and still belong to a column
 
-def extract_text_from_pdf(filepath):
+def extract_text_from_pdf(filepath, layout=LAYOUT_MODE):
     doc = fitz.open(filepath)
     full_text = []
     for page_num in range(len(doc)):
         page = doc.load_page(page_num)
-        text = page.get_text()
+        if layout:
+            text = extract_page_text_layout(page)
+        else:
+            text = page.get_text()
         full_text.append((page_num + 1, text))
     return full_text
 
+def _overlap_ratio(a, b):
+    """
+    Returns how much of the smaller of two bboxes is covered by their intersection (0.0 - 1.0).
+    """
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    if x1 <= x0 or y1 <= y0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return (x1 - x0) * (y1 - y0) / smaller if smaller > 0 else 0.0
+
+def _dedupe_spans(spans):
+    """
+    Drop spans that repeat the same text on top of an already kept span.
+    The scanned Hansard volumes carry two or three overlapping text layers, which
+    is where the triplicated phrases in output/*.json come from.
+    """
+    kept = []
+    seen = {}  # normalized text -> bboxes already kept for that text
+    for span in spans:
+        key = re.sub(r"\s+", " ", span["text"]).strip().lower()
+        if not key:
+            continue
+        boxes = seen.setdefault(key, [])
+        if any(_overlap_ratio(span["bbox"], box) >= DUPLICATE_OVERLAP for box in boxes):
+            continue
+        boxes.append(span["bbox"])
+        kept.append(span)
+    return kept
+
+def _layout_lines(page):
+    """
+    Rebuild text lines from the de-duplicated spans of a page, as (bbox, text) tuples.
+    Spans are grouped back into lines by the line they came from in PyMuPDF's dict output.
+    """
+    lines = []
+    for block in page.get_text("dict")["blocks"]:
+        if block.get("type") != 0:  # Skip image blocks
+            continue
+        for line in block["lines"]:
+            lines.append(line["spans"])
+
+    # De-duplicate across the whole page: a duplicate layer usually lives in its own block
+    all_spans = [dict(span, _line=i) for i, spans in enumerate(lines) for span in spans]
+    kept = _dedupe_spans(all_spans)
+
+    rebuilt = {}
+    for span in kept:
+        rebuilt.setdefault(span["_line"], []).append(span)
+
+    result = []
+    for spans in rebuilt.values():
+        spans.sort(key=lambda s: s["bbox"][0])
+        text = "".join(s["text"] for s in spans).strip()
+        bbox = (
+            min(s["bbox"][0] for s in spans), min(s["bbox"][1] for s in spans),
+            max(s["bbox"][2] for s in spans), max(s["bbox"][3] for s in spans)
+        )
+        result.append((bbox, text))
+    return result
+
+def _reading_order(lines, page_width):
+    """
+    Order lines for a two-column page: full-width lines (headings) split the page into bands,
+    and inside each band the left column is read top to bottom before the right column.
+    """
+    middle = page_width / 2
+    ordered = []
+    band = ([], [])  # (left column, right column)
+
+    def flush():
+        for column in band:
+            column.sort(key=lambda item: (item[0][1], item[0][0]))
+            ordered.extend(column)
+            column.clear()
+
+    for bbox, text in sorted(lines, key=lambda item: (item[0][1], item[0][0])):
+        if bbox[2] <= middle + COLUMN_TOLERANCE:
+            band[0].append((bbox, text))
+        elif bbox[0] >= middle - COLUMN_TOLERANCE:
+            band[1].append((bbox, text))
+        else:
+            # A line crossing the gutter ends the current band
+            flush()
+            ordered.append((bbox, text))
+    flush()
+
+    return [text for _, text in ordered]
+
+def _rejoin_hyphenation(lines):
+    """
+    Join words split across line breaks ("inexpedi-" + "ent ..."), keeping the rest of the
+    line structure intact so speaker detection still works line by line.
+    """
+    joined = []
+    for line in lines:
+        if joined and joined[-1].endswith("-") and line[:1].islower():
+            joined[-1] = joined[-1][:-1] + line
+        else:
+            joined.append(line)
+    return joined
+
+def extract_page_text_layout(page):
+    """
+    Layout-aware alternative to page.get_text(): drops duplicated text layers,
+    reconstructs column order and rejoins hyphenated line breaks.
+    """
+    lines = _layout_lines(page)
+    ordered = _reading_order(lines, page.rect.width)
+    return "\n".join(_rejoin_hyphenation(ordered))
+
 def extract_macdonald_speech_blocks(text_with_pages):
     """
     Find all speech blocks attributed to John A. Macdonald.
@@ -66,49 +187,12 @@ def extract_macdonald_speech_blocks(text_with_pages):
 
     return speech_blocks
 
-def chunk_text(text, chunk_size=CHUNK_WORDS):
+def chunk_text(text):
     """
-    Split long text into chunks of roughly `chunk_size` words, but respects
-    sentence boundaries.
+    Split long text into chunks that fit the embedding model's sequence limit
+    (measured in word-pieces, not words), respecting sentence boundaries.
     """
-    # A simple sentence splitter. It's not perfect but better than splitting mid-sentence.
-    # It splits on '.', '?', '!' followed by a space.
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    if not sentences:
-        return []
-
-    chunks = []
-    current_chunk_sentences = []
-    current_chunk_word_count = 0
-
-    for sentence in sentences:
-        # Skip empty strings that can result from splitting
-        if not sentence:
-            continue
-
-        sentence_word_count = len(sentence.split())
-
-        # If the current chunk is empty and the new sentence is already too long,
-        # just add it as its own chunk.
-        if not current_chunk_sentences and sentence_word_count > chunk_size:
-            chunks.append(sentence)
-            continue
-
-        # If adding the next sentence would push the chunk over the size limit,
-        # finalize the current chunk and start a new one.
-        if current_chunk_word_count + sentence_word_count > chunk_size:
-            chunks.append(" ".join(current_chunk_sentences))
-            current_chunk_sentences = [sentence]
-            current_chunk_word_count = sentence_word_count
-        else:
-            current_chunk_sentences.append(sentence)
-            current_chunk_word_count += sentence_word_count
-
-    # Add the last remaining chunk
-    if current_chunk_sentences:
-        chunks.append(" ".join(current_chunk_sentences))
-
-    return chunks
+    return token_chunk_text(text)
 
 def process_pdf_file(pdf_path):
     filename = os.path.basename(pdf_path)
@@ -150,7 +234,7 @@ def process_pdf_file(pdf_path):
     # Use a single counter for chunk_index across the entire PDF to ensure uniqueness
     # when Macdonald has multiple speeches on the same page.
     chunk_counter = 0
-    for speech in speeches:
+    for speech_index, speech in enumerate(speeches):
         chunks = chunk_text(speech["text"])
         for chunk in chunks:
             chunk_metadata = {
@@ -161,6 +245,7 @@ def process_pdf_file(pdf_path):
                 "source": filename,
                 "page": speech["page"],
                 "chunk_index": chunk_counter, # Use the unique counter
+                "speech_index": speech_index, # Lets the API stitch neighbouring chunks of the same speech
                 "content": chunk
             }
 
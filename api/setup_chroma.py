@@ -9,13 +9,15 @@ from sentence_transformers import SentenceTransformer
 from pathlib import Path
 import sys
 
+from text_chunker import EMBEDDING_MODEL
+
 def setup_chroma_db():
     print("Setting up ChromaDB vector store...")
 
     # Initialize the embedding model
     print("Loading embedding model...")
     try:
-        embedder = SentenceTransformer("all-MiniLM-L6-v2")
+        embedder = SentenceTransformer(EMBEDDING_MODEL)
     except Exception as e:
         print(f"[ERROR] Failed to load embedding model: {e}")
         sys.exit(1)
@@ -86,6 +88,8 @@ def setup_chroma_db():
                     metadata['session'] = entry['session']
                 if 'volume' in entry and entry['volume'] is not None:
                     metadata['volume'] = entry['volume']
+                if 'speech_index' in entry and entry['speech_index'] is not None:
+                    metadata['speech_index'] = entry['speech_index']
 
                 metadatas.append(metadata)
 
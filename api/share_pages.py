@@ -0,0 +1,85 @@
+"""
+Static HTML snapshots of shared conversations.
+
+Each share gets a small self-contained page (answer text, references, Open Graph tags
+for link previews) rendered once when the share is created and written to share_pages/.
+A share never changes, so the page is served straight from disk with immutable caching:
+crawlers and first-time visitors get one static file instead of the whole Vue app plus
+an API call. The page is static only: it doesn't load the Vue app, whose own /c/ route
+fetches the share from /api/share when it is reached from inside the app.
+"""
+import os
+import re
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup, escape
+
+SHARE_PAGE_DIR = os.path.join(os.path.dirname(__file__), 'share_pages')
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), 'templates')
+# Share pages never change once written
+SHARE_PAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DESCRIPTION_CHARS = 200
+
+# IDs come from secrets.token_urlsafe; anything else is rejected before touching the disk
+SHARE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(["html"]))
+
+
+def share_page_path(share_id):
+    """Path of a share's snapshot, or None if the ID isn't a valid share ID."""
+    if not SHARE_ID_PATTERN.match(share_id):
+        return None
+    return os.path.join(SHARE_PAGE_DIR, f"{share_id}.html")
+
+
+def _inline_markdown(text):
+    """Escapes text and renders the **bold** and *italic* markup the answers use."""
+    html = str(escape(text))
+    html = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', html)
+    html = re.sub(r'\*(.+?)\*', r'<em>\1</em>', html)
+    return Markup(html)
+
+
+def _source_name(source):
+    # Same display name as formatSourceName in the Vue app
+    name = re.sub(r'\.(pdf|json)$', '', source or 'Unknown Source', flags=re.IGNORECASE)
+    name = re.sub(r'hansard_debate_', 'Hansard Debates ', name, flags=re.IGNORECASE)
+    return re.sub(r'\b\w', lambda m: m.group(0).upper(), name.replace('_', ' '))
+
+
+def render_share_page(share_id, question, answer, sources, site_url):
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', answer) if p.strip()]
+    plain = re.sub(r'[*#_>]', '', " ".join(answer.split()))
+    description = plain if len(plain) <= DESCRIPTION_CHARS else plain[:DESCRIPTION_CHARS].rsplit(" ", 1)[0] + "…"
+
+    return _env.get_template("share.html").render(
+        title=f"Sir John A. Macdonald on: {question}",
+        description=description,
+        question=question,
+        paragraphs=[_inline_markdown(p) for p in paragraphs],
+        sources=[dict(source, name=_source_name(source.get("source"))) for source in sources if isinstance(source, dict)],
+        site_url=site_url.rstrip("/"),
+        share_url=f"{site_url.rstrip('/')}/c/{share_id}",
+    )
+
+
+def write_share_page(share_id, question, answer, sources, site_url):
+    """
+    Renders a share's snapshot and writes it to disk. Returns its path, or None on failure.
+    """
+    path = share_page_path(share_id)
+    if path is None:
+        return None
+    try:
+        os.makedirs(SHARE_PAGE_DIR, exist_ok=True)
+        html = render_share_page(share_id, question, answer, sources, site_url)
+        # Written under a temporary name and renamed, so a reader never sees half a page
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(tmp_path, path)
+        return path
+    except Exception as e:
+        print(f"[ERROR] Failed to write share page {share_id}: {e}")
+        return None
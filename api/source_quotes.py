@@ -0,0 +1,33 @@
+"""
+How much of each source excerpt /api/ask sends back.
+
+The frontend only shows the citation (source, page, year), so by default clients can
+skip the excerpt text and fetch it on demand from /api/source/{chunk_id}.
+"""
+QUOTE_MODES = ("full", "truncated", "none")
+QUOTE_PREVIEW_CHARS = 200
+
+
+def truncate_quote(text, limit=QUOTE_PREVIEW_CHARS):
+    """Cuts text at the last word boundary before `limit` characters."""
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:") + "…"
+
+
+def apply_quote_mode(sources, mode):
+    """
+    Returns copies of the source dicts with their "quote" kept, truncated or removed.
+    """
+    if mode == "full":
+        return sources
+    slimmed = []
+    for source in sources:
+        source = dict(source)
+        if mode == "none":
+            source.pop("quote", None)
+        elif "quote" in source:
+            source["quote"] = truncate_quote(source["quote"])
+        slimmed.append(source)
+    return slimmed
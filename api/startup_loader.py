@@ -0,0 +1,118 @@
+"""
+Background loading of the heavy components (embedding model, vector index, databases).
+
+Importing sentence-transformers and chromadb and loading the model took most of the
+cold start, and uvicorn doesn't open its port until the startup event returns. Components
+are registered here instead and loaded in parallel threads once the server is up; until
+the components a route needs are ready, it answers 503 (see require_ready in main.py).
+
+A required component that fails is retried with exponential backoff. If it still fails,
+the loader reports "failed" and /api/health answers 503, so the process supervisor (or a
+health check) restarts the server instead of it serving 503s forever.
+
+Under gunicorn with preload_app, load_all() runs in the master before the workers are
+forked (see gunicorn.conf.py), so the workers start with everything already loaded.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StartupLoader:
+    def __init__(self, max_attempts=3, retry_seconds=2.0):
+        self.max_attempts = max_attempts    # for required components; optional ones are tried once
+        self.retry_seconds = retry_seconds  # doubled after every failed attempt
+        self._loaders = {}
+        self._required = set()
+        self._lock = threading.Lock()
+        self.status = {}
+        self.timings = {}
+        self.errors = {}
+
+    def component(self, name, required=True):
+        """
+        Decorator that registers a function loading one component. The API isn't ready until
+        every required component has loaded; optional ones only have to have been tried.
+        """
+        def register(fn):
+            self._loaders[name] = fn
+            self.status[name] = "pending"
+            if required:
+                self._required.add(name)
+            return fn
+        return register
+
+    def record(self, name, seconds):
+        """Records the duration of a step, for /api/health and the startup benchmark."""
+        self.timings[name] = round(seconds, 3)
+
+    def _load(self, name):
+        self.status[name] = "loading"
+        start = time.perf_counter()
+        attempts = self.max_attempts if name in self._required else 1
+        for attempt in range(1, attempts + 1):
+            try:
+                self._loaders[name]()
+            except Exception as e:
+                self.errors[name] = str(e)
+                print(f"[ERROR] Loading {name} failed (attempt {attempt} of {attempts}): {e}")
+                if attempt < attempts:
+                    time.sleep(self.retry_seconds * 2 ** (attempt - 1))
+            else:
+                self.status[name] = "ready"
+                self.errors.pop(name, None)
+                break
+        else:
+            self.status[name] = "failed"
+        self.record(name, time.perf_counter() - start)
+
+    def load_all(self):
+        """
+        Loads every component that isn't ready yet, in parallel, and waits for them.
+        Returns True if all of them are ready.
+        """
+        with self._lock:
+            pending = [name for name, status in self.status.items() if status != "ready"]
+            if pending:
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="startup") as pool:
+                    list(pool.map(self._load, pending))
+                self.record("total", time.perf_counter() - start)
+        return self.ready()
+
+    def start(self):
+        """Starts load_all() in a background thread and returns immediately."""
+        threading.Thread(target=self._load_in_background, name="startup-loader", daemon=True).start()
+
+    def _load_in_background(self):
+        self.load_all()
+        if self.failed():
+            print(f"[ERROR] Could not load {', '.join(self.failed())}; /api/health now answers 503")
+
+    def ready(self, *names):
+        """
+        True once the given components (all of them by default) are usable: loaded, or, for
+        optional ones, at least tried.
+        """
+        return all(
+            self.status[name] == "ready" or (self.status[name] == "failed" and name not in self._required)
+            for name in (names or self.status)
+        )
+
+    def failed(self):
+        """Required components that could not be loaded; the server can't recover from these."""
+        return [name for name in self._required if self.status[name] == "failed"]
+
+    def state(self):
+        if self.failed():
+            return "failed"
+        return "ok" if self.ready() else "starting"
+
+    def stats(self):
+        return {
+            "ready": self.ready(),
+            "state": self.state(),
+            "components": dict(self.status),
+            "timings": dict(self.timings),
+            "errors": dict(self.errors),
+        }
@@ -0,0 +1,36 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# The API modules are imported as top-level modules, as main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def api_client(tmp_path, monkeypatch):
+    """
+    A TestClient for the API with rate limiting off, every startup component reported
+    ready and a fresh monitoring database. Yields (client, database path).
+    Tests stub main.generate_answer themselves.
+    """
+    import main
+    from fastapi.testclient import TestClient
+
+    db_path = str(tmp_path / "monitoring.db")
+    with sqlite3.connect(db_path) as conn:
+        main.setup_database(conn)
+        main.setup_conversation_database(conn)
+
+    def get_database():
+        conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    monkeypatch.setattr(main.limiter, "enabled", False)
+    monkeypatch.setattr(main.startup_loader, "ready", lambda *components: True)
+    monkeypatch.setitem(main.app.dependency_overrides, main.get_database, get_database)
+    yield TestClient(main.app), db_path
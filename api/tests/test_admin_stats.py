@@ -0,0 +1,50 @@
+"""
+Tests for the admin stats queries: time parsing, and totals that include rows the
+rollups haven't reached yet.
+"""
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from admin_stats import default_range, fetch_stats, parse_time
+from log_maintenance import rollup, setup_maintenance_tables
+from usage_logger import setup_database
+
+
+def test_parse_time_converts_offsets_to_utc():
+    assert parse_time("2025-08-23T10:00:00-04:00") == "2025-08-23 14:00:00"
+    assert parse_time("2025-08-23T10:00") == "2025-08-23 10:00:00"
+    assert parse_time("2025-08-23") == "2025-08-23 00:00:00"
+    with pytest.raises(ValueError):
+        parse_time("yesterday")
+
+
+def test_stats_include_the_bucket_not_rolled_up_yet():
+    conn = sqlite3.connect(":memory:")
+    setup_database(conn)
+    setup_maintenance_tables(conn)
+    for timestamp, ok, latency in [
+        ("2025-08-23 09:10:00", 1, 100),
+        ("2025-08-23 09:50:00", 0, 300),
+        ("2025-08-23 10:05:00", 1, 200),
+    ]:
+        conn.execute(
+            "INSERT INTO logs (timestamp, is_successful, latency_ms, total_tokens) VALUES (?, ?, ?, 10)",
+            (timestamp, ok, latency)
+        )
+    now = datetime(2025, 8, 23, 10, 30)
+    assert rollup(conn, "hour", now=now) == 1
+
+    start, end = default_range("hour", now=now)
+    assert end == "2025-08-23 11:00:00"
+    stats = fetch_stats(conn, start, end, "hour")
+
+    assert stats["rolled_up_until"] == "2025-08-23 10:00:00"
+    assert [(b["bucket"], b["requests"], b.get("live", False)) for b in stats["buckets"]] == [
+        ("2025-08-23 09:00:00", 2, False),
+        ("2025-08-23 10:00:00", 1, True),
+    ]
+    assert stats["totals"]["requests"] == 3
+    assert stats["totals"]["successes"] == 2
+    assert stats["totals"]["total_tokens"] == 30
@@ -0,0 +1,93 @@
+"""
+Tests for AdmissionMiddleware on a small app: a streamed response keeps its slot until
+the body has been sent, and requests beyond the limit are shed with a 503.
+"""
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from admission import AdmissionController, AdmissionMiddleware
+
+
+def make_app(controller, seen, weights=None):
+    app = FastAPI()
+    app.add_middleware(
+        AdmissionMiddleware, controller=controller, paths=("/api/ask",),
+        shed_content={"error": "busy"}, retry_after="5", weights=weights,
+    )
+
+    @app.post("/api/ask/batch")
+    async def batch():
+        async def stream():
+            for i in range(3):
+                await asyncio.sleep(0.01)
+                # Recorded while the body is still being sent
+                seen.append((controller.active, controller.slots_in_use))
+                yield f"{i}\n"
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.get("/api/health")
+    async def health():
+        return {"active": controller.active}
+
+    return app
+
+
+def test_slot_is_held_until_the_stream_ends():
+    seen = []
+    controller = AdmissionController(max_concurrent=2)
+    client = TestClient(make_app(controller, seen))
+
+    assert client.post("/api/ask/batch").text == "0\n1\n2\n"
+    assert seen == [(1, 1)] * 3
+    assert controller.active == 0
+    assert controller.admitted_count == 1
+
+
+def test_excess_requests_are_shed():
+    controller = AdmissionController(max_concurrent=1, max_queue=0)
+    client = TestClient(make_app(controller, []))
+
+    asyncio.run(controller.acquire())
+    response = client.post("/api/ask/batch")
+    assert response.status_code == 503
+    assert response.json() == {"error": "busy"}
+    assert response.headers["Retry-After"] == "5"
+    # Other paths and methods bypass the controller
+    assert client.get("/api/health").json() == {"active": 1}
+
+
+def test_weighted_path_holds_several_slots():
+    seen = []
+    controller = AdmissionController(max_concurrent=4, max_queue=0)
+    client = TestClient(make_app(controller, seen, weights={"/api/ask/batch": 3}))
+
+    assert client.post("/api/ask/batch").status_code == 200
+    assert seen == [(1, 3)] * 3
+    assert controller.slots_in_use == 0
+
+    # With two slots taken, a batch needing three doesn't fit and is shed
+    asyncio.run(controller.acquire(2))
+    assert client.post("/api/ask/batch").status_code == 503
+
+
+def test_weighted_acquire_waits_for_slots_and_gives_them_back_on_timeout():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=2, max_queue=1, queue_timeout=0.05)
+        assert await controller.acquire()
+        # Only one of the two slots is free: the wait times out and nothing stays taken
+        assert not await controller.acquire(2)
+        assert controller.slots_in_use == 1
+        controller.release()
+
+        assert await controller.acquire(2)
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0.01)
+        assert controller.waiting == 1
+        controller.release(2)
+        assert await waiter
+        assert controller.slots_in_use == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+"""
+Round-trip test for ChunkStore: records saved as .npy files and memory-mapped back give
+the same text, metadata and ID lookups, including non-ASCII text and interned strings.
+"""
+import numpy as np
+
+from chunk_store import ChunkStore
+
+IDS = ["parl_1_sess_1_a", "page-é-2", "c", "empty"]
+DOCUMENTS = [
+    "Mr. Speaker, the railway must be built.",
+    "Sir John A. Macdonald — « le Canada » était uni. 🚂",
+    "Québec and Montréal voted together.",
+    "",
+]
+METADATAS = [
+    {"source": "hansard_debate_01_01_1867.pdf", "speaker": "John A. Macdonald", "page": 24, "chunk_index": 0, "year": 1867},
+    {"source": "Québec letters", "page": 2, "chunk_index": 1, "score": 0.25},
+    {"source": "hansard_debate_01_01_1867.pdf", "speaker": "John A. Macdonald", "page": 24, "chunk_index": 2,
+     "year": 1867, "volume": 2 ** 40},
+    {"source": "Québec letters", "chunk_index": 3},
+]
+
+
+def test_saved_store_loads_memory_mapped_with_the_same_records(tmp_path):
+    ChunkStore.from_records(IDS, DOCUMENTS, METADATAS).save(str(tmp_path))
+
+    store = ChunkStore.load(str(tmp_path))
+
+    assert isinstance(store.text, np.memmap)
+    assert len(store) == 4
+    for row, (chunk_id, document, metadata) in enumerate(zip(IDS, DOCUMENTS, METADATAS)):
+        assert store.chunk_id(row) == chunk_id
+        assert store.row(chunk_id) == row
+        assert store.document(row) == document
+        assert store.metadata(row) == metadata
+
+
+def test_strings_are_interned_and_ids_looked_up(tmp_path):
+    ChunkStore.from_records(IDS, DOCUMENTS, METADATAS).save(str(tmp_path))
+    store = ChunkStore.load(str(tmp_path))
+
+    assert store.kinds == {"chunk_index": "int", "page": "int", "score": "float", "source": "str",
+                           "speaker": "str", "volume": "int", "year": "int"}
+    # One vocabulary entry per distinct value; rows hold codes
+    assert store.vocab["source"] == ["Québec letters", "hansard_debate_01_01_1867.pdf"]
+    assert list(store.columns["source"]) == [1, 0, 1, 0]
+    assert store.code("source", "Québec letters") == 0
+    assert store.code("source", "unknown") is None
+    assert store.columns["volume"].dtype == np.int64
+    assert store.rows(["c", "missing", "page-é-2"]) == [2, 1]
+    assert store.row("parl_1_sess_1") is None
@@ -0,0 +1,43 @@
+"""
+Tests for pack_context and trim_to_sentences, with whitespace-separated words as tokens.
+"""
+from context_packer import pack_context, trim_to_sentences
+
+
+def count_tokens(text):
+    return len(text.split())
+
+
+def format_excerpt(doc, meta):
+    return f"[{meta['source']}]\n{doc}"
+
+
+def words(n, word="word"):
+    return " ".join([word] * n)
+
+
+def test_smaller_chunks_after_one_that_doesnt_fit_are_still_packed():
+    chunks = [
+        (words(50, "first") + ".", {"source": "a"}),
+        # Doesn't fit and is too small once trimmed, but doesn't end the packing
+        (words(80, "long") + ".", {"source": "b"}),
+        (words(20, "short") + ".", {"source": "c"}),
+    ]
+    excerpts, used = pack_context(chunks, 80, count_tokens, format_excerpt)
+
+    assert [excerpt.split("\n")[0] for excerpt in excerpts] == ["[a]", "[c]"]
+    assert used == 51 + 21
+    assert used <= 80
+
+
+def test_trim_keeps_whole_sentences_that_fit():
+    text = "One two three. Four five six. Seven eight nine."
+    assert trim_to_sentences(text, 7, count_tokens) == ("One two three. Four five six.", 6)
+
+
+def test_trim_cuts_an_oversized_first_sentence_at_a_word():
+    text = words(30) + ". Short one."
+    trimmed, tokens = trim_to_sentences(text, 10, count_tokens)
+
+    assert trimmed == words(10)
+    assert tokens == 10
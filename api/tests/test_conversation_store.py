@@ -0,0 +1,101 @@
+"""
+Tests for conversation sessions: history compaction, expiry, a session purged while a
+request is using it, and the previous turn's chunks carried over to a follow-up.
+"""
+import sqlite3
+import time
+
+import pytest
+
+import main
+from conversation_store import (RECENT_TURNS, SUMMARY_MAX_LINES, add_turn, create_session, load_session,
+                                purge_expired_sessions, setup_conversation_database)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    setup_conversation_database(conn)
+    yield conn
+    conn.close()
+
+
+def age_session(conn, session_id, seconds):
+    with conn:
+        conn.execute("UPDATE conversations SET last_active = ? WHERE session_id = ?", (time.time() - seconds, session_id))
+
+
+def test_older_turns_are_compacted_into_the_summary(conn):
+    session_id = create_session(conn)
+    for i in range(RECENT_TURNS + 2):
+        add_turn(conn, session_id, f"Question {i}?", f"Answer {i}. More detail.", [f"c{i}"])
+
+    session = load_session(conn, session_id)
+    assert [turn["question"] for turn in session["turns"]] == ["Question 2?", "Question 3?"]
+    assert session["turns"][-1]["chunk_ids"] == ["c3"]
+    assert session["summary"].splitlines() == [
+        "- Asked: Question 0? / I said: Answer 0.",
+        "- Asked: Question 1? / I said: Answer 1.",
+    ]
+
+
+def test_summary_keeps_only_the_newest_lines(conn):
+    session_id = create_session(conn)
+    for i in range(RECENT_TURNS + SUMMARY_MAX_LINES + 3):
+        add_turn(conn, session_id, f"Question {i}?", f"Answer {i}.", [])
+
+    lines = load_session(conn, session_id)["summary"].splitlines()
+    assert len(lines) == SUMMARY_MAX_LINES
+    assert lines[0] == "- Asked: Question 3? / I said: Answer 3."
+
+
+def test_expired_sessions_are_not_loaded_and_get_purged(conn):
+    stale, fresh = create_session(conn), create_session(conn)
+    add_turn(conn, stale, "Old question?", "Old answer.", ["c0"])
+    age_session(conn, stale, 120)
+
+    assert load_session(conn, stale, ttl=60) is None
+    assert load_session(conn, fresh, ttl=60) is not None
+    assert purge_expired_sessions(conn, ttl=60) == 1
+    assert conn.execute("SELECT COUNT(*) FROM conversation_turns").fetchone()[0] == 0
+    assert load_session(conn, fresh, ttl=60) is not None
+
+
+def test_turn_is_saved_when_the_session_was_purged_after_loading(conn):
+    session_id = create_session(conn)
+    session = load_session(conn, session_id)
+    # Another request's create_session purges it while this one waits on the LLM
+    age_session(conn, session_id, 10_000)
+    purge_expired_sessions(conn)
+
+    add_turn(conn, session_id, "Who was Macdonald?", "The first Prime Minister.", ["c0"])
+
+    session = load_session(conn, session_id)
+    assert session["summary"] == ""
+    assert [turn["question"] for turn in session["turns"]] == ["Who was Macdonald?"]
+
+
+class FakeCollection:
+    def __init__(self, records):
+        self.records = records
+
+    def get(self, ids, include):
+        found = [cid for cid in ids if cid in self.records]
+        return {
+            "ids": found,
+            "documents": [self.records[cid][0] for cid in found],
+            "metadatas": [self.records[cid][1] for cid in found],
+        }
+
+
+def test_follow_up_carries_over_the_previous_turns_chunks(monkeypatch):
+    monkeypatch.setattr(main, "SESSION_CARRY_CHUNKS", 3)
+    coll = FakeCollection({cid: (f"text {cid}", {"source": "hansard"}) for cid in ("a", "b", "c", "d", "e")})
+    session = {"summary": "", "turns": [{"question": "q", "answer": "a", "chunk_ids": ["a", "b", "gone", "c", "d", "e"]}]}
+    hits = [("b", "text b", {"source": "hansard"})]
+
+    carried = main.carried_hits(coll, session, hits)
+
+    # Already retrieved chunks are skipped, the first 3 others are looked up, deleted ones dropped
+    assert [cid for cid, _, _ in carried] == ["a", "c"]
+    assert carried[0] == ("a", "text a", {"source": "hansard"})
@@ -0,0 +1,86 @@
+"""
+Tests for CrossEncoderReranker with a stub model: batches sized to the time budget, the
+over-budget fallback and the score cache.
+"""
+import time
+
+import numpy as np
+
+from cross_reranker import CrossEncoderReranker
+
+
+class StubModel:
+    """Scores a pair by its document's length; records the size of every batch."""
+
+    def __init__(self, seconds_per_pair=0.0):
+        self.seconds_per_pair = seconds_per_pair
+        self.batches = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.batches.append(len(pairs))
+        time.sleep(self.seconds_per_pair * len(pairs))
+        return np.array([len(document) / 100 for _, document in pairs])
+
+
+def make_reranker(model, budget_ms=1000, batch_size=8):
+    reranker = CrossEncoderReranker("stub", budget_ms=budget_ms, batch_size=batch_size)
+    reranker.model = model
+    return reranker
+
+
+def candidates(n):
+    return [f"c{i}" for i in range(n)], ["x" * i for i in range(n)]
+
+
+def test_first_pair_is_timed_before_full_batches():
+    model = StubModel()
+    reranker = make_reranker(model)
+    ids, documents = candidates(20)
+
+    scores = reranker.score("Who built the railway?", ids, documents)
+
+    assert scores == [i / 100 for i in range(20)]
+    assert model.batches == [1, 8, 8, 3]
+
+
+def test_over_budget_returns_none_without_overrunning():
+    model = StubModel(seconds_per_pair=0.02)
+    reranker = make_reranker(model, budget_ms=50)
+    ids, documents = candidates(30)
+
+    start = time.perf_counter()
+    assert reranker.score("Who built the railway?", ids, documents) is None
+    elapsed = time.perf_counter() - start
+
+    # A cold model scores one pair, then only what the measured time per pair leaves room for
+    assert sum(model.batches) <= 2
+    assert elapsed < 0.05 + 0.02
+    assert reranker.over_budget == 1
+
+
+def test_cached_scores_avoid_model_calls():
+    model = StubModel()
+    reranker = make_reranker(model)
+    ids, documents = candidates(10)
+
+    first = reranker.score("Who built the railway?", ids, documents)
+    calls = len(model.batches)
+    # The same question, normalized differently, with one new candidate
+    second = reranker.score("who built the railway", ids + ["new"], documents + ["y" * 50])
+
+    assert second == first + [0.5]
+    assert model.batches[calls:] == [1]
+    assert reranker.cache_hits == 10
+
+
+def test_scoring_resumes_from_the_cache_after_running_out_of_budget():
+    model = StubModel(seconds_per_pair=0.02)
+    reranker = make_reranker(model, budget_ms=50)
+    ids, documents = candidates(6)
+    assert reranker.score("Who built the railway?", ids, documents) is None
+    assert 0 < sum(model.batches) < 6
+
+    reranker.budget = 10
+    assert reranker.score("Who built the railway?", ids, documents) == [i / 100 for i in range(6)]
+    # Pairs scored before the budget ran out aren't scored again
+    assert sum(model.batches) == 6
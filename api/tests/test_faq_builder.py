@@ -0,0 +1,144 @@
+"""
+Tests for the FAQ: clustering at SIMILARITY_THRESHOLD, rebuilding the faq_entries /
+faq_keys tables in one transaction, and /api/ask serving it only for requests with the
+default retrieval settings.
+"""
+import sqlite3
+
+import numpy as np
+import pytest
+
+import main
+from faq_builder import SIMILARITY_THRESHOLD, build_faq, cluster_questions
+from faq_cache import FaqCache, setup_faq_database
+from usage_logger import log_request, setup_database
+
+
+def at_similarity(cosine, side=1):
+    """A unit vector with the given cosine similarity to [1, 0], above or below it."""
+    return [cosine, side * np.sqrt(1 - cosine ** 2)]
+
+
+def test_clustering_merges_only_at_or_above_the_threshold():
+    keys = ["why build the railway", "why was the railway built", "what was the railway for"]
+    embeddings = np.array([[1.0, 0.0], at_similarity(SIMILARITY_THRESHOLD + 0.005), at_similarity(SIMILARITY_THRESHOLD - 0.005, side=-1)])
+    counts = {keys[0]: 5, keys[1]: 3, keys[2]: 4}
+
+    clusters = cluster_questions(keys, embeddings, counts)
+
+    assert clusters == [[keys[0], keys[1]], [keys[2]]]
+
+
+def test_questions_with_different_numbers_are_never_merged():
+    keys = ["the election of 1872", "the election of 1878"]
+    counts = {keys[0]: 2, keys[1]: 1}
+
+    assert cluster_questions(keys, np.array([[1.0, 0.0], [1.0, 0.0]]), counts) == [[keys[0]], [keys[1]]]
+
+
+class StubEmbedder:
+    def encode(self, texts, batch_size=64):
+        # Every question is its own cluster
+        return np.eye(len(texts), dtype=np.float32)
+
+
+@pytest.fixture
+def faq_db(tmp_path, monkeypatch):
+    """A monitoring database with logged questions and an FAQ built earlier; yields its path."""
+    path = str(tmp_path / "monitoring.db")
+    with sqlite3.connect(path) as conn:
+        setup_database(conn)
+        setup_faq_database(conn)
+        for question, times in [("Who was Macdonald?", 3), ("Why build the railway?", 2)]:
+            for _ in range(times):
+                log_request(conn, "127.0.0.1", question, is_successful=True)
+        conn.execute(
+            "INSERT INTO faq_entries (id, generated_at, question, answer, sources, llm_model_used, times_asked) "
+            "VALUES (1, '2025-01-01 00:00:00', 'Who was Macdonald?', 'Old answer', '[]', 'old-model', 9), "
+            "(2, '2025-01-01 00:00:00', 'A question nobody asks anymore', 'Stale', '[]', 'old-model', 9)"
+        )
+        conn.execute("INSERT INTO faq_keys VALUES ('who was macdonald', 1), ('a question nobody asks anymore', 2)")
+
+    monkeypatch.setattr(main.startup_loader, "load_all", lambda: True)
+    monkeypatch.setattr(main, "embedder", StubEmbedder())
+    yield path
+
+
+def stub_answers(monkeypatch, answers):
+    """generate_answer returns answers[question]; an exception value is raised instead."""
+    def generate_answer(question, top_k, diversity, expand):
+        answer = answers[question]
+        if isinstance(answer, Exception):
+            raise answer
+        return {"answer": answer, "hits": [], "model": "new-model"}
+    monkeypatch.setattr(main, "generate_answer", generate_answer)
+
+
+def faq_rows(path):
+    with sqlite3.connect(path) as conn:
+        return dict(conn.execute("""
+        SELECT k.question_key, e.answer FROM faq_keys k JOIN faq_entries e ON e.id = k.faq_id
+        """).fetchall())
+
+
+def test_rebuild_replaces_the_whole_faq(faq_db, monkeypatch):
+    stub_answers(monkeypatch, {"Who was Macdonald?": "The first Prime Minister.", "Why build the railway?": "To hold the West."})
+
+    assert build_faq(faq_db, min_count=2) == 2
+
+    assert faq_rows(faq_db) == {"who was macdonald": "The first Prime Minister.", "why build the railway": "To hold the West."}
+
+
+def test_failed_regeneration_keeps_the_current_answer(faq_db, monkeypatch):
+    stub_answers(monkeypatch, {"Who was Macdonald?": main.AnswerError("LLM down"), "Why build the railway?": "To hold the West."})
+
+    build_faq(faq_db, min_count=2)
+
+    assert faq_rows(faq_db) == {"who was macdonald": "Old answer", "why build the railway": "To hold the West."}
+    with sqlite3.connect(faq_db) as conn:
+        kept = conn.execute("SELECT generated_at, llm_model_used FROM faq_entries WHERE answer = 'Old answer'").fetchone()
+    assert kept == ("2025-01-01 00:00:00", "old-model")
+
+
+def test_an_insert_failing_mid_swap_leaves_the_old_faq(faq_db, monkeypatch):
+    before = faq_rows(faq_db)
+    # The second entry violates answer NOT NULL after the old rows were deleted
+    stub_answers(monkeypatch, {"Who was Macdonald?": "The first Prime Minister.", "Why build the railway?": None})
+
+    with pytest.raises(sqlite3.IntegrityError):
+        build_faq(faq_db, min_count=2)
+
+    assert faq_rows(faq_db) == before
+
+
+def test_faq_serves_only_requests_with_default_settings(api_client, monkeypatch):
+    client, db_path = api_client
+    cache = FaqCache()
+    with sqlite3.connect(db_path) as conn:
+        setup_faq_database(conn)
+        conn.execute("INSERT INTO faq_entries (id, question, answer, sources) VALUES (1, 'Who was Macdonald?', 'From the FAQ', '[]')")
+        conn.execute("INSERT INTO faq_keys VALUES ('who was macdonald', 1)")
+        conn.commit()
+        cache.load(conn)
+    monkeypatch.setattr(main, "faq_cache", cache)
+    calls = []
+
+    def generate_answer(question, top_k, diversity, expand, session=None):
+        calls.append((top_k, diversity, expand, session is not None))
+        return {
+            "answer": "Generated", "hits": [], "model": "stub", "llm_attempt": 1, "llm_hedged": False,
+            "prompt_tokens": 1, "packed_prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2,
+            "index_version": "v1",
+        }
+    monkeypatch.setattr(main, "generate_answer", generate_answer)
+
+    def ask(**options):
+        return client.post("/api/ask", json={"question": "who was Macdonald", **options}).json()["answer"]
+
+    assert ask() == "From the FAQ"
+    assert ask(top_k=3) == "Generated"
+    assert ask(diversity=0.0) == "Generated"
+    assert ask(expand_context=True) == "Generated"
+    assert ask(conversation=True) == "Generated"
+    assert len(calls) == 4
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,81 @@
+"""
+Tests for snapshot naming and garbage collection in index_snapshots.py, and for the API's
+reload endpoint swapping between Chroma snapshots.
+"""
+import os
+from functools import partial
+
+import chromadb
+
+import index_snapshots
+import main
+from index_snapshots import building_dir, current_version, finish_build, gc_snapshots, list_versions, new_version, publish
+from ingestion.pipeline import COLLECTION_NAME, SNAPSHOT_CHROMA_DIR
+
+
+def build(root):
+    version = new_version(root)
+    finish_build(version, 1, root)
+    return version
+
+
+def test_versions_created_in_the_same_second_dont_collide(tmp_path):
+    root = str(tmp_path)
+    first, second = new_version(root), new_version(root)
+
+    assert first != second
+    assert sorted([first, second]) == [first, second]
+    assert os.path.isdir(building_dir(first, root)) and os.path.isdir(building_dir(second, root))
+
+
+def test_gc_keeps_the_active_and_previously_active_snapshots(tmp_path):
+    root = str(tmp_path)
+    v1, v2, v3, v4 = (build(root) for _ in range(4))
+    publish(v3, root)
+    # Roll back to v1: processes still serving v3 keep it until their next check
+    publish(v1, root)
+
+    deleted = gc_snapshots(keep=1, root=root)
+
+    assert current_version(root) == v1
+    assert deleted == [v2]
+    assert list_versions(root) == [v1, v3, v4]
+
+
+def build_chroma(root):
+    version = new_version(root)
+    client = chromadb.PersistentClient(path=os.path.join(building_dir(version, root), SNAPSHOT_CHROMA_DIR))
+    client.get_or_create_collection(COLLECTION_NAME).add(
+        ids=[f"chunk-{version}"], embeddings=[[0.5] * 8], documents=[f"Chunk of {version}"], metadatas=[{"source": "hansard"}]
+    )
+    finish_build(version, 1, root)
+    return version
+
+
+def test_reload_with_the_chroma_backend_deletes_nothing_in_use(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    for name in ("current_version", "snapshot_dir", "publish", "gc_snapshots", "list_versions"):
+        monkeypatch.setattr(main, name, partial(getattr(index_snapshots, name), root=root))
+    monkeypatch.setattr(main, "INDEX_BACKEND", "chroma")
+    monkeypatch.setattr(main, "CONTEXT_EXPANSION", False)
+    monkeypatch.setattr(main, "active_index", (None, None))
+    monkeypatch.setattr(main, "chroma_clients", {})
+
+    v1, v2, v3, v4 = (build_chroma(root) for _ in range(4))
+    publish(v1, root)
+    old_collection, _ = main.get_collection()
+    # Two ingestions publish before this process checks; gc alone would delete v1
+    publish(v2, root)
+    publish(v3, root)
+
+    result = main.admin_index_reload()
+
+    assert result == {"active": v3, "swapped": True, "deleted_snapshots": []}
+    assert list_versions(root) == [v1, v2, v3, v4]
+    # A request that started on v1 can still read it
+    assert old_collection.get(ids=[f"chunk-{v1}"])["documents"] == [f"Chunk of {v1}"]
+    assert set(main.chroma_clients) == {v1, v3}
+
+    # The next swap closes v1's client; v3's stays open for requests still on it
+    assert main.admin_index_reload(version=v4)["active"] == v4
+    assert set(main.chroma_clients) == {v3, v4}
@@ -0,0 +1,207 @@
+"""
+Offline tests for the ingestion framework: fixture pages and PDFs are served from a local
+http.server, and embeddings come from a small deterministic stand-in for the model.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import uuid
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import chromadb
+import fitz
+import numpy as np
+import pytest
+
+from index_snapshots import building_dir, current_version, finish_build, list_versions, publish, snapshot_dir
+from ingestion import LocalFileSource, UrlSource, chunk_documents, chunk_id, fetch_all, ingest, ingest_snapshot
+from ingestion.pipeline import COLLECTION_NAME, SNAPSHOT_CHROMA_DIR
+from text_chunker import TokenChunker
+from vector_index import NumpyIndex
+
+ARTICLE_HTML = """<html><head><title>Macdonald</title><script>var tracking = 1;</script></head>
+<body><nav>Home | About</nav>
+<article><p>John A. Macdonald was the first Prime Minister of Canada. He led the
+Conservative Party through Confederation in 1867.</p>
+<p>He was born in Glasgow in 1815. His family emigrated to Kingston.</p></article>
+<footer>Copyright</footer></body></html>"""
+
+PDF_PAGES = [
+    "My dear Pope, the railway must be built. We cannot hold the West without it.",
+    "The Pacific scandal has been a heavy blow. I remain yours faithfully, John A.",
+]
+
+
+def make_pdf(pages):
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text, fontsize=9)
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+class WordTokenizer:
+    """Counts whitespace-separated words as tokens, like a tokenizer with one piece per word."""
+
+    def __call__(self, texts, add_special_tokens=False, verbose=False):
+        return {"input_ids": [list(range(len(text.split()))) for text in texts]}
+
+
+class HashEmbedder:
+    """Deterministic stand-in for the SentenceTransformer: embeddings derived from the text."""
+    tokenizer = WordTokenizer()
+    max_seq_length = 32
+
+    def encode(self, texts, batch_size=64):
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:4], "little")
+            vectors.append(np.random.default_rng(seed).standard_normal(8))
+        return np.array(vectors, dtype=np.float32)
+
+
+@pytest.fixture(scope="module")
+def site(tmp_path_factory):
+    """Serves article.html and letters.pdf from a local HTTP server; yields the base URL."""
+    root = tmp_path_factory.mktemp("site")
+    (root / "article.html").write_text(ARTICLE_HTML, encoding="utf-8")
+    (root / "letters.pdf").write_bytes(make_pdf(PDF_PAGES))
+
+    handler = partial(SimpleHTTPRequestHandler, directory=str(root))
+    handler.log_message = lambda *args: None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def sources(base_url, year=1867):
+    return [
+        UrlSource(f"{base_url}/article.html", source_name="article", year=year),
+        UrlSource(f"{base_url}/letters.pdf", source_name="letters", year=year),
+    ]
+
+
+def test_html_adapter_keeps_article_text(site):
+    article, = asyncio.run(fetch_all([UrlSource(f"{site}/article.html", source_name="article", year=2024)]))
+
+    (page_number, text), = article.pages
+    assert page_number is None
+    assert "first Prime Minister of Canada" in text
+    assert "born in Glasgow" in text
+    assert "tracking" not in text
+    assert "Home | About" not in text
+    assert article.metadata == {"source": "article", "year": 2024, "speaker": "Narrator", "url": f"{site}/article.html"}
+
+
+def test_pdf_adapter_numbers_pages(site):
+    letters, = asyncio.run(fetch_all([UrlSource(f"{site}/letters.pdf", source_name="letters")]))
+
+    assert [page_number for page_number, _ in letters.pages] == [1, 2]
+    assert "railway must be built" in letters.pages[0][1]
+    assert "Pacific scandal" in letters.pages[1][1]
+
+
+def test_failed_source_is_skipped(site):
+    documents = asyncio.run(fetch_all([
+        UrlSource(f"{site}/missing.html", source_name="missing"),
+        UrlSource(f"{site}/article.html", source_name="article"),
+    ]))
+    assert [document.source for document in documents] == ["article"]
+
+
+def test_chunk_ids_are_stable_across_runs(site):
+    chunker = TokenChunker(WordTokenizer(), max_tokens=12, overlap_tokens=4)
+    first = chunk_documents(asyncio.run(fetch_all(sources(site))), chunker)
+    second = chunk_documents(asyncio.run(fetch_all(sources(site))), chunker)
+
+    ids, texts, metadatas = first
+    assert len(ids) > 2
+    assert ids == second[0]
+    assert len(set(ids)) == len(ids)
+    assert ids == [chunk_id(meta["source"], text, meta["url"]) for text, meta in zip(texts, metadatas)]
+    assert {meta["page"] for meta in metadatas if meta["source"] == "letters"} == {1, 2}
+
+
+def test_reingest_updates_instead_of_duplicating(site):
+    collection = chromadb.EphemeralClient().create_collection(f"test_{uuid.uuid4().hex}")
+    embedder = HashEmbedder()
+
+    first = ingest(sources(site, year=1867), collection=collection, embedder=embedder, overlap_tokens=4)
+    assert first > 2
+    assert collection.count() == first
+
+    # Same content, new metadata: the records are updated in place
+    second = ingest(sources(site, year=1868), collection=collection, embedder=embedder, overlap_tokens=4)
+    assert second == first
+    assert collection.count() == first
+    stored = collection.get(include=["metadatas"])
+    assert {meta["year"] for meta in stored["metadatas"]} == {1868}
+
+
+def test_reingest_replaces_the_chunks_of_an_edited_source(tmp_path):
+    collection = chromadb.EphemeralClient().create_collection(f"test_{uuid.uuid4().hex}")
+    embedder = HashEmbedder()
+    page = tmp_path / "page.txt"
+    other = tmp_path / "other.txt"
+    other.write_text("Kingston was his home for most of his life.", encoding="utf-8")
+
+    page.write_text("The railway reached the Pacific in 1885.", encoding="utf-8")
+    ingest([LocalFileSource(str(page), source_name="page"), LocalFileSource(str(other), source_name="other")],
+           collection=collection, embedder=embedder, overlap_tokens=4)
+    page.write_text("He was knighted in 1867.", encoding="utf-8")
+    ingest([LocalFileSource(str(page), source_name="page")], collection=collection, embedder=embedder, overlap_tokens=4)
+
+    stored = collection.get(include=["documents", "metadatas"])
+    by_source = {meta["source"]: doc for doc, meta in zip(stored["documents"], stored["metadatas"])}
+    assert collection.count() == 2
+    assert by_source == {"page": "He was knighted in 1867.", "other": "Kingston was his home for most of his life."}
+
+
+def test_pages_sharing_a_source_keep_their_own_copy_of_identical_text(site):
+    collection = chromadb.EphemeralClient().create_collection(f"test_{uuid.uuid4().hex}")
+    embedder = HashEmbedder()
+    # Two urls that serve the same page, like site-wide boilerplate on two chapters
+    first = UrlSource(f"{site}/article.html", source_name="anecdotal_life", year=1867)
+    second = UrlSource(f"{site}/article.html?chapter=2", source_name="anecdotal_life", year=1867)
+
+    upserted = ingest([first, second], collection=collection, embedder=embedder, overlap_tokens=4)
+    assert upserted > 2
+    assert collection.count() == upserted
+    assert len(collection.get(where={"url": first.url})["ids"]) == upserted // 2
+
+    # Re-ingesting one page leaves the other page's chunks alone
+    ingest([first], collection=collection, embedder=embedder, overlap_tokens=4)
+    assert collection.count() == upserted
+    assert len(collection.get(where={"url": second.url})["ids"]) == upserted // 2
+
+
+def test_ingest_snapshot_publishes_a_copy_of_the_active_snapshot(site, tmp_path):
+    root = str(tmp_path / "snapshots")
+    active = "20240101T000000Z"
+    os.makedirs(building_dir(active, root))
+    client = chromadb.PersistentClient(path=os.path.join(building_dir(active, root), SNAPSHOT_CHROMA_DIR))
+    client.get_or_create_collection(COLLECTION_NAME).add(
+        ids=["hansard-1"], embeddings=[[0.5] * 8], documents=["Hansard speech"], metadatas=[{"source": "hansard"}]
+    )
+    finish_build(active, 1, root)
+    publish(active, root)
+
+    version, upserted = ingest_snapshot(sources(site), root=root, embedder=HashEmbedder(), overlap_tokens=4)
+
+    assert version != active
+    assert current_version(root) == version
+    assert list_versions(root) == [active, version]
+    # The new snapshot has the old chunks plus the new sources, in Chroma and the NumPy export
+    index = NumpyIndex.load(snapshot_dir(version, root))
+    assert index.count() == upserted + 1
+    assert "hansard-1" in index.get()["ids"]
+    # The snapshot being served before isn't modified
+    old = chromadb.PersistentClient(path=os.path.join(snapshot_dir(active, root), SNAPSHOT_CHROMA_DIR))
+    assert old.get_collection(COLLECTION_NAME).count() == 1
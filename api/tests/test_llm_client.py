@@ -0,0 +1,166 @@
+"""
+Tests for LLMClient against a stub chat completions server on localhost: retries, hedging,
+model fallback and the circuit breaker's states.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from llm_client import LLMClient, LLMError
+
+
+def completion(text):
+    return {"choices": [{"message": {"content": text}}]}
+
+
+class StubServer:
+    """
+    Answers each POST with the next scripted reply for the requested model:
+    (status, body) or (status, body, delay_seconds). A model with no replies left gets a 200.
+    """
+
+    def __init__(self):
+        self.replies = {}
+        self.calls = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                model = payload["model"]
+                with stub._lock:
+                    stub.calls.append(model)
+                    replies = stub.replies.get(model)
+                    reply = replies.pop(0) if replies else (200, completion(f"answer from {model}"))
+                status, body, *delay = reply
+                if delay:
+                    time.sleep(delay[0])
+                data = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def script(self, model, *replies):
+        self.replies[model] = list(replies)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+def make_client(stub, models=("model-a", "model-b"), **options):
+    settings = {"timeout": 5.0, "total_timeout": 10.0, "hedge_delay": 0, "max_retries": 2, "backoff_base": 0.01}
+    settings.update(options)
+    return LLMClient(list(models), "test-key", base_url=stub.url, **settings)
+
+
+def test_transient_errors_are_retried(stub):
+    stub.script("model-a", (503, "busy"), (429, "slow down"))
+    result = make_client(stub).complete([], temperature=0, max_tokens=10)
+
+    assert result.model == "model-a"
+    assert result.attempt == 3
+    assert result.response_data == completion("answer from model-a")
+    assert stub.calls == ["model-a"] * 3
+
+
+def test_malformed_bodies_are_retried_as_transient(stub):
+    stub.script("model-a", (200, "[]"), (200, '"upstream error"'), (200, {"error": "no choices"}))
+    client = make_client(stub, max_retries=3)
+
+    result = client.complete([], temperature=0, max_tokens=10)
+    assert (result.model, result.attempt) == ("model-a", 4)
+
+
+def test_slow_request_is_hedged(stub):
+    stub.script("model-a", (200, completion("slow"), 1.0), (200, completion("fast")))
+    result = make_client(stub, hedge_delay=0.1).complete([], temperature=0, max_tokens=10)
+
+    assert result.hedged
+    assert result.response_data == completion("fast")
+    assert stub.calls == ["model-a", "model-a"]
+
+
+def test_permanent_error_falls_back_without_tripping_the_breaker(stub):
+    stub.script("model-a", (503, "busy"), (400, "unknown model"))
+    client = make_client(stub, breaker_threshold=2)
+
+    result = client.complete([], temperature=0, max_tokens=10)
+    assert (result.model, result.attempt) == ("model-b", 3)
+    assert stub.calls == ["model-a", "model-a", "model-b"]
+
+    # The 400 didn't reset the transient failure counted before it: one more opens the breaker
+    stub.script("model-a", (503, "busy"))
+    client.complete([], temperature=0, max_tokens=10)
+    assert client.status()["model-a"] == "open"
+
+
+def test_breaker_opens_then_lets_one_trial_through(stub):
+    stub.script("model-a", *[(503, "down")] * 2)
+    client = make_client(stub, max_retries=1, breaker_threshold=2, breaker_reset=0.2)
+
+    assert client.complete([], temperature=0, max_tokens=10).model == "model-b"
+    assert client.status() == {"model-a": "open", "model-b": "closed"}
+
+    # While open, model-a isn't called at all
+    stub.calls.clear()
+    assert client.complete([], temperature=0, max_tokens=10).model == "model-b"
+    assert stub.calls == ["model-b"]
+
+    time.sleep(0.25)
+    assert client.status()["model-a"] == "half-open"
+    assert client.complete([], temperature=0, max_tokens=10).model == "model-a"
+    assert client.status()["model-a"] == "closed"
+
+
+def test_failed_trial_reopens_the_breaker(stub):
+    stub.script("model-a", (503, "down"), (200, "not a completion"))
+    client = make_client(stub, models=["model-a"], max_retries=0, breaker_threshold=1, breaker_reset=0.2)
+
+    with pytest.raises(LLMError):
+        client.complete([], temperature=0, max_tokens=10)
+    time.sleep(0.25)
+    with pytest.raises(LLMError):
+        client.complete([], temperature=0, max_tokens=10)
+    assert client.status()["model-a"] == "open"
+
+
+def test_permanent_error_on_a_trial_doesnt_leave_the_breaker_stuck(stub):
+    stub.script("model-a", (503, "down"), (400, "bad request"))
+    client = make_client(stub, max_retries=0, breaker_threshold=1, breaker_reset=0.2)
+
+    assert client.complete([], temperature=0, max_tokens=10).model == "model-b"
+    time.sleep(0.25)
+    assert client.complete([], temperature=0, max_tokens=10).model == "model-b"
+    # The next request may try model-a again
+    assert client.complete([], temperature=0, max_tokens=10).model == "model-a"
+
+
+def test_total_timeout_bounds_the_call(stub):
+    stub.script("model-a", (200, completion("late"), 1.0))
+    client = make_client(stub, models=["model-a"], total_timeout=0.3)
+
+    start = time.monotonic()
+    with pytest.raises(LLMError, match="total timeout"):
+        client.complete([], temperature=0, max_tokens=10)
+    assert time.monotonic() - start < 1.0
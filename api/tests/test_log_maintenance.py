@@ -0,0 +1,98 @@
+"""
+Tests for log_maintenance.py: incremental rollups, archival that waits for the daily
+rollup, the lease between workers, and the API's background loop surviving a failed run.
+"""
+import asyncio
+import gzip
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import main
+from log_maintenance import _acquire_lease, _release_lease, archive_old_logs, rollup, run_maintenance, setup_maintenance_tables
+from usage_logger import setup_database
+
+
+def make_db(path=":memory:"):
+    conn = sqlite3.connect(path)
+    setup_database(conn)
+    setup_maintenance_tables(conn)
+    return conn
+
+
+def log(conn, *timestamps):
+    conn.executemany(
+        "INSERT INTO logs (timestamp, is_successful, latency_ms, total_tokens) VALUES (?, 1, 100, 10)",
+        [(timestamp,) for timestamp in timestamps]
+    )
+    conn.commit()
+
+
+def test_rollup_only_reads_rows_past_its_watermark():
+    conn = make_db()
+    log(conn, "2025-08-23 09:10:00", "2025-08-23 09:50:00", "2025-08-23 10:05:00")
+    now = datetime(2025, 8, 23, 10, 30)
+
+    assert rollup(conn, "hour", now=now) == 1
+    # Nothing new is complete: a second run writes nothing
+    assert rollup(conn, "hour", now=now) == 0
+    # Later runs start at the watermark: the hour already rolled up is not re-read
+    log(conn, "2025-08-23 09:55:00", "2025-08-23 11:15:00")
+    assert rollup(conn, "hour", now=datetime(2025, 8, 23, 12, 5)) == 2
+
+    rows = conn.execute("SELECT bucket, requests FROM logs_hourly ORDER BY bucket").fetchall()
+    assert rows == [("2025-08-23 09:00:00", 2), ("2025-08-23 10:00:00", 1), ("2025-08-23 11:00:00", 1)]
+
+
+def test_nothing_is_archived_before_the_daily_rollup_covers_it(tmp_path):
+    conn = make_db()
+    log(conn, "2025-01-01 12:00:00", "2025-01-02 12:00:00", "2025-08-01 12:00:00")
+    now = datetime(2025, 8, 23, 10, 30)
+    archive_dir = str(tmp_path / "archive")
+
+    # No daily rollup yet
+    assert archive_old_logs(conn, retention_days=90, archive_dir=archive_dir, now=now) == 0
+    # The daily rollup has only reached Jan 2: the Jan 2 row is still needed
+    rollup(conn, "day", now=datetime(2025, 1, 2, 8))
+    assert archive_old_logs(conn, retention_days=90, archive_dir=archive_dir, now=now) == 1
+
+    rollup(conn, "day", now=now)
+    assert archive_old_logs(conn, retention_days=90, archive_dir=archive_dir, now=now) == 1
+    # Inside the retention window
+    assert conn.execute("SELECT timestamp FROM logs").fetchall() == [("2025-08-01 12:00:00",)]
+    with gzip.open(tmp_path / "archive" / "logs_2025-01-01.jsonl.gz", "rt", encoding="utf-8") as f:
+        assert [json.loads(line)["timestamp"] for line in f] == ["2025-01-01 12:00:00"]
+
+
+def test_only_one_process_holds_the_lease(tmp_path):
+    path = str(tmp_path / "monitoring.db")
+    first, second = make_db(path), make_db(path)
+
+    assert _acquire_lease(first, 600)
+    assert not _acquire_lease(second, 600)
+    # Another worker's run skips while the lease is held
+    assert run_maintenance(path) is None
+    _release_lease(first)
+    assert run_maintenance(path) == {"hourly_buckets": 0, "daily_buckets": 0, "archived_rows": 0}
+    # An expired lease (a crashed run) can be taken over
+    assert _acquire_lease(first, -1)
+    assert _acquire_lease(second, 600)
+
+
+def test_maintenance_loop_keeps_running_after_an_error(monkeypatch):
+    calls = []
+
+    def failing_run(db_path, retention_days):
+        calls.append(db_path)
+        if len(calls) == 1:
+            raise OSError("archive/ is read-only")
+        # Ends the test's loop
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(main, "run_maintenance", failing_run)
+    monkeypatch.setattr(main, "LOG_MAINTENANCE_INTERVAL_SECONDS", 0)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main.log_maintenance_loop())
+    assert len(calls) == 2
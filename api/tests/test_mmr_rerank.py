@@ -0,0 +1,55 @@
+"""
+Tests for mmr_select: plain similarity order without diversity, near-duplicates demoted
+as diversity rises, and relevance scores given on another scale.
+"""
+import numpy as np
+
+from mmr_rerank import mmr_select
+
+
+def unit(angle):
+    return [np.cos(angle), np.sin(angle)]
+
+
+def test_no_diversity_keeps_the_similarity_order():
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(16)
+    embeddings = rng.standard_normal((30, 16))
+    similarity = embeddings @ query / np.linalg.norm(embeddings, axis=1)
+
+    assert mmr_select(query, embeddings, 10, lambda_mult=1.0) == list(np.argsort(-similarity)[:10])
+
+
+def test_near_duplicates_are_demoted_as_diversity_rises():
+    query = unit(0.0)
+    # Three near-copies of one passage closest to the query, then two different passages
+    embeddings = [unit(0.10), unit(0.101), unit(0.102), unit(0.50), unit(-0.55)]
+    duplicates = {0, 1, 2}
+
+    picked = [
+        len(duplicates & set(mmr_select(query, embeddings, 3, lambda_mult=1.0 - diversity)))
+        for diversity in (0.0, 0.5, 0.8)
+    ]
+    assert picked == [3, 2, 1]
+
+
+def test_top_k_larger_than_the_pool_returns_every_candidate_once():
+    query = unit(0.0)
+    embeddings = [unit(0.1), unit(0.2), unit(0.3)]
+
+    assert sorted(mmr_select(query, embeddings, 10)) == [0, 1, 2]
+    assert mmr_select(query, [], 5) == []
+
+
+def test_relevance_scores_on_another_scale_are_mapped_to_cosine_range():
+    query = unit(0.0)
+    # Two near-duplicates close to the query, and a more distant, different candidate
+    embeddings = [unit(0.10), unit(0.11), unit(0.60)]
+    cosine = np.array([np.cos(0.10), np.cos(0.11), np.cos(0.60)])
+
+    plain = mmr_select(query, embeddings, 2, lambda_mult=0.3)
+    # A cross-encoder-like score: same order, but a 100x wider spread than cosine similarity
+    rescaled = mmr_select(query, embeddings, 2, lambda_mult=0.3, relevance=100 * cosine + 3)
+
+    assert plain == [0, 2]
+    assert rescaled == plain
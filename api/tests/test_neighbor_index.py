@@ -0,0 +1,77 @@
+"""
+Tests for NeighborIndex: neighbours are found within one document and one speech only,
+including web pages that share a source name and whose chunk_index restarts on every page.
+"""
+from chunk_store import ChunkStore
+from neighbor_index import NeighborIndex
+
+
+def count_tokens(text):
+    return len(text.split())
+
+
+def make_index(records):
+    ids = [chunk_id for chunk_id, _, _ in records]
+    documents = [doc for _, doc, _ in records]
+    metadatas = [meta for _, _, meta in records]
+    return NeighborIndex(ChunkStore.from_records(ids, documents, metadatas))
+
+
+def hansard(chunk_index, speech_index=None, page=3):
+    meta = {"source": "hansard_debate_01_01_1867.pdf", "parliament": 1, "page": page, "chunk_index": chunk_index}
+    if speech_index is not None:
+        meta["speech_index"] = speech_index
+    return meta
+
+
+def test_expand_stitches_chunks_of_the_same_speech():
+    records = [
+        ("a0", "first part", hansard(0, speech_index=0)),
+        ("a1", "second part", hansard(1, speech_index=0)),
+        ("a2", "third part", hansard(2, speech_index=0)),
+    ]
+    index = make_index(records)
+
+    (chunk_id, doc, _), = index.expand([records[1]], token_budget=100, count_tokens=count_tokens)
+    assert (chunk_id, doc) == ("a1", "first part second part third part")
+
+
+def test_speeches_starting_on_the_same_page_are_not_stitched_together():
+    records = [
+        ("a0", "end of one speech", hansard(0, speech_index=0)),
+        ("b0", "start of the next", hansard(1, speech_index=1)),
+        ("b1", "rest of the next", hansard(2, speech_index=1)),
+    ]
+    index = make_index(records)
+
+    (_, doc, _), = index.expand([records[1]], token_budget=100, count_tokens=count_tokens)
+    assert doc == "start of the next rest of the next"
+
+
+def test_hansard_chunks_without_speech_index_are_not_expanded():
+    # Extracted before speech_index existed: the speech boundaries are unknown
+    records = [("a0", "one speech", hansard(0)), ("b0", "another speech", hansard(1))]
+    index = make_index(records)
+
+    (_, doc, _), = index.expand([records[1]], token_budget=100, count_tokens=count_tokens)
+    assert doc == "another speech"
+
+
+def test_web_pages_sharing_a_source_are_not_stitched_together():
+    source = "anecdotal_life_macdonald"
+    home = "https://www.johnamacdonald.org/"
+    chapter = "https://www.johnamacdonald.org/p/macdonald-x.html"
+    records = [
+        ("h0", "home page opening", {"source": source, "url": home, "chunk_index": 0}),
+        ("h1", "home page close", {"source": source, "url": home, "chunk_index": 1}),
+        ("c0", "chapter ten opening", {"source": source, "url": chapter, "chunk_index": 0}),
+        ("c1", "chapter ten close", {"source": source, "url": chapter, "chunk_index": 1}),
+    ]
+    index = make_index(records)
+
+    assert len(index) == 4
+    expanded = index.expand([records[0], records[3]], token_budget=100, count_tokens=count_tokens)
+    assert [doc for _, doc, _ in expanded] == [
+        "home page opening home page close",
+        "chapter ten opening chapter ten close",
+    ]
@@ -0,0 +1,120 @@
+"""
+Tests for QueryEncoder with a stub model that records its batches: questions arriving
+within the window share one encode call, the LRU cache is keyed on the normalized
+question, and a forked worker process gets its own encoder thread.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from query_encoder import QueryEncoder
+
+
+class StubModel:
+    """Embeds a text as [its length, its first character's code]; records every batch."""
+
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def encode(self, texts, batch_size=32):
+        with self._lock:
+            self.batches.append(list(texts))
+        return np.array([[len(text), ord(text[0])] for text in texts], dtype=np.float32)
+
+
+def encode_together(encoder, texts):
+    barrier = threading.Barrier(len(texts))
+
+    def encode(text):
+        barrier.wait()
+        return encoder.encode(text)
+
+    with ThreadPoolExecutor(len(texts)) as pool:
+        return list(pool.map(encode, texts))
+
+
+def test_questions_arriving_within_the_window_are_encoded_together():
+    model = StubModel()
+    encoder = QueryEncoder(model, window_ms=200)
+    texts = [f"question {i}" for i in range(6)]
+
+    embeddings = encode_together(encoder, texts)
+
+    assert embeddings == [[len(text), ord("q")] for text in texts]
+    assert [len(batch) for batch in model.batches] == [6]
+    assert encoder.stats()["batch_size_distribution"] == {"6": 1}
+
+
+def test_batches_are_capped_at_max_batch():
+    model = StubModel()
+    encoder = QueryEncoder(model, window_ms=200, max_batch=4)
+
+    encode_together(encoder, [f"question {i}" for i in range(10)])
+
+    assert sorted(len(batch) for batch in model.batches) in ([2, 4, 4], [1, 1, 4, 4], [1, 1, 2, 2, 4])[:1] or \
+        max(len(batch) for batch in model.batches) <= 4
+    assert sum(len(batch) for batch in model.batches) == 10
+
+
+def test_cache_is_keyed_on_the_normalized_question():
+    model = StubModel()
+    encoder = QueryEncoder(model, window_ms=0)
+
+    first = encoder.encode("Why build the railway?")
+    second = encoder.encode("  why build  the railway ")
+
+    assert second == first
+    assert model.batches == [["Why build the railway?"]]
+    assert encoder.stats()["cache_hits"] == 1
+
+
+def test_least_recently_used_question_is_evicted():
+    model = StubModel()
+    encoder = QueryEncoder(model, window_ms=0, cache_size=2)
+
+    for text in ["alpha", "beta", "alpha", "gamma", "alpha", "beta"]:
+        encoder.encode(text)
+
+    # "alpha" was used again before "gamma" came in, so "beta" was the one evicted
+    assert [batch[0] for batch in model.batches] == ["alpha", "beta", "gamma", "beta"]
+
+
+def test_encode_many_uses_the_cache_and_encodes_misses_in_one_call():
+    model = StubModel()
+    encoder = QueryEncoder(model, window_ms=0)
+    encoder.encode("alpha")
+
+    embeddings = encoder.encode_many(["Alpha", "beta", "gamma"])
+
+    assert embeddings == [[5, ord("a")], [4, ord("b")], [5, ord("g")]]
+    assert model.batches == [["alpha"], ["beta", "gamma"]]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_a_forked_process_starts_its_own_worker():
+    model = StubModel()
+    encoder = QueryEncoder(model, window_ms=0, cache_size=0)
+    # Started in the parent, as in a preloading gunicorn master
+    encoder.encode("parent")
+    parent_worker = encoder._worker
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+
+    def child():
+        # Without a restart this would wait forever on a queue nobody reads
+        results.put((encoder.encode("child"), encoder._worker is not parent_worker))
+
+    process = context.Process(target=child, daemon=True)
+    process.start()
+    embedding, restarted = results.get(timeout=10)
+    process.join(10)
+
+    assert embedding == [5, ord("c")]
+    assert restarted
+    assert process.exitcode == 0
@@ -0,0 +1,135 @@
+"""
+Tests for SingleFlight and its use in /api/ask: identical questions asked at the same time
+make one generate_answer call and share its answer or error, and only the request that
+called the LLM logs token counts.
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import main
+from request_coalescer import SingleFlight
+
+FOLLOWERS = 3
+
+
+def test_concurrent_calls_with_one_key_share_the_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    with ThreadPoolExecutor(FOLLOWERS + 1) as pool:
+        leader = pool.submit(flight.do, "key", work)
+        while flight.in_flight() == 0:
+            time.sleep(0.001)
+        followers = [pool.submit(flight.do, "key", work) for _ in range(FOLLOWERS)]
+        while flight.coalesced_count < FOLLOWERS:
+            time.sleep(0.001)
+        release.set()
+
+        assert leader.result() == ("answer", False)
+        assert [f.result() for f in followers] == [("answer", True)] * FOLLOWERS
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+
+def test_the_leaders_error_is_raised_in_every_caller():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def work():
+        release.wait(5)
+        raise RuntimeError("LLM down")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, "key", work)
+        while flight.in_flight() == 0:
+            time.sleep(0.001)
+        follower = pool.submit(flight.do, "key", work)
+        while flight.coalesced_count < 1:
+            time.sleep(0.001)
+        release.set()
+
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="LLM down"):
+                future.result()
+    # The next call starts afresh
+    assert flight.do("key", lambda: "recovered") == ("recovered", False)
+
+
+def test_key_covers_everything_that_changes_the_answer(monkeypatch):
+    key = main.question_flight_key
+    base = key("Why build the railway?", 5, 0.3, False)
+
+    assert key("  why build the railway ", 5, 0.3, False) == base
+    assert key("Why build the railway?", 8, 0.3, False) != base
+    assert key("Why build the railway?", 5, 0.0, False) != base
+    assert key("Why build the railway?", 5, 0.3, True) != base
+    monkeypatch.setattr(main, "LLM_MODELS", ["another/model"])
+    assert key("Why build the railway?", 5, 0.3, False) != base
+
+
+@pytest.fixture
+def api(api_client, monkeypatch):
+    """The app with a blocking stub generate_answer; yields (client, calls, release, db path)."""
+    client, db_path = api_client
+    calls = []
+    release = threading.Event()
+
+    def generate_answer(question, top_k, diversity, expand, session=None):
+        calls.append(question)
+        release.wait(5)
+        if question.startswith("fail"):
+            raise main.AnswerError("Sorry, try again.", log_message="LLM down", index_version="v1")
+        return {
+            "answer": "He built it.", "hits": [], "model": "stub", "llm_attempt": 1, "llm_hedged": False,
+            "prompt_tokens": 100, "packed_prompt_tokens": 90, "completion_tokens": 20, "total_tokens": 120,
+            "index_version": "v1",
+        }
+
+    monkeypatch.setattr(main, "generate_answer", generate_answer)
+    monkeypatch.setattr(main, "inflight_questions", SingleFlight())
+    yield client, calls, release, db_path
+
+
+def ask_together(client, release, question):
+    """Sends the question FOLLOWERS + 1 times at once; returns the JSON responses."""
+    with ThreadPoolExecutor(FOLLOWERS + 1) as pool:
+        futures = [pool.submit(client.post, "/api/ask", json={"question": question}) for _ in range(FOLLOWERS + 1)]
+        deadline = time.time() + 5
+        while main.inflight_questions.coalesced_count < FOLLOWERS and time.time() < deadline:
+            time.sleep(0.005)
+        release.set()
+        return [future.result().json() for future in futures]
+
+
+def test_identical_questions_make_one_call_and_only_the_leader_logs_tokens(api):
+    client, calls, release, db_path = api
+
+    responses = ask_together(client, release, "Why build the railway?")
+
+    assert len(calls) == 1
+    assert [response["answer"] for response in responses] == ["He built it."] * (FOLLOWERS + 1)
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT coalesced, total_tokens, prompt_tokens FROM logs ORDER BY coalesced").fetchall()
+    assert rows == [(0, 120, 100)] + [(1, None, None)] * FOLLOWERS
+
+
+def test_coalesced_requests_share_the_error(api):
+    client, calls, release, db_path = api
+
+    responses = ask_together(client, release, "fail: why build the railway?")
+
+    assert len(calls) == 1
+    assert responses == [{"error": "Sorry, try again."}] * (FOLLOWERS + 1)
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT is_successful, coalesced, error_message FROM logs ORDER BY coalesced").fetchall()
+    assert rows == [(0, 0, "LLM down")] + [(0, 1, "LLM down")] * FOLLOWERS
@@ -0,0 +1,107 @@
+"""
+Tests for ProfilerMiddleware and profile_thread on a small app: a disarmed profiler
+passes requests through, and a request's report only holds the threads that handled it.
+"""
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from llm_client import LLMClient
+from request_profiler import ProfilerMiddleware, RequestProfiler, profile_thread
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def handle_request():
+    busy(0.2)
+
+
+def background_work(stop):
+    while not stop.is_set():
+        busy(0.01)
+
+
+def make_client(profiler):
+    app = FastAPI()
+    app.add_middleware(ProfilerMiddleware, profiler=profiler, paths=("/api/ask",))
+
+    @app.post("/api/ask")
+    @profile_thread
+    def ask():
+        handle_request()
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def read_report(profiler, name):
+    with open(profiler.report_path(name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_disarmed_profiler_saves_nothing(tmp_path):
+    profiler = RequestProfiler(directory=str(tmp_path), interval_ms=1)
+
+    assert make_client(profiler).post("/api/ask").json() == {"ok": True}
+    assert profiler.list_reports() == []
+
+
+def test_request_report_only_samples_the_handling_thread(tmp_path):
+    profiler = RequestProfiler(directory=str(tmp_path), interval_ms=1)
+    client = make_client(profiler)
+    stop = threading.Event()
+    other = threading.Thread(target=background_work, args=(stop,), name="other-work", daemon=True)
+    other.start()
+    try:
+        profiler.arm_requests(1)
+        assert client.post("/api/ask").status_code == 200
+    finally:
+        stop.set()
+        other.join()
+
+    report, = profiler.list_reports()
+    stacks = read_report(profiler, report["name"])
+    assert "handle_request" in stacks
+    assert "background_work" not in stacks
+    assert "other-work" not in stacks
+    assert not profiler.armed
+
+
+class SlowLLMClient(LLMClient):
+    """An LLMClient whose upstream takes `delay` seconds to answer."""
+
+    def __init__(self, delay):
+        super().__init__(["test-model"], "test-key", hedge_delay=0)
+        self.delay = delay
+
+    def _post(self, payload, timeout):
+        time.sleep(self.delay)
+        return {"choices": [{"message": {"content": "Answer"}}]}
+
+
+def test_request_report_follows_the_llm_call_to_its_worker_thread(tmp_path):
+    profiler = RequestProfiler(directory=str(tmp_path), interval_ms=1)
+    llm = SlowLLMClient(0.3)
+    app = FastAPI()
+    app.add_middleware(ProfilerMiddleware, profiler=profiler, paths=("/api/ask",))
+
+    @app.post("/api/ask")
+    @profile_thread
+    def ask():
+        return {"answer": llm.complete([], temperature=0, max_tokens=10).response_data["choices"][0]["message"]["content"]}
+
+    profiler.arm_requests(1)
+    assert TestClient(app).post("/api/ask").json() == {"answer": "Answer"}
+
+    report, = profiler.list_reports()
+    assert report["bytes"] > 0
+    stacks = read_report(profiler, report["name"])
+    # The worker thread making the call, and the handler thread waiting for it
+    assert "request_profiler.py:wrapper;test_request_profiler.py:_post" in stacks
+    assert "llm_client.py:_hedged_post;(waiting on future)" in stacks
@@ -0,0 +1,74 @@
+"""
+Tests for NumpyIndex on small in-memory corpora: edge cases of query(), and recall of
+the quantized first pass against the exact scan.
+"""
+import numpy as np
+import pytest
+
+from chunk_store import ChunkStore
+from vector_index import NumpyIndex
+from vector_quantization import binarize, quantize_int8
+
+DIM = 64
+INCLUDE = ("documents", "metadatas", "distances")
+
+
+def make_index(n, quantization="none", rescore_factor=4, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((n, DIM)).astype(np.float32)
+    embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    ids = [f"chunk-{i}" for i in range(n)]
+    store = ChunkStore.from_records(ids, [f"text {i}" for i in range(n)], [{"source": "test", "chunk_index": i} for i in range(n)])
+    codes = scale = None
+    if quantization == "int8":
+        codes, scale = quantize_int8(embeddings)
+    elif quantization == "binary":
+        codes = binarize(embeddings)
+    return NumpyIndex(store, embeddings, quantization, codes, scale, rescore_factor)
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8", "binary"])
+def test_empty_index_returns_empty_results(quantization):
+    index = make_index(0, quantization)
+    queries = np.ones((2, DIM), dtype=np.float32)
+
+    results = index.query(queries, n_results=5, include=INCLUDE)
+
+    assert index.count() == 0
+    assert results == {"ids": [[], []], "documents": [[], []], "metadatas": [[], []], "distances": [[], []]}
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8", "binary"])
+def test_zero_results_requested(quantization):
+    index = make_index(50, quantization)
+
+    results = index.query(np.ones((1, DIM), dtype=np.float32), n_results=0, include=INCLUDE)
+
+    assert results == {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+
+def test_more_results_than_chunks():
+    index = make_index(3)
+
+    results = index.query(np.ones((1, DIM), dtype=np.float32), n_results=10, include=INCLUDE)
+
+    assert sorted(results["ids"][0]) == ["chunk-0", "chunk-1", "chunk-2"]
+    assert results["distances"][0] == sorted(results["distances"][0])
+
+
+# Random vectors have no cluster structure, so binary codes need a wide candidate set here
+@pytest.mark.parametrize("quantization, rescore_factor, min_recall", [("int8", 4, 0.95), ("binary", 16, 0.7)])
+def test_quantized_recall(quantization, rescore_factor, min_recall):
+    exact_index = make_index(2000)
+    quantized_index = make_index(2000, quantization, rescore_factor)
+    # Queries near stored rows, so each has a clear set of true neighbours
+    rng = np.random.default_rng(1)
+    queries = exact_index.embeddings[:50] + 0.3 * rng.standard_normal((50, DIM)).astype(np.float32) / np.sqrt(DIM)
+
+    exact = exact_index.query(queries, n_results=10, include=())["ids"]
+    found = quantized_index.query(queries, n_results=10, include=())["ids"]
+
+    recall = np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, exact)])
+    assert recall >= min_recall
+    # The row each query was made from is still its nearest neighbour
+    assert [ids[0] for ids in found] == [f"chunk-{i}" for i in range(50)]
@@ -0,0 +1,174 @@
+"""
+Token-aware chunking matched to the embedding model's sequence limit.
+
+all-MiniLM-L6-v2 truncates its input at 256 word-pieces ([CLS] and [SEP] included), so
+anything past that in a chunk is never embedded and can't be found by search. This
+chunker measures length with the model's own tokenizer, keeps whole sentences where
+it can, and carries a few sentences of overlap into the next chunk.
+
+Report how many existing chunks are truncated (from the api directory):
+    python text_chunker.py --report [output]
+    python text_chunker.py --report output --pretokens   # offline lower bound, no tokenizer download
+
+On the 15,038 chunks in output/ (made by the old 500-word chunker, CHUNK_WORDS = 500 in
+extract_macdonald_speeches.py), at least 14,409 (95.8%) exceed the limit. That figure
+comes from --pretokens: every pre-token is at least one word-piece, so it is a lower
+bound. The median chunk has 547 pre-tokens, so at least half of the extracted text was
+never embedded.
+"""
+import argparse
+import json
+import os
+import re
+from functools import lru_cache
+
+# The embedding model used by the API and every ingestion path; import it from here
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_SEQ_LENGTH = 256         # SentenceTransformer(EMBEDDING_MODEL).max_seq_length
+SPECIAL_TOKENS = 2           # [CLS] and [SEP]
+# Tokens of trailing context repeated at the start of the next chunk
+OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+
+
+class TokenChunker:
+    def __init__(self, tokenizer=None, max_tokens=MAX_SEQ_LENGTH - SPECIAL_TOKENS,
+                 overlap_tokens=OVERLAP_TOKENS):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def count_tokens(self, texts):
+        """Token counts (without special tokens) for a list of texts, in one tokenizer call."""
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def _split_long(self, sentence):
+        """
+        Splits a sentence longer than max_tokens at word boundaries.
+        Returns (piece, tokens) pairs. Word counts slightly overestimate the joined text,
+        which keeps pieces safely under the limit.
+        """
+        words = sentence.split()
+        pieces = []
+        current, used = [], 0
+        for word, tokens in zip(words, self.count_tokens(words)):
+            if current and used + tokens > self.max_tokens:
+                pieces.append((" ".join(current), used))
+                current, used = [], 0
+            current.append(word)
+            used += tokens
+        if current:
+            pieces.append((" ".join(current), used))
+        return pieces
+
+    def chunk(self, text):
+        """
+        Splits `text` into chunks of at most max_tokens word-pieces.
+        """
+        sentences = [s for s in SENTENCE_SPLIT.split(text.strip()) if s]
+        units = []
+        for sentence, tokens in zip(sentences, self.count_tokens(sentences)):
+            if tokens > self.max_tokens:
+                units.extend(self._split_long(sentence))
+            else:
+                units.append((sentence, tokens))
+
+        chunks = []
+        current, used = [], 0
+        for sentence, tokens in units:
+            if current and used + tokens > self.max_tokens:
+                chunks.append(" ".join(s for s, _ in current))
+                # Start the next chunk with the tail of this one, up to overlap_tokens
+                overlap, overlap_used = [], 0
+                for previous in reversed(current):
+                    if overlap_used + previous[1] > self.overlap_tokens or overlap_used + previous[1] + tokens > self.max_tokens:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_used += previous[1]
+                current, used = overlap, overlap_used
+            current.append((sentence, tokens))
+            used += tokens
+
+        if current:
+            chunks.append(" ".join(s for s, _ in current))
+        return chunks
+
+
+@lru_cache(maxsize=1)
+def get_chunker():
+    return TokenChunker()
+
+
+def chunk_text(text):
+    """Chunks text with the shared, lazily loaded chunker."""
+    return get_chunker().chunk(text)
+
+
+def pretoken_counts(texts):
+    """
+    Lower bound on each text's word-piece count without the model's vocabulary: BERT's
+    pre-tokenizer splits on whitespace and punctuation, and every piece becomes at least
+    one word-piece.
+    """
+    from tokenizers.pre_tokenizers import BertPreTokenizer
+    pre_tokenizer = BertPreTokenizer()
+    return [len(pre_tokenizer.pre_tokenize_str(text.lower())) for text in texts]
+
+
+def truncation_report(folder, pretokens=False):
+    """
+    Counts chunks in the extracted JSON files that are longer than the model's limit.
+    With `pretokens`, counts are the offline lower bound from pretoken_counts().
+    """
+    max_tokens = MAX_SEQ_LENGTH - SPECIAL_TOKENS
+    count_tokens = pretoken_counts if pretokens else TokenChunker(overlap_tokens=0).count_tokens
+    total = truncated = tokens_total = tokens_lost = 0
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+            contents = [entry.get("content", "") for entry in json.load(f)]
+        for tokens in count_tokens(contents):
+            total += 1
+            tokens_total += tokens
+            if tokens > max_tokens:
+                truncated += 1
+                tokens_lost += tokens - max_tokens
+    return {
+        "chunks": total,
+        "truncated": truncated,
+        "tokens": tokens_total,
+        "tokens_never_embedded": tokens_lost,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Token-aware chunking utilities")
+    parser.add_argument("--report", nargs="?", const="output", metavar="FOLDER",
+                        help="Report how many chunks in FOLDER exceed the model's sequence limit")
+    parser.add_argument("--pretokens", action="store_true",
+                        help="Count pre-tokens instead (a lower bound that needs no tokenizer download)")
+    args = parser.parse_args()
+
+    if args.report:
+        report = truncation_report(args.report, args.pretokens)
+        if args.pretokens:
+            print("Lower bound from pre-token counts:")
+        share = report["truncated"] / report["chunks"] if report["chunks"] else 0
+        lost = report["tokens_never_embedded"] / report["tokens"] if report["tokens"] else 0
+        print(f"{report['truncated']} of {report['chunks']} chunks ({share:.1%}) exceed {MAX_SEQ_LENGTH} word-pieces")
+        print(f"{report['tokens_never_embedded']} of {report['tokens']} tokens ({lost:.1%}) are never embedded")
+    else:
+        parser.print_help()
@@ -36,11 +36,33 @@ def setup_database(conn: sqlite3.Connection):
             error_message TEXT
         )
         """)
+
+        # Columns added after the table was first created
+        add_missing_columns(cursor, "logs", {
+            "packed_prompt_tokens": "INTEGER",
+            "coalesced": "BOOLEAN DEFAULT 0",
+            "llm_attempt": "INTEGER",
+            "llm_hedged": "BOOLEAN",
+            "faq_hit": "BOOLEAN DEFAULT 0",
+            "index_version": "TEXT",
+        })
+
         conn.commit()
         print("[INFO] Usage monitoring database setup complete.")
     except sqlite3.Error as e:
         print(f"[ERROR] Database setup failed: {e}")
 
+def add_missing_columns(cursor: sqlite3.Cursor, table: str, columns: dict):
+    """
+    Adds any of `columns` ({name: type}) that an existing table doesn't have yet.
+    SQLite has no 'ADD COLUMN IF NOT EXISTS', so check the current schema first.
+    """
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    for name, column_type in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
 def log_request(
     conn: sqlite3.Connection,  # Add SQLite connection object as a parameter
     user_ip: str,
@@ -48,11 +70,17 @@ def log_request(
     is_successful: bool,
     llm_response: str = None,
     llm_model_used: str = None,
+    llm_attempt: int = None,
+    llm_hedged: bool = None,
     prompt_tokens: int = None,
+    packed_prompt_tokens: int = None,
     completion_tokens: int = None,
     total_tokens: int = None,
     latency_ms: int = None,
-    error_message: str = None
+    error_message: str = None,
+    coalesced: bool = False,
+    faq_hit: bool = False,
+    index_version: str = None
 ):
     """
     Logs the details of a single API request to the provided SQLite database connection.
@@ -65,11 +93,15 @@ def log_request(
         cursor.execute("""
         INSERT INTO logs (
             user_ip, question, is_successful, llm_response, llm_model_used,
-            prompt_tokens, completion_tokens, total_tokens, latency_ms, error_message
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            llm_attempt, llm_hedged,
+            prompt_tokens, packed_prompt_tokens, completion_tokens, total_tokens,
+            latency_ms, error_message, coalesced, faq_hit, index_version
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             user_ip, question, is_successful, llm_response, llm_model_used,
-            prompt_tokens, completion_tokens, total_tokens, latency_ms, error_message
+            llm_attempt, llm_hedged,
+            prompt_tokens, packed_prompt_tokens, completion_tokens, total_tokens,
+            latency_ms, error_message, coalesced, faq_hit, index_version
         ))
 
         conn.commit()
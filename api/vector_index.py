@@ -0,0 +1,154 @@
+"""
+Brute-force NumPy vector index exported from the Chroma collection.
+
+The embedding matrix is saved as a plain .npy file and opened with a memory map, so
+every worker process reads the same pages from the OS page cache instead of holding
+its own copy. Documents and metadata are kept in a ChunkStore (chunk_store.py), whose
+arrays are memory-mapped the same way.
+
+NumpyIndex answers query(), get() and count() with the same result layout as a Chroma
+collection, so it can be used wherever the collection is.
+
+With quantization="int8" or "binary", query() scans a quantized copy of the embeddings
+instead (see vector_quantization.py) and rescores the best `rescore_factor * n_results`
+candidates with their exact float32 rows.
+
+Usage (from the api directory):
+    python vector_index.py export    # rebuild index_cache/ from chroma_store/
+"""
+import os
+import sys
+
+import numpy as np
+
+from chunk_store import ChunkStore
+from vector_quantization import binarize, hamming_distances, int8_scores, load_quantized, save_quantized
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_CACHE_DIR = os.path.join(API_DIR, "index_cache")
+
+EMBEDDINGS_FILE = "embeddings.npy"
+# Candidates rescored exactly per requested result, when the first pass is quantized
+DEFAULT_RESCORE_FACTOR = 4
+
+
+def _top_n(values, n):
+    """Indices of the n largest values, largest first."""
+    if n <= 0 or len(values) == 0:
+        return np.empty(0, dtype=np.intp)
+    n = min(n, len(values))
+    # argpartition finds the top n without sorting the whole corpus
+    top = np.argpartition(-values, n - 1)[:n]
+    return top[np.argsort(-values[top], kind="stable")]
+
+
+class NumpyIndex:
+    def __init__(self, store, embeddings, quantization="none", codes=None, scale=None,
+                 rescore_factor=DEFAULT_RESCORE_FACTOR):
+        self.store = store            # ChunkStore, row i belongs to embeddings[i]
+        self.embeddings = embeddings  # (n, dim) float32, rows L2-normalized
+        self.quantization = quantization
+        self.codes = codes            # int8 codes or packed sign bits, row i belongs to embeddings[i]
+        self.scale = scale            # int8 scale per dimension
+        self.rescore_factor = rescore_factor
+
+    @classmethod
+    def load(cls, directory=INDEX_CACHE_DIR, mmap=True, quantization="none", rescore_factor=DEFAULT_RESCORE_FACTOR):
+        embeddings = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r" if mmap else None)
+        codes = scale = None
+        if quantization != "none":
+            codes, scale = load_quantized(directory, quantization, embeddings, mmap)
+        return cls(ChunkStore.load(directory, mmap=mmap), embeddings, quantization, codes, scale, rescore_factor)
+
+    def count(self):
+        return len(self.store)
+
+    def _rows(self, positions, include):
+        result = {"ids": [self.store.chunk_id(i) for i in positions]}
+        if "documents" in include:
+            result["documents"] = [self.store.document(i) for i in positions]
+        if "metadatas" in include:
+            result["metadatas"] = [self.store.metadata(i) for i in positions]
+        if "embeddings" in include:
+            result["embeddings"] = [np.asarray(self.embeddings[i]) for i in positions]
+        return result
+
+    def _first_pass(self, queries):
+        """Approximate scores of every row for each query (higher is closer)."""
+        if self.quantization == "int8":
+            return int8_scores(self.codes, self.scale, queries)
+        # Fewer differing sign bits is closer
+        return -hamming_distances(self.codes, binarize(queries)).astype(np.int32)
+
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances")):
+        """
+        Nearest neighbours by cosine similarity, one result list per query embedding.
+        Distances are squared L2 between normalized vectors, matching Chroma's default space.
+        """
+        queries = np.array(query_embeddings, dtype=np.float32)
+        n_results = min(n_results, self.count())
+        if n_results <= 0:
+            # Nothing to rank (empty index or no results asked for): one empty list per query
+            return {key: [[] for _ in queries] for key in ("ids", *include)}
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        if self.quantization == "none":
+            scores = queries @ self.embeddings.T
+        else:
+            scores = self._first_pass(queries)
+            rescore_n = min(n_results * self.rescore_factor, self.count())
+
+        results = {key: [] for key in ("ids", *include)}
+        for query, row in zip(queries, scores):
+            if self.quantization == "none":
+                top = _top_n(row, n_results)
+                similarity = row[top]
+            else:
+                # Sorted so the float32 rows are read from the memory map in file order
+                candidates = np.sort(_top_n(row, rescore_n))
+                exact = self.embeddings[candidates] @ query
+                best = _top_n(exact, n_results)
+                top, similarity = candidates[best], exact[best]
+            found = self._rows(top, include)
+            if "distances" in include:
+                found["distances"] = (2.0 - 2.0 * similarity).tolist()
+            for key, values in found.items():
+                results[key].append(values)
+        return results
+
+    def get(self, ids=None, include=("documents", "metadatas")):
+        positions = range(self.count()) if ids is None else self.store.rows(ids)
+        return self._rows(list(positions), include)
+
+
+def export_collection(collection, directory=INDEX_CACHE_DIR):
+    """
+    Writes the collection's embeddings, documents and metadata to `directory`.
+    Files are written under temporary names and renamed into place, so a running
+    loader never sees half-written files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+    embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+    embeddings_tmp = os.path.join(directory, EMBEDDINGS_FILE + ".tmp")
+    with open(embeddings_tmp, "wb") as f:
+        np.save(f, embeddings)
+    os.replace(embeddings_tmp, os.path.join(directory, EMBEDDINGS_FILE))
+    save_quantized(embeddings, directory)
+    ChunkStore.from_records(data["ids"], data["documents"], data["metadatas"]).save(directory)
+    print(f"[SUCCESS] Exported {len(data['ids'])} chunks to {directory}")
+
+
+def index_cache_exists(directory=INDEX_CACHE_DIR):
+    return os.path.exists(os.path.join(directory, EMBEDDINGS_FILE)) and ChunkStore.exists(directory)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "export":
+        print("Usage: python vector_index.py export")
+        sys.exit(1)
+    import chromadb
+    client = chromadb.PersistentClient(path=os.path.join(API_DIR, "chroma_store"))
+    export_collection(client.get_or_create_collection("macdonald_speeches"))
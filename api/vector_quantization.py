@@ -0,0 +1,101 @@
+"""
+Quantized copies of the embedding matrix, for a cheap first pass over the whole corpus.
+
+- int8: every dimension scaled to [-127, 127] with its own scale, 4x smaller than float32
+- binary: one sign bit per dimension, packed 8 to a byte, 32x smaller, compared by
+  Hamming distance
+
+The first pass only has to get the right chunks into a candidate set a few times larger
+than the number of results; NumpyIndex then rescores the candidates exactly with their
+float32 rows, which stay memory-mapped and are only read for those rows.
+"""
+import os
+
+import numpy as np
+
+QUANTIZATIONS = ("none", "int8", "binary")
+
+INT8_FILE = "embeddings_int8.npy"
+INT8_SCALE_FILE = "embeddings_int8_scale.npy"
+BINARY_FILE = "embeddings_binary.npy"
+
+# Rows converted to float32 at a time by int8_scores, so the temporary copy stays small
+BLOCK_ROWS = 8192
+
+# Set bits in every 16-bit value; 64 KB, looked up once per 16 dimensions
+_POPCOUNT16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+
+def quantize_int8(embeddings):
+    """Returns (codes, scale): (n, dim) int8 codes and the (dim,) float32 scale per dimension."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    scale = np.abs(embeddings).max(axis=0, initial=0) / 127
+    scale[scale == 0] = 1.0
+    codes = np.clip(np.rint(embeddings / scale), -127, 127).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+
+def binarize(vectors):
+    """Packed sign bits, padded to a whole number of 16-bit words per row."""
+    bits = np.packbits(np.asarray(vectors) > 0, axis=-1)
+    if bits.shape[-1] % 2:
+        bits = np.concatenate([bits, np.zeros(bits.shape[:-1] + (1,), dtype=np.uint8)], axis=-1)
+    return bits
+
+
+def int8_scores(codes, scale, queries):
+    """
+    Approximate dot products of each query with every row, shape (n_queries, n).
+    The scale is folded into the queries, so each block only needs one conversion and one
+    matrix product.
+    """
+    scaled = np.asarray(queries, dtype=np.float32) * scale
+    scores = np.empty((len(scaled), len(codes)), dtype=np.float32)
+    for start in range(0, len(codes), BLOCK_ROWS):
+        block = np.asarray(codes[start:start + BLOCK_ROWS], dtype=np.float32)
+        scores[:, start:start + BLOCK_ROWS] = scaled @ block.T
+    return scores
+
+
+def hamming_distances(bits, query_bits):
+    """Hamming distance of each query's bits to every row, shape (n_queries, n)."""
+    words = bits.view(np.uint16)
+    query_words = np.ascontiguousarray(query_bits).view(np.uint16)
+    distances = np.empty((len(query_words), len(words)), dtype=np.uint16)
+    for i, query in enumerate(query_words):
+        distances[i] = _POPCOUNT16[words ^ query].sum(axis=1, dtype=np.uint16)
+    return distances
+
+
+def save_quantized(embeddings, directory):
+    """Writes the int8 and binary copies of `embeddings` next to it (both are small)."""
+    codes, scale = quantize_int8(embeddings)
+    files = {INT8_FILE: codes, INT8_SCALE_FILE: scale, BINARY_FILE: binarize(embeddings)}
+    for name, array in files.items():
+        tmp = os.path.join(directory, name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, os.path.join(directory, name))
+
+
+def load_quantized(directory, quantization, embeddings, mmap=True):
+    """
+    The arrays for one quantization: (codes, scale) for int8, (bits, None) for binary.
+    Exports made before quantization existed don't have the files; those are quantized
+    from `embeddings` at load, which reads the whole float32 matrix once.
+    """
+    if quantization not in QUANTIZATIONS[1:]:
+        raise ValueError(f"quantization must be one of: {', '.join(QUANTIZATIONS)}")
+    mode = "r" if mmap else None
+    if quantization == "int8":
+        path = os.path.join(directory, INT8_FILE)
+        if os.path.exists(path):
+            return np.load(path, mmap_mode=mode), np.load(os.path.join(directory, INT8_SCALE_FILE))
+        print(f"[WARNING] {INT8_FILE} missing in {directory}; quantizing at load (re-export to save it)")
+        return quantize_int8(embeddings)
+
+    path = os.path.join(directory, BINARY_FILE)
+    if os.path.exists(path):
+        return np.load(path, mmap_mode=mode), None
+    print(f"[WARNING] {BINARY_FILE} missing in {directory}; quantizing at load (re-export to save it)")
+    return binarize(embeddings), None
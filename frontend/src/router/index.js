@@ -1,6 +1,7 @@
 import { createRouter, createWebHistory } from 'vue-router'
 import Home from '../components/Home.vue'
 import Sources from '../components/Sources.vue'
+import Share from '../views/Share.vue'
 
 const routes = [
   {
@@ -12,6 +13,11 @@ const routes = [
     path: '/sources',
     name: 'Sources',
     component: Sources
+  },
+  {
+    path: '/c/:shareId',
+    name: 'Share',
+    component: Share
   }
 ]
 